@@ -0,0 +1,136 @@
+'''
+	Negative-result cache for Offline and NOLOGIN hosts.
+
+	Addresses that have been dead for months cost a full ping or auth timeout on every run.
+	Each consecutive failure of an address doubles the number of runs it is skipped for:
+		failures 1-2 (grace) - probed every run
+		failure 3            - skipped 1 run
+		failure 4            - skipped 2 runs
+		...                  - up to max_skip runs
+	Any successful login clears the address. Addresses missing from the cache are seeded from
+	the Make and Last Seen Online history savelist() keeps in switches.json, so hosts already
+	dead for a long time start at a long backoff.
+
+	Every full_sweep_days a run probes everything, and force_recheck probes everything for one run.
+
+	Configured in scan.yml with:
+	negative_cache:
+	  grace: 2
+	  max_skip: 32
+	  full_sweep_days: 30
+	force_recheck: false
+'''
+import os, json, math, logging
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+FAILED = ('Offline', 'NOLOGIN')
+
+class NegativeCache:
+	def __init__(self, grace=2, max_skip=32, full_sweep_days=30):
+		self.grace = grace
+		self.max_skip = max_skip
+		self.full_sweep_days = full_sweep_days
+		self.run = 0
+		self.last_full_sweep = ''
+		# ip -> {'status': 'Offline'|'NOLOGIN', 'failures': consecutive failures, 'next_run': run number}
+		self.hosts = {}
+		self.force = False
+		self.skipped = 0
+
+	@staticmethod
+	def from_config(config):
+		return NegativeCache(
+			config.get('grace', 2),
+			config.get('max_skip', 32),
+			config.get('full_sweep_days', 30)
+		)
+
+	'''
+		Number of runs to skip after @param(failures) consecutive failures
+	'''
+	def backoff(self, failures):
+		if failures <= self.grace:
+			return 0
+		return min(2 ** (failures - self.grace - 1), self.max_skip)
+
+	'''
+		Starts a new run. Loads the cache from @param(infile) and seeds unknown failed hosts from
+		@param(current_switches) (switches.json). @param(force) probes every host this run.
+	'''
+	def begin(self, infile, current_switches=None, force=False):
+		if os.path.exists(infile):
+			with open(infile, 'r') as cachefile:
+				data = json.load(cachefile)
+			self.run = data.get('run', 0)
+			self.last_full_sweep = data.get('last_full_sweep', '')
+			self.hosts = data.get('hosts', {})
+		self.run += 1
+		self.force = force or self.full_sweep_due()
+		if self.force:
+			log.info('%s: Probing every host this run', 'begin')
+			self.last_full_sweep = datetime.now().strftime("%d%b%Y")
+		self.seed(current_switches or {})
+
+	def full_sweep_due(self):
+		if not self.full_sweep_days:
+			return False
+		if self.last_full_sweep == '':
+			# first run with the cache - start counting from today
+			self.last_full_sweep = datetime.now().strftime("%d%b%Y")
+			return False
+		days = (datetime.now() - datetime.strptime(self.last_full_sweep, "%d%b%Y")).days
+		return days >= self.full_sweep_days
+
+	'''
+		Adds failed hosts from switches.json that are not cached yet.
+		An Offline host unseen for N days starts at grace + log2(N) failures. Without a Last Seen
+		Online date (savelist() writes '' for any host never seen online, even one down for a single
+		run) it starts at grace, so it is still probed until it fails again.
+	'''
+	def seed(self, current_switches):
+		today = datetime.now()
+		for sheet in current_switches.values():
+			for group in sheet.values():
+				for ip, host in group.items():
+					status = host.get('Make', '')
+					if not status in FAILED or ip in self.hosts:
+						continue
+					failures = self.grace
+					if status == 'Offline':
+						try:
+							days = (today - datetime.strptime(host.get('Last Seen Online', ''), "%d%b%Y")).days
+						except ValueError:
+							# no date - how long it has been down is unknown
+							days = 0
+						failures += int(math.log2(days)) if days >= 1 else 0
+					self.hosts[ip] = {'status': status, 'failures': failures, 'next_run': self.run + self.backoff(failures)}
+
+	def should_probe(self, ip):
+		if self.force:
+			return True
+		host = self.hosts.get(ip)
+		if host is None or self.run >= host['next_run']:
+			return True
+		self.skipped += 1
+		log.debug(f'%s: Skipping {ip} ({host["status"]} {host["failures"]} times) until run {host["next_run"]}', 'should_probe')
+		return False
+
+	'''
+		Records the scan @param(result) of @param(ip)
+	'''
+	def record(self, ip, result):
+		status = result.get('Make', '')
+		if not status in FAILED:
+			self.hosts.pop(ip, None)
+			return
+		host = self.hosts.setdefault(ip, {'status': status, 'failures': 0, 'next_run': 0})
+		host['status'] = status
+		host['failures'] += 1
+		host['next_run'] = self.run + 1 + self.backoff(host['failures'])
+
+	def save(self, outfile):
+		log.info(f'%s: Skipped {self.skipped} hosts with repeated failures', 'save')
+		with open(outfile, 'w') as cachefile:
+			json.dump({'run': self.run, 'last_full_sweep': self.last_full_sweep, 'hosts': self.hosts}, cachefile, indent=4)
@@ -0,0 +1,206 @@
+'''
+	End-to-end scan throughput benchmark.
+
+	Runs the full connect -> map_host -> savelist -> Excel path for several fleet sizes and
+	concurrency levels against either:
+		--captures DIR   Offline captures (<ip>.json), reused in turn to build the fleet
+		--farm FILE      a running MockFarm (farm.json written by switch_src/MockFarm.py), over Netmiko
+	Every case runs in its own process so peak RSS is measured per case, and records:
+		hosts_per_minute, p50_seconds, p95_seconds (per-host latency), peak_rss_mb
+
+		python -m SwitchList.Benchmark --captures captures/ --sizes 50 200 --workers 1 8 --save-baseline
+		python -m SwitchList.Benchmark --captures captures/ --sizes 50 200 --workers 1 8
+
+	Without --save-baseline the results are compared to the baseline file and the exit code is 1
+	if any case regressed by more than --threshold (throughput down, latency or memory up).
+'''
+import os, sys, json, time, logging, argparse, resource, subprocess, tempfile
+from . import SwitchMap, Scheduler
+
+log = logging.getLogger(__name__)
+
+SWITCH_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'switch_src')
+GROUP_SIZE = 50
+# metric -> (True if higher is better, smallest absolute change counted as a regression)
+METRICS = {
+	'hosts_per_minute': (True, 0),
+	'p50_seconds': (False, 0.005),
+	'p95_seconds': (False, 0.005),
+	'peak_rss_mb': (False, 2)
+}
+
+def percentile(values, fraction):
+	if len(values) == 0:
+		return 0.0
+	values = sorted(values)
+	return values[min(int(round(fraction * (len(values) - 1))), len(values) - 1)]
+
+'''
+	Returns (targets, connect) for a fleet of @param(size) devices built from Offline captures
+'''
+def offline_fleet(directory, size):
+	sys.path.insert(1, SWITCH_SRC)
+	from switch_src.Offline import Offline
+	offline = Offline(directory)
+	captures = sorted(filename[:-5] for filename in os.listdir(directory) if filename.endswith('.json'))
+	targets = {}
+	for i in range(size):
+		targets[f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'] = captures[i % len(captures)]
+
+	# the device keeps the address of its capture so its management interface is still found
+	def connect(ip):
+		return offline.init(targets[ip])
+	return list(targets), connect
+
+'''
+	Returns (targets, connect) for @param(size) devices of a running MockFarm, logging in with Netmiko
+'''
+def farm_fleet(farmfile, size, username, password):
+	sys.path.insert(1, SWITCH_SRC)
+	from netmiko import ConnectHandler
+	from Cisco import Cisco
+	from Brocade import Brocade
+	with open(farmfile, 'r') as mapfile:
+		farm = json.load(mapfile)
+	targets = list(farm)[:size]
+	if len(targets) < size:
+		log.warning(f'%s: Farm only has {len(targets)} devices', 'farm_fleet')
+
+	def connect(ip):
+		address, port = ip.rsplit(':', 1)
+		make = farm[ip]['make']
+		conn = ConnectHandler(device_type='cisco_ios' if make == 'cisco' else 'ruckus_fastiron',
+			host=address, port=int(port), username=username, password=password)
+		prompt = conn.find_prompt()
+		# the device takes the address of its capture so its management interface is still found
+		capture_ip = farm[ip]['capture']
+		if make == 'brocade':
+			return Brocade(conn=conn, conn_type='SSH', ip=capture_ip, hostname=prompt[:-1].replace('SSH@', ''), prompt=prompt)
+		return Cisco(conn=conn, conn_type='SSH', ip=capture_ip, hostname=prompt[:-1], privileged=prompt.endswith('#'))
+	return targets, connect
+
+'''
+	Runs one benchmark case in this process and returns its results
+'''
+def run_case(args, size, workers):
+	if args.farm:
+		targets, connect = farm_fleet(args.farm, size, args.username, args.password)
+	else:
+		targets, connect = offline_fleet(args.captures, size)
+	scan_list = {'BENCHMARK': {}}
+	scheduler = Scheduler.ScanScheduler(workers)
+	for i, ip in enumerate(targets):
+		group = f'GROUP {i // GROUP_SIZE + 1}'
+		scan_list['BENCHMARK'].setdefault(group, {})
+		scheduler.add(ip, 'BENCHMARK', group, '', connect)
+
+	latencies = []
+	def scan(job):
+		start = time.perf_counter()
+		result = SwitchMap.scan_host(job.connect, job.ip)
+		latencies.append(time.perf_counter() - start)
+		return result
+
+	def done(job, result):
+		scan_list[job.sheet][job.group][job.ip] = result
+
+	workdir = tempfile.mkdtemp(prefix='switchlist-benchmark-')
+	start = time.perf_counter()
+	scheduler.run(scan, done)
+	mergelist = SwitchMap.savelist(scan_list, {}, os.path.join(workdir, 'switches.json'))
+	if not args.no_excel:
+		from . import Excel
+		# update_file() writes its temporary workbook to the working directory
+		os.chdir(workdir)
+		Excel.update_file(os.path.join(workdir, 'switches.xlsx'), mergelist)
+	elapsed = time.perf_counter() - start
+	failed = sum(1 for group in scan_list['BENCHMARK'].values() for result in group.values() if result['Make'] in ('Offline', 'NOLOGIN'))
+	return {
+		'hosts': len(targets),
+		'workers': workers,
+		'failed': failed,
+		'seconds': round(elapsed, 3),
+		'hosts_per_minute': round(len(targets) * 60 / elapsed, 2),
+		'p50_seconds': round(percentile(latencies, 0.5), 4),
+		'p95_seconds': round(percentile(latencies, 0.95), 4),
+		# ru_maxrss is in KiB on Linux
+		'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+	}
+
+'''
+	Returns a list of regression messages for @param(results) against @param(baseline)
+'''
+def compare(results, baseline, threshold):
+	regressions = []
+	for case, current in results.items():
+		if not case in baseline:
+			continue
+		for metric, (higher_is_better, noise) in METRICS.items():
+			old = baseline[case][metric]
+			new = current[metric]
+			# offline cases finish in milliseconds - ignore jitter below the noise floor
+			if old == 0 or abs(new - old) < noise:
+				continue
+			change = (new - old) / old
+			if (higher_is_better and change < -threshold) or (not higher_is_better and change > threshold):
+				regressions.append(f'{case} {metric}: {old} -> {new} ({change:+.1%})')
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description='End-to-end switchlist scan throughput benchmark')
+	source = parser.add_mutually_exclusive_group(required=True)
+	source.add_argument('--captures', help='Directory of Offline captures (<ip>.json)')
+	source.add_argument('--farm', help='farm.json of a running MockFarm')
+	parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200], help='Fleet sizes to run')
+	parser.add_argument('--workers', type=int, nargs='+', default=[1, 8], help='Concurrency levels to run')
+	parser.add_argument('--baseline', default='benchmark.json', help='Baseline results file')
+	parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+	parser.add_argument('--threshold', type=float, default=0.1, help='Allowed regression as a fraction (default 0.1 = 10%%)')
+	parser.add_argument('--no-excel', action='store_true', help='Skip the Excel step (pandas not installed)')
+	parser.add_argument('--username', default='admin')
+	parser.add_argument('--password', default='admin')
+	parser.add_argument('--case', nargs=2, type=int, metavar=('SIZE', 'WORKERS'), help=argparse.SUPPRESS)
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.ERROR)
+
+	# child process - run a single case and print its results
+	if args.case:
+		print(json.dumps(run_case(args, *args.case)))
+		return
+
+	results = {}
+	for size in args.sizes:
+		for workers in args.workers:
+			case = f'{size} hosts x {workers} workers'
+			command = [sys.executable, '-m', 'SwitchList.Benchmark', '--case', str(size), str(workers)] + [
+				argument for argument in sys.argv[1:] if argument != '--save-baseline']
+			output = subprocess.run(command, capture_output=True, text=True, cwd=os.getcwd(),
+				env=dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(SWITCH_SRC), os.environ.get('PYTHONPATH')]))))
+			if output.returncode != 0:
+				print(output.stderr, file=sys.stderr)
+				sys.exit(f'{case} failed')
+			results[case] = json.loads(output.stdout.splitlines()[-1])
+			result = results[case]
+			print(f"{case}: {result['hosts_per_minute']} hosts/min, p50 {result['p50_seconds']}s, p95 {result['p95_seconds']}s, "
+				f"peak RSS {result['peak_rss_mb']} MiB, {result['failed']} failed")
+
+	baseline_path = os.path.abspath(args.baseline)
+	if args.save_baseline:
+		with open(baseline_path, 'w') as baselinefile:
+			json.dump(results, baselinefile, indent=4)
+		print(f'Baseline saved to {baseline_path}')
+		return
+	if not os.path.exists(baseline_path):
+		print(f'No baseline at {baseline_path} - run with --save-baseline first')
+		return
+	with open(baseline_path, 'r') as baselinefile:
+		baseline = json.load(baselinefile)
+	regressions = compare(results, baseline, args.threshold)
+	for regression in regressions:
+		print(f'REGRESSION {regression}')
+	if len(regressions) > 0:
+		sys.exit(1)
+	print(f'No regressions beyond {args.threshold:.0%}')
+
+if __name__ == "__main__":
+	main()
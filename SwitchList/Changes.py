@@ -0,0 +1,180 @@
+'''
+	Cross-run change report.
+
+	Keeps an indexed snapshot of the fleet (snapshot.json) between runs:
+		ips     - ip -> the fields compared below, the sheet/group and whether it was live
+		serials - serial -> ip the device (or stack member) was last seen at
+	Each run's results are checked against the snapshot one host at a time. Every scanned host
+	costs building its entry and one dict comparison; only changed hosts are diffed and looked
+	up in the serial index, so no host is ever compared against the rest of the fleet.
+
+	Reported changes (changes.json):
+		new      - a live device none of whose serials have been seen before
+		removed  - a device that went offline or was replaced and did not show up anywhere else
+		moved    - a device whose serials were last seen at another address
+		firmware - same device, different Firmware
+		stack    - same device, stack members added or removed
+		fips     - same device, different FIPS Mode
+
+	The first run seeds the snapshot from the previous switches.json.
+'''
+import os, json, logging
+from datetime import datetime
+from . import SwitchMap
+
+log = logging.getLogger(__name__)
+
+DOWN = ('Offline', 'NOLOGIN')
+
+'''
+	Returns the serials of a switches.json host as a list - stacks hold a list, reserved hosts may hold a string
+'''
+def serials(host):
+	serial = host.get('Serial', []) or []
+	if isinstance(serial, str):
+		serial = [value.strip() for value in serial.split(',')]
+	return [value for value in serial if value]
+
+'''
+	Returns the snapshot entry of @param(host) found at @param(sheet)/@param(group)
+'''
+def entry(sheet, group, host):
+	make = host.get('Make', '')
+	return {
+		'sheet': sheet,
+		'group': group,
+		'live': not make in DOWN,
+		'make': make,
+		'hostname': host.get('Hostname', ''),
+		'serials': serials(host),
+		'firmware': host.get('Firmware', ''),
+		'fips': host.get('FIPS Mode', '')
+	}
+
+class ChangeReport:
+	def __init__(self):
+		self.ips = {}
+		self.serials = {}
+		self.changes = []
+		self.scanned = 0
+
+	'''
+		Indexes a host that has no snapshot entry yet
+	'''
+	def index(self, ip, item):
+		self.ips[ip] = item
+		for serial in item['serials']:
+			self.serials[serial] = ip
+
+	'''
+		Adds every host of @param(current_switches) (switches.json) missing from the snapshot
+	'''
+	def seed(self, current_switches):
+		for sheet in current_switches:
+			for group in current_switches[sheet]:
+				for ip, host in current_switches[sheet][group].items():
+					if not ip in self.ips:
+						self.index(ip, entry(sheet, group, host))
+
+	def change(self, kind, ip, item, **details):
+		self.changes.append(dict({'type': kind, 'ip': ip, 'hostname': item['hostname']}, **details))
+
+	'''
+		Compares the results of this run - @param(grouplist) as passed to savelist() - against the
+		snapshot, records the changes and updates the snapshot
+	'''
+	def compare(self, grouplist):
+		changed = []
+		for sheet in grouplist:
+			for group in grouplist[sheet]:
+				for ip, host in grouplist[sheet][group].items():
+					self.scanned += 1
+					item = entry(sheet, group, host)
+					old = self.ips.get(ip)
+					if old == item:
+						continue
+					# still down - the entry keeps the identity of the device last seen there
+					if old is not None and not old['live'] and not item['live'] and old['make'] == item['make']:
+						continue
+					changed.append((ip, old, item))
+		gone = []
+		for ip, old, item in changed:
+			if not item['live']:
+				# an offline device keeps its identity so it is recognized when it comes back
+				if old is not None:
+					item = dict(old, live=False, make=item['make'])
+					if old['live'] and item['make'] == 'Offline':
+						gone.append((ip, old))
+				self.ips[ip] = item
+				continue
+			if len(item['serials']) == 0:
+				# hosts without serials (NOLOGIN history, unparsed) are tracked by address only
+				self.ips[ip] = item
+				continue
+			self.compare_live(ip, old, item, gone)
+		for ip, old in gone:
+			# not removed if any of its serials turned up at another address this run
+			if all(self.serials.get(serial) == ip for serial in old['serials']):
+				self.change('removed', ip, old, serials=old['serials'])
+		log.info(f'%s: {len(changed)} of {self.scanned} hosts changed, {len(self.changes)} changes', 'compare')
+		return self.changes
+
+	def compare_live(self, ip, old, item, gone):
+		same = old is not None and len(set(old['serials']) & set(item['serials'])) > 0
+		if not same:
+			if old is not None and old['live'] and len(old['serials']) > 0:
+				# another device took the address
+				gone.append((ip, old))
+			previous = [self.serials[serial] for serial in item['serials'] if self.serials.get(serial, ip) != ip]
+			if previous:
+				self.change('moved', ip, item, **{'from': previous[0], 'serials': item['serials']})
+				old = self.ips.get(previous[0])
+				same = old is not None
+			else:
+				self.change('new', ip, item, serials=item['serials'], make=item['make'])
+		if same:
+			if old['firmware'] and item['firmware'] and old['firmware'] != item['firmware']:
+				self.change('firmware', ip, item, **{'from': old['firmware'], 'to': item['firmware']})
+			added, removed = SwitchMap.stack_compare(old['serials'], item['serials'])
+			if added or removed:
+				self.change('stack', ip, item, added=added, removed=removed)
+			if old['fips'] and item['fips'] and old['fips'] != item['fips']:
+				self.change('fips', ip, item, **{'from': old['fips'], 'to': item['fips']})
+		self.ips[ip] = item
+		for serial in item['serials']:
+			self.serials[serial] = ip
+
+	def save(self, outfile):
+		with open(outfile, 'w') as snapshotfile:
+			json.dump({'ips': self.ips, 'serials': self.serials}, snapshotfile)
+
+	'''
+		Writes the changes of this run to @param(outfile)
+	'''
+	def write(self, outfile):
+		counts = {}
+		for change in self.changes:
+			counts[change['type']] = counts.get(change['type'], 0) + 1
+		with open(outfile, 'w') as changefile:
+			json.dump({
+				'date': datetime.now().strftime("%d%b%Y"),
+				'scanned': self.scanned,
+				'summary': counts,
+				'changes': self.changes
+			}, changefile, indent=4)
+
+	'''
+		Loads the snapshot in @param(infile) - seeded from @param(current_switches) (switches.json)
+		if there is no snapshot yet
+	'''
+	@staticmethod
+	def load(infile, current_switches=None):
+		report = ChangeReport()
+		if os.path.exists(infile):
+			with open(infile, 'r') as snapshotfile:
+				data = json.load(snapshotfile)
+			report.ips = data.get('ips', {})
+			report.serials = data.get('serials', {})
+		else:
+			report.seed(current_switches or {})
+		return report
@@ -0,0 +1,259 @@
+'''
+	Delta-compressed running-config archive.
+
+	Keeps every 'show run' read by read_local() without storing the full text each night:
+		lines.txt    - every distinct config line once, shared by all devices. A line's number
+		               is its id, and the file is only ever appended to.
+		<ip>.json    - the snapshots of one device. The first is a base (the full list of line
+		               ids), each later one a delta against the snapshot before it:
+		               [[start, end, [ids]], ...] replaces ids[start:end] of the previous snapshot.
+		               An unchanged night is an empty delta.
+	A new base is stored every KEYFRAME snapshots so rebuilding any snapshot applies at most
+	KEYFRAME - 1 deltas.
+
+	Pass the archive to SwitchMap.map_host() as a collector and save() it after the scan. Query it with
+		python -m SwitchList.ConfigArchive archive list 192.168.0.10
+		python -m SwitchList.ConfigArchive archive show 192.168.0.10 -1
+		python -m SwitchList.ConfigArchive archive diff 192.168.0.10 01Oct2026 -1
+		python -m SwitchList.ConfigArchive archive stats
+	Snapshots are picked by position (0 = oldest, -1 = latest) or by date (latest of that day).
+'''
+import os, json, logging, argparse, difflib
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+KEYFRAME = 30
+LINES = 'lines.txt'
+
+'''
+	Applies a delta from make_delta() to the line ids of the previous snapshot
+'''
+def apply_delta(ids, delta):
+	ids = list(ids)
+	# from the end so earlier positions stay valid
+	for start, end, replacement in reversed(delta):
+		ids[start:end] = replacement
+	return ids
+
+'''
+	Hunk range of a unified diff ex. '12,4' - same as difflib
+'''
+def hunk_range(start, stop):
+	length = stop - start
+	if length == 1:
+		return f'{start + 1}'
+	if length == 0:
+		return f'{start},0'
+	return f'{start + 1},{length}'
+
+'''
+	Returns the delta turning line ids @param(old) into @param(new)
+'''
+def make_delta(old, new):
+	if old == new:
+		return []
+	matcher = difflib.SequenceMatcher(None, old, new)
+	return [[i1, i2, new[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+class ConfigArchive:
+	def __init__(self, directory):
+		self.directory = directory
+		self.lines = []
+		# line -> id
+		self.ids = {}
+		self.saved_lines = 0
+		# ip -> device history, loaded on first use
+		self.devices = {}
+		self.dirty = set()
+		os.makedirs(directory, exist_ok=True)
+		path = os.path.join(directory, LINES)
+		if os.path.exists(path):
+			with open(path, 'r', encoding='utf-8', newline='\n') as linefile:
+				text = linefile.read()
+			# every line is written followed by '\n'
+			self.lines = text.split('\n')[:-1] if text else []
+			self.ids = {line: number for number, line in enumerate(self.lines)}
+			self.saved_lines = len(self.lines)
+
+	def line_id(self, line):
+		number = self.ids.get(line)
+		if number is None:
+			number = len(self.lines)
+			self.lines.append(line)
+			self.ids[line] = number
+		return number
+
+	'''
+		Returns the history of @param(ip) - {'hostname': .., 'snapshots': [{'date': .., 'base'|'delta': ..}]}
+	'''
+	def device(self, ip):
+		if not ip in self.devices:
+			path = os.path.join(self.directory, f'{ip}.json')
+			if os.path.exists(path):
+				with open(path, 'r') as devicefile:
+					self.devices[ip] = json.load(devicefile)
+			else:
+				self.devices[ip] = {'hostname': '', 'snapshots': []}
+		return self.devices[ip]
+
+	'''
+		Returns the line ids of snapshot @param(index) of @param(ip)
+	'''
+	def snapshot_ids(self, ip, index):
+		snapshots = self.device(ip)['snapshots']
+		index = range(len(snapshots))[index]
+		base = index
+		while not 'base' in snapshots[base]:
+			base -= 1
+		ids = snapshots[base]['base']
+		for snapshot in snapshots[base + 1:index + 1]:
+			ids = apply_delta(ids, snapshot['delta'])
+		return ids
+
+	'''
+		Returns the running config of @param(ip) at @param(selector) (position or date) as a list of lines
+	'''
+	def config(self, ip, selector=-1):
+		return [self.lines[number] for number in self.snapshot_ids(ip, self.find(ip, selector))]
+
+	'''
+		Returns the position of the snapshot picked by @param(selector) - a position or a date ex. '19Oct2026'
+	'''
+	def find(self, ip, selector):
+		snapshots = self.device(ip)['snapshots']
+		if len(snapshots) == 0:
+			raise KeyError(f'No archived config for {ip}')
+		try:
+			return range(len(snapshots))[int(selector)]
+		except ValueError:
+			pass
+		matches = [index for index, snapshot in enumerate(snapshots) if snapshot['date'].split()[0] == selector]
+		if len(matches) == 0:
+			raise KeyError(f'No config of {ip} archived on {selector}')
+		return matches[-1]
+
+	'''
+		Adds @param(config) (list of lines) as the latest snapshot of @param(ip)
+	'''
+	def add(self, ip, hostname, config, date=None):
+		history = self.device(ip)
+		snapshots = history['snapshots']
+		ids = [self.line_id(line) for line in config]
+		snapshot = {'date': date or datetime.now().strftime("%d%b%Y %H:%M")}
+		since_base = 0
+		for previous in reversed(snapshots):
+			since_base += 1
+			if 'base' in previous:
+				break
+		if len(snapshots) == 0 or since_base >= KEYFRAME:
+			snapshot['base'] = ids
+		else:
+			snapshot['delta'] = make_delta(self.snapshot_ids(ip, -1), ids)
+		snapshots.append(snapshot)
+		history['hostname'] = hostname
+		self.dirty.add(ip)
+
+	'''
+		Archives the running config read by read_local() (SwitchMap.map_host collector)
+	'''
+	def collect(self, switch):
+		config = getattr(switch, 'config', None)
+		if not config:
+			return
+		self.add(switch.ip, switch.hostname, config)
+
+	'''
+		Returns the unified diff of @param(ip) between snapshots @param(old) and @param(new)
+	'''
+	def diff(self, ip, old, new=-1):
+		old, new = self.find(ip, old), self.find(ip, new)
+		snapshots = self.device(ip)['snapshots']
+		old_ids, new_ids = self.snapshot_ids(ip, old), self.snapshot_ids(ip, new)
+		matcher = difflib.SequenceMatcher(None, old_ids, new_ids)
+		output = [f'--- {ip} {snapshots[old]["date"]}', f'+++ {ip} {snapshots[new]["date"]}']
+		for group in matcher.get_grouped_opcodes(3):
+			output.append(f'@@ -{hunk_range(group[0][1], group[-1][2])} +{hunk_range(group[0][3], group[-1][4])} @@')
+			for tag, i1, i2, j1, j2 in group:
+				if tag == 'equal':
+					output += [' ' + self.lines[number] for number in old_ids[i1:i2]]
+					continue
+				output += ['-' + self.lines[number] for number in old_ids[i1:i2]]
+				output += ['+' + self.lines[number] for number in new_ids[j1:j2]]
+		return output
+
+	'''
+		Writes new lines and every changed device history. Lines go first so a device file
+		never refers to a line that is not on disk.
+	'''
+	def save(self):
+		if len(self.lines) > self.saved_lines:
+			with open(os.path.join(self.directory, LINES), 'a', encoding='utf-8', newline='\n') as linefile:
+				linefile.write(''.join(line + '\n' for line in self.lines[self.saved_lines:]))
+			self.saved_lines = len(self.lines)
+		for ip in self.dirty:
+			with open(os.path.join(self.directory, f'{ip}.json'), 'w') as devicefile:
+				json.dump(self.devices[ip], devicefile, separators=(',', ':'))
+		log.info(f'%s: Archived {len(self.dirty)} configs, {len(self.lines)} distinct lines', 'save')
+		self.dirty = set()
+
+	'''
+		Returns the archive size against storing every snapshot in full
+	'''
+	def stats(self):
+		snapshots = 0
+		full_lines = 0
+		full_bytes = 0
+		stored_ids = 0
+		for filename in os.listdir(self.directory):
+			if not filename.endswith('.json'):
+				continue
+			ip = filename[:-5]
+			for index, snapshot in enumerate(self.device(ip)['snapshots']):
+				ids = self.snapshot_ids(ip, index)
+				snapshots += 1
+				full_lines += len(ids)
+				full_bytes += sum(len(self.lines[number]) + 1 for number in ids)
+				stored_ids += len(snapshot['base']) if 'base' in snapshot else sum(2 + len(ids) for start, end, ids in snapshot['delta'])
+		return {
+			'devices': len(self.devices),
+			'snapshots': snapshots,
+			'distinct_lines': len(self.lines),
+			'archived_lines': full_lines,
+			'stored_ids': stored_ids,
+			'full_text_bytes': full_bytes,
+			'disk_bytes': sum(os.path.getsize(os.path.join(self.directory, filename)) for filename in os.listdir(self.directory))
+		}
+
+def main():
+	parser = argparse.ArgumentParser(description='Read configs from a switchlist config archive')
+	parser.add_argument('directory', help='Archive directory written by the switchlist generator')
+	commands = parser.add_subparsers(dest='command', required=True)
+	list_parser = commands.add_parser('list', help='List the snapshots of a device')
+	list_parser.add_argument('ip')
+	show_parser = commands.add_parser('show', help='Print a snapshot')
+	show_parser.add_argument('ip')
+	show_parser.add_argument('snapshot', nargs='?', default='-1', help='Position or date (default: latest)')
+	diff_parser = commands.add_parser('diff', help='Diff two snapshots')
+	diff_parser.add_argument('ip')
+	diff_parser.add_argument('old', help='Position or date')
+	diff_parser.add_argument('new', nargs='?', default='-1', help='Position or date (default: latest)')
+	commands.add_parser('stats', help='Archive size against full copies')
+	args = parser.parse_args()
+
+	archive = ConfigArchive(args.directory)
+	if args.command == 'list':
+		history = archive.device(args.ip)
+		for index, snapshot in enumerate(history['snapshots']):
+			kind = 'base' if 'base' in snapshot else f'{len(snapshot["delta"])} changes'
+			print(f'{index:4d} {snapshot["date"]} {history["hostname"]} ({kind})')
+	elif args.command == 'show':
+		print('\n'.join(archive.config(args.ip, args.snapshot)))
+	elif args.command == 'diff':
+		print('\n'.join(archive.diff(args.ip, args.old, args.new)))
+	else:
+		for key, value in archive.stats().items():
+			print(f'{key}: {value}')
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,107 @@
+'''
+	Neighbor crawl discovery mode.
+
+	Rather than probing every address of every subnet in scan.yml, start from a few seed
+	devices and walk the CDP/LLDP neighbor IPs (distant_ip) breadth-first. Every device found
+	is bucketed into its configured sheet/group by address, and only groups the crawl never
+	reached are swept address by address.
+
+	The crawl itself runs one device at a time as each device's neighbors decide what is probed
+	next. The sweep is returned as a scan list so the caller runs it like a full scan - through
+	the ScanScheduler concurrency limits and the negative cache.
+
+	Configured in scan.yml with:
+	discovery:
+	  seeds:
+	  - 192.168.0.1
+	  sweep_unreached: true
+'''
+import logging
+from collections import deque
+from . import SwitchMap
+
+log = logging.getLogger(__name__)
+
+'''
+	Records the CDP/LLDP neighbor IPs of each device passed through SwitchMap.map_host()
+'''
+class NeighborCollector:
+	def __init__(self):
+		self.neighbors = []
+
+	def collect(self, switch):
+		neighbors = SwitchMap.get_neighbors(switch)
+		for port in neighbors:
+			if 'distant_ip' in neighbors[port]:
+				self.neighbors.append(neighbors[port]['distant_ip'])
+
+'''
+	Returns a dict mapping every address in @param(scan_list) (as returned by SwitchMap.parse_list)
+	to its (sheet, group)
+'''
+def build_membership(scan_list):
+	membership = {}
+	for sheet in scan_list:
+		for group in scan_list[sheet]:
+			for ip in scan_list[sheet][group]:
+				membership.setdefault(ip, (sheet, group))
+	return membership
+
+'''
+	Breadth-first crawl of CDP/LLDP neighbors starting from @param(seeds).
+	Only addresses inside the configured scan list are followed.
+
+	Returns
+		switchmap - {sheet: {group: {ip: {...}}}} of every device probed
+		reached - set of (sheet, group) that contain at least one live device
+'''
+def crawl(connect, seeds, scan_list, reserved={}, collectors=(), progress=None):
+	membership = build_membership(scan_list)
+	switchmap = {}
+	reached = set()
+	queue = deque(seeds)
+	seen = set(seeds)
+	while queue:
+		ip = queue.popleft()
+		if not ip in membership:
+			log.info(f'%s: {ip} is outside the configured scan list', 'crawl')
+			continue
+		sheet, group = membership[ip]
+		if ip in reserved:
+			continue
+		log.info(f'%s: Crawling host: {ip}', 'crawl')
+		neighbors = NeighborCollector()
+		result = SwitchMap.scan_host(connect, ip, (neighbors,) + tuple(collectors), progress)
+		switchmap.setdefault(sheet, {}).setdefault(group, {})[ip] = result
+		if result['Make'] in ('Offline', 'NOLOGIN'):
+			continue
+		reached.add((sheet, group))
+		for neighbor in neighbors.neighbors:
+			if not neighbor in seen:
+				seen.add(neighbor)
+				queue.append(neighbor)
+	return switchmap, reached
+
+'''
+	Runs a crawl from @param(seeds) and lists every address of the groups the crawl never
+	reached (if @param(sweep_unreached) is set). Reserved addresses are recorded for every group.
+
+	Returns
+		switchmap - the crawl results in the same format as the full scan in switchlist_generator_crt.main()
+		sweep - {sheet: {group: [ip, ...]}} of the addresses still to scan, in SwitchMap.parse_list() format
+'''
+def discover(connect, seeds, scan_list, reserved={}, sweep_unreached=True, collectors=(), progress=None):
+	switchmap, reached = crawl(connect, seeds, scan_list, reserved, collectors, progress)
+	probes = sum(len(switchmap[sheet][group]) for sheet in switchmap for group in switchmap[sheet])
+	log.info(f'%s: Crawl probed {probes} hosts and reached {len(reached)} groups', 'discover')
+	sweep = {}
+	for sheet in scan_list:
+		for group in scan_list[sheet]:
+			results = switchmap.setdefault(sheet, {}).setdefault(group, {})
+			if sweep_unreached and not (sheet, group) in reached:
+				log.info(f'%s: Sweeping unreached group {sheet}/{group}', 'discover')
+				sweep.setdefault(sheet, {})[group] = [ip for ip in scan_list[sheet][group] if not ip in results and not ip in reserved]
+			for ip in scan_list[sheet][group]:
+				if ip in reserved:
+					results[ip] = reserved[ip]
+	return switchmap, sweep
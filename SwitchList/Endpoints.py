@@ -0,0 +1,158 @@
+'''
+	Fleet-wide endpoint locator.
+
+	Collects the MAC and ARP tables of every device during a scan into one index:
+		MAC -> (device, port, VLAN)
+		IP  -> MAC
+	A MAC is usually learned on every switch between the endpoint and the core, so
+	entries on edge (access) ports are preferred over entries on trunks/uplinks.
+
+	The index is saved between runs so it can be queried without touching the network:
+		python -m SwitchList.Endpoints endpoints.json 0420.6969.b00b
+		python -m SwitchList.Endpoints endpoints.json 192.168.1.50
+'''
+import os, json, logging, argparse
+from datetime import datetime
+from ipaddress import ip_address
+from . import SwitchMap
+
+log = logging.getLogger(__name__)
+
+'''
+	Converts any common MAC format to the Cisco dotted format used by the device parsers
+	ex. '04:20:69:69:B0:0B' -> '0420.6969.b00b'
+'''
+def normalize_mac(mac):
+	digits = ''.join(c for c in mac.lower() if c in '0123456789abcdef')
+	if len(digits) != 12:
+		return mac.lower()
+	return '.'.join([digits[0:4], digits[4:8], digits[8:12]])
+
+class EndpointIndex:
+	# the full MAC/ARP tables must be pulled from each device (see SwitchMap.map_host)
+	needs_tables = True
+
+	def __init__(self):
+		self.macs = {}
+		self.ips = {}
+		# device IP -> set of MACs currently located on that device
+		self.devices = {}
+
+	'''
+		Returns True if @param(port) on @param(switch) is a trunk/uplink rather than a user port
+	'''
+	def is_trunk(self, switch, port):
+		if port in SwitchMap.get_neighbors(switch):
+			return True
+		if switch.make == 'Cisco':
+			# ports missing from the config (CPU, Router, etc.) are never user ports
+			interface = switch.interfaces.get(switch.port_longform(port))
+			return interface is None or interface['mode'] != 'access'
+		return False
+
+	'''
+		Removes every MAC previously located on @param(device_ip) so a rescan replaces it
+	'''
+	def drop_device(self, device_ip):
+		for mac in self.devices.pop(device_ip, set()):
+			if self.macs.get(mac, {}).get('device') == device_ip:
+				self.macs.pop(mac)
+
+	'''
+		Adds the MAC and ARP tables of a mapped device (SwitchMap.map_host collector)
+	'''
+	def collect(self, switch):
+		today = datetime.now().strftime("%d%b%Y")
+		mac_table = getattr(switch, 'mac_table', None)
+		if mac_table is None:
+			mac_table = switch.parse_mac_table() if len(getattr(switch, 'mac_string', '')) > 0 else {}
+		arp_table = getattr(switch, 'arp_table', None)
+		if arp_table is None:
+			arp_table = switch.parse_arp_table() if len(getattr(switch, 'arp_string', '')) > 0 else {}
+		self.drop_device(switch.ip)
+		located = self.devices.setdefault(switch.ip, set())
+		for mac, entry in mac_table.items():
+			mac = normalize_mac(mac)
+			edge = not self.is_trunk(switch, entry['PORT'])
+			current = self.macs.get(mac)
+			# keep an existing edge port location over a trunk sighting
+			if current is not None and current['edge'] and not edge:
+				continue
+			if current is not None and current['device'] != switch.ip:
+				self.devices.get(current['device'], set()).discard(mac)
+			self.macs[mac] = {
+				'device': switch.ip,
+				'hostname': switch.hostname,
+				'port': entry['PORT'],
+				'vlan': entry['VLAN'],
+				'edge': edge,
+				'updated': today
+			}
+			located.add(mac)
+		for ip, entry in arp_table.items():
+			self.ips[ip] = normalize_mac(entry['MAC'])
+
+	'''
+		returns the location dict of @param(mac) or None
+		ex. {'device': '192.168.0.2', 'hostname': 'EXAMPLE-AN', 'port': 'Gi1/0/1', 'vlan': '110', 'edge': True, 'updated': '01JAN2024'}
+	'''
+	def lookup_mac(self, mac):
+		return self.macs.get(normalize_mac(mac))
+
+	'''
+		returns (mac, location dict) for @param(ip) - either may be None
+	'''
+	def lookup_ip(self, ip):
+		mac = self.ips.get(ip)
+		if mac is None:
+			return None, None
+		return mac, self.macs.get(mac)
+
+	'''
+		returns (mac, location dict) for @param(address) - an IP or a MAC in any notation
+	'''
+	def lookup(self, address):
+		try:
+			# dotted MACs such as 0000.1111.2222 are all digits too
+			ip_address(address)
+		except ValueError:
+			return normalize_mac(address), self.lookup_mac(address)
+		return self.lookup_ip(address)
+
+	def save(self, outfile):
+		with open(outfile, 'w') as indexfile:
+			json.dump({'macs': self.macs, 'ips': self.ips}, indexfile)
+
+	'''
+		Loads a previously saved index - returns an empty index if @param(infile) does not exist
+	'''
+	@staticmethod
+	def load(infile):
+		index = EndpointIndex()
+		if not os.path.exists(infile):
+			log.warning(f'%s: Creating endpoint index: {os.path.abspath(infile)}', 'load')
+			return index
+		with open(infile, 'r') as indexfile:
+			data = json.load(indexfile)
+		index.macs = data['macs']
+		index.ips = data['ips']
+		for mac, location in index.macs.items():
+			index.devices.setdefault(location['device'], set()).add(mac)
+		return index
+
+def main():
+	parser = argparse.ArgumentParser(description='Locate endpoints from a saved switchlist endpoint index')
+	parser.add_argument('indexfile', help='Endpoint index saved by the switchlist generator (endpoints.json)')
+	parser.add_argument('addresses', help='MAC or IP addresses to locate', nargs='+')
+	args = parser.parse_args()
+
+	index = EndpointIndex.load(args.indexfile)
+	for address in args.addresses:
+		mac, location = index.lookup(address)
+		if location is None:
+			print(f'{address}: not found')
+			continue
+		print(f'{address}: {mac} {location["hostname"]} ({location["device"]}) {location["port"]} VLAN {location["vlan"]} - seen {location["updated"]}')
+
+if __name__ == "__main__":
+	main()
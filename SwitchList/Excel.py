@@ -1,7 +1,6 @@
 # $language = "python3"
 # $interface = "1.0"
 
-import pandas as pd
 import traceback, logging
 import json, os
 log = logging.Logger(__name__)
@@ -50,13 +49,8 @@ def sort_switches(switches):
   return sorted
 
 def same_stack(old, current):
-  new = current.copy()
-  for serial in old:
-      if serial in new:
-        new.remove(serial)
-      else:
-        return False
-  return True
+  # every old member is still in the stack
+  return set(old) <= set(current)
 
 def ip_to_decimal(ip):
 	log.debug(f'%s: Converting ip {ip} to decimal value', 'ip_to_deciaml')
@@ -75,6 +69,8 @@ def dfsort(series):
   Updates each individual sheet within an excel file with all values contained within switches
 '''
 def update_sheet(switches,dataframe=None):
+  # pandas takes most of a second to import - only load it once a sheet is written
+  import pandas as pd
   columns = ["Hostname","IP Address","Subnet Mask","Make","Model","Firmware","Serial","FIPS Mode","Upstream","Last Seen Online","Last Updated"]
   if dataframe is None:
     log.info(f'%s: Creating new Dataframe for group', 'update_sheet')
@@ -138,6 +134,7 @@ def update_sheet(switches,dataframe=None):
   Saves data in a temporary file 'tempfile.xlsx' during runtime to prevent corruption of main file.
 '''
 def update_file(infile, switches):
+  import pandas as pd
   log.info(f'%s: Reading file {infile}', 'update_file')
   if os.path.exists(infile):
     file_handler = pd.ExcelFile
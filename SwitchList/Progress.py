@@ -0,0 +1,131 @@
+'''
+	Live scan progress.
+
+	Tracks hosts done and how they ended (live, Offline, NOLOGIN), the rolling scan rate,
+	average time per device by vendor and an ETA for the remaining targets.
+	The status line is rewritten in place on the console and the same figures are written
+	to a JSON status file. Both are throttled to once every @param(interval) seconds so the
+	scan loop never waits on output.
+
+	ex.
+		progress = ProgressReporter(total, 'status.json')
+		SwitchMap.scan_host(connect, ip, collectors, progress)
+		...
+		progress.close()
+'''
+import os, sys, json, time, logging, threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+class ProgressReporter:
+	def __init__(self, total, statusfile='', interval=2.0, window=300.0, stream=sys.stdout):
+		self.total = total
+		self.statusfile = statusfile
+		self.interval = interval
+		# hosts/minute is measured over the last @param(window) seconds
+		self.window = window
+		self.stream = stream
+		self.started = time.monotonic()
+		self.last_update = 0.0
+		self.counts = {'done': 0, 'live': 0, 'Offline': 0, 'NOLOGIN': 0}
+		# make -> [devices, seconds]
+		self.vendors = {}
+		self.finished = deque()
+		# ip -> seconds taken, kept for shard balancing (see Shards)
+		self.seconds = {}
+		self.current = ''
+		# hosts may finish on several scheduler workers at once
+		self.lock = threading.Lock()
+
+	def start(self, ip):
+		self.current = ip
+
+	'''
+		Records the @param(result) of a host (DeviceRecord or placeholder dict) that took @param(seconds)
+	'''
+	def finish(self, ip, result, seconds):
+		now = time.monotonic()
+		make = result.get('Make', '') or 'Unknown'
+		with self.lock:
+			self.counts['done'] += 1
+			self.seconds[ip] = seconds
+			if make in ('Offline', 'NOLOGIN'):
+				self.counts[make] += 1
+			else:
+				self.counts['live'] += 1
+				vendor = self.vendors.setdefault(make, [0, 0.0])
+				vendor[0] += 1
+				vendor[1] += seconds
+			self.finished.append(now)
+			while self.finished and now - self.finished[0] > self.window:
+				self.finished.popleft()
+			if now - self.last_update >= self.interval:
+				self.update(now)
+
+	'''
+		Hosts finished per minute over the rolling window
+	'''
+	def rate(self, now):
+		elapsed = min(self.window, now - self.started)
+		if elapsed <= 0 or len(self.finished) == 0:
+			return 0.0
+		return len(self.finished) * 60 / elapsed
+
+	def status(self, now=None):
+		now = time.monotonic() if now is None else now
+		rate = self.rate(now)
+		remaining = max(self.total - self.counts['done'], 0)
+		return dict(self.counts,
+			total=self.total,
+			remaining=remaining,
+			current=self.current,
+			elapsed=round(now - self.started, 1),
+			hosts_per_minute=round(rate, 2),
+			eta_seconds=round(remaining * 60 / rate) if rate > 0 else None,
+			vendor_seconds={make: round(seconds / devices, 2) for make, (devices, seconds) in self.vendors.items()}
+		)
+
+	def line(self, status):
+		eta = '--:--' if status['eta_seconds'] is None else format_duration(status['eta_seconds'])
+		vendors = ' '.join(f'{make} {seconds:.1f}s' for make, seconds in status['vendor_seconds'].items())
+		return (f"{status['done']}/{status['total']} "
+			f"live {status['live']} offline {status['Offline']} nologin {status['NOLOGIN']} | "
+			f"{status['hosts_per_minute']:.1f} hosts/min ETA {eta}"
+			f"{' | ' + vendors if vendors else ''}")
+
+	def update(self, now=None):
+		status = self.status(now)
+		self.last_update = time.monotonic()
+		try:
+			self.stream.write('\r' + self.line(status).ljust(100))
+			self.stream.flush()
+		except (AttributeError, OSError):
+			# no console under SecureCRT
+			pass
+		if self.statusfile:
+			try:
+				with open(self.statusfile + '.tmp', 'w') as statusfile:
+					json.dump(status, statusfile, indent=4)
+				os.replace(self.statusfile + '.tmp', self.statusfile)
+			except OSError as e:
+				log.warning(f'%s: Could not write {self.statusfile}: {e}', 'update')
+
+	'''
+		Writes the final figures and ends the console status line
+	'''
+	def close(self):
+		self.current = ''
+		self.update()
+		try:
+			self.stream.write('\n')
+		except (AttributeError, OSError):
+			pass
+		log.info(f'%s: {self.line(self.status())}', 'close')
+
+def format_duration(seconds):
+	minutes, seconds = divmod(int(seconds), 60)
+	hours, minutes = divmod(minutes, 60)
+	if hours > 0:
+		return f'{hours}:{minutes:02d}:{seconds:02d}'
+	return f'{minutes:02d}:{seconds:02d}'
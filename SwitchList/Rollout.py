@@ -0,0 +1,331 @@
+'''
+	Staged configuration rollout.
+
+	Applies a config set to a list of devices in waves: a canary wave first, then batches that
+	grow by @param(growth) each wave up to @param(max_batch). Devices within a wave are configured
+	concurrently on a ScanScheduler. Every device is verified by re-reading its running config and
+	re-parsing what the config set touched:
+		storm-control / authentication - the interface field set by Cisco.parse_interfaces()
+		                                 (validate_stormcontrol() / validate_auth()) parsing
+		                                 only that interface's own stanza
+		lines                          - every global command is present in the running config
+	write mem runs once the whole wave is verified, so a wave that goes wrong leaves only
+	unsaved changes behind. Before each wave the failure rate so far is checked and the
+	rollout stops once it is above @param(max_failure_rate). A failed canary always stops it.
+
+	Rollout file:
+	targets:
+	- 192.168.0.10
+	- 192.168.0.11
+	commands:                # optional - global config mode
+	- ip dhcp snooping
+	interfaces:              # optional - applied under every matching interface
+	  mode: access           # access/trunk/routed, or names: [GigabitEthernet1/0/1, ...]
+	  commands:
+	  - storm-control broadcast level bps 1g
+	  - storm-control unicast level bps 1g
+	  - storm-control action shutdown
+	verify:
+	- storm-control
+	waves:
+	  canary: 1
+	  growth: 2
+	  max_batch: 32
+	  max_failure_rate: 0.1
+	  max_workers: 8
+	  per_upstream: 2
+
+	Interfaces that already pass verification are left alone. Only Cisco devices can be configured.
+'''
+import time, json, logging
+from . import Scheduler
+
+log = logging.getLogger(__name__)
+
+# verify check -> parse_interfaces() field
+INTERFACE_CHECKS = {
+	'storm-control': 'storm-control',
+	'authentication': 'authentication'
+}
+
+'''
+	Splits @param(targets) into waves of @param(canary), then batches growing by @param(growth)
+	ex. 20 targets -> [1, 2, 4, 8, 5]
+'''
+def plan_waves(targets, canary=1, growth=2, max_batch=0):
+	waves = []
+	size = max(1, canary)
+	position = 0
+	while position < len(targets):
+		waves.append(targets[position:position + size])
+		position += size
+		size = max(size + 1, int(size * growth))
+		if max_batch:
+			size = min(size, max_batch)
+	return waves
+
+'''
+	Splits @param(config) (running config lines) into the stanzas of its interfaces -
+	each an 'interface' line and the indented lines under it
+'''
+def interface_stanzas(config):
+	stanzas = []
+	stanza = None
+	for line in config:
+		if line.startswith('interface'):
+			stanza = [line]
+			stanzas.append(stanza)
+		elif stanza is not None and line.startswith(' '):
+			stanza.append(line)
+		else:
+			stanza = None
+	return stanzas
+
+'''
+	Hands a session from Sessions.SessionPool back to its pool so its idle time starts
+'''
+def release(switch):
+	if getattr(switch, 'pool', None) is not None:
+		switch.pool.release(switch)
+
+class ConfigSet:
+	def __init__(self, commands=None, interfaces=None, verify=None):
+		self.commands = list(commands or [])
+		interfaces = interfaces or {}
+		self.interface_commands = list(interfaces.get('commands', []) or [])
+		self.mode = interfaces.get('mode', '')
+		self.names = set(interfaces.get('names', []) or [])
+		if verify is None:
+			verify = ['lines'] if self.commands else []
+		self.verify = [verify] if isinstance(verify, str) else list(verify)
+		for check in self.verify:
+			if check != 'lines' and not check in INTERFACE_CHECKS:
+				raise ValueError(f'Unknown verify check {check}')
+
+	@staticmethod
+	def from_config(config):
+		return ConfigSet(config.get('commands'), config.get('interfaces'), config.get('verify'))
+
+	def interface_checks(self):
+		return [INTERFACE_CHECKS[check] for check in self.verify if check in INTERFACE_CHECKS]
+
+	'''
+		Returns the names of the interfaces of @param(interfaces) (parse_interfaces()) the config set applies to
+	'''
+	def select(self, interfaces):
+		if len(self.interface_commands) == 0:
+			return []
+		selected = []
+		for name, interface in interfaces.items():
+			if self.names:
+				if name in self.names:
+					selected.append(name)
+			elif self.mode and interface['mode'] == self.mode and not name.startswith(('Vlan', 'Port-channel', 'Loopback', 'Tunnel')):
+				selected.append(name)
+		return selected
+
+	'''
+		Returns the names of @param(selected) interfaces that fail any interface check
+	'''
+	def noncompliant(self, interfaces, selected):
+		checks = self.interface_checks()
+		if len(checks) == 0:
+			return list(selected)
+		return [name for name in selected if not all(interfaces[name][field] for field in checks)]
+
+	'''
+		Returns the config mode commands that bring @param(config) (running config lines) and
+		@param(interfaces) in line
+	'''
+	def build(self, config, interfaces):
+		commands = list(self.commands)
+		if 'lines' in self.verify:
+			running = {line.strip() for line in config}
+			commands = [command for command in commands if not command.strip() in running]
+		global_commands = len(commands)
+		for name in self.noncompliant(interfaces, self.select(interfaces)):
+			commands.append(f'interface {name}')
+			commands += self.interface_commands
+		if len(commands) > global_commands:
+			commands.append('exit')
+		return commands
+
+	'''
+		Returns a list of verification failures of the device running config
+	'''
+	def failures(self, config, interfaces, touched):
+		failures = []
+		if 'lines' in self.verify:
+			running = {line.strip() for line in config}
+			failures += [f'missing "{command}"' for command in self.commands if not command.strip() in running]
+		for name in touched:
+			interface = interfaces.get(name)
+			if interface is None:
+				failures.append(f'{name} missing')
+				continue
+			failures += [f'{name} {field} not compliant' for field in self.interface_checks() if not interface[field]]
+		return failures
+
+class Rollout:
+	def __init__(self, configset, connect, canary=1, growth=2, max_batch=32, max_failure_rate=0.1, concurrency=None):
+		self.configset = configset
+		# normally SessionPool.connect so the session stays open until write mem
+		self.connect = connect
+		self.canary = canary
+		self.growth = growth
+		self.max_batch = max_batch
+		self.max_failure_rate = max_failure_rate
+		self.concurrency = dict(concurrency or {})
+		# ip -> {'wave', 'status', 'hostname', 'interfaces', 'error', 'seconds'}
+		self.results = {}
+		self.stopped = ''
+
+	@staticmethod
+	def from_config(configset, connect, config):
+		return Rollout(
+			configset,
+			connect,
+			config.get('canary', 1),
+			config.get('growth', 2),
+			config.get('max_batch', 32),
+			config.get('max_failure_rate', 0.1),
+			{key: value for key, value in config.items() if key in ('max_workers', 'per_group', 'per_upstream')}
+		)
+
+	def failure_rate(self):
+		attempted = [result for result in self.results.values() if result['status'] != 'skipped']
+		if len(attempted) == 0:
+			return 0.0
+		return sum(1 for result in attempted if result['status'] == 'failed') / len(attempted)
+
+	'''
+		Reads and parses the running config of @param(switch). A pooled session may never have
+		been through readinfo(), so paging is turned off first or 'show run' stops at --More--
+
+		parse_interfaces() keeps collecting storm-control/authentication lines from one interface
+		to the next, so each interface is parsed from its own stanza - an interface missing a line
+		is never passed on the lines of the interface before it.
+	'''
+	def read_config(self, switch):
+		switch.send('terminal length 0')
+		config = switch.send('show run').splitlines()
+		interfaces = {}
+		for stanza in interface_stanzas(config):
+			switch.config = stanza
+			interfaces.update(switch.parse_interfaces())
+		switch.config = config
+		return interfaces
+
+	'''
+		Configures and verifies one device - returns its result
+	'''
+	def apply(self, ip, wave):
+		result = {'wave': wave, 'status': 'failed', 'hostname': '', 'interfaces': [], 'error': '', 'seconds': 0.0}
+		start = time.monotonic()
+		switch = None
+		try:
+			switch = self.connect(ip)
+			if not switch:
+				result['error'] = 'Offline'
+				return result
+			result['hostname'] = switch.hostname
+			if switch.make != 'Cisco':
+				result['status'] = 'skipped'
+				result['error'] = f'{switch.make} devices cannot be configured'
+				return result
+			interfaces = self.read_config(switch)
+			commands = self.configset.build(switch.config, interfaces)
+			touched = [command.split(' ', 1)[1] for command in commands if command.startswith('interface ')]
+			result['interfaces'] = touched
+			if len(commands) == 0:
+				result['status'] = 'unchanged'
+				return result
+			log.info(f'%s: Configuring {ip} ({len(touched)} interfaces)', 'apply')
+			# one write per device on SecureCRT - rejected lines raise ValueError with their line numbers
+			switch.send_config(commands, bulk=True)
+			interfaces = self.read_config(switch)
+			failures = self.configset.failures(switch.config, interfaces, touched)
+			if len(failures) > 0:
+				result['error'] = 'Verification failed: ' + ', '.join(failures)
+				return result
+			result['status'] = 'verified'
+		except Exception as e:
+			log.exception(f'%s: Rollout to {ip} failed', 'apply')
+			result['error'] = str(e) or type(e).__name__
+		finally:
+			result['seconds'] = round(time.monotonic() - start, 2)
+			release(switch)
+		return result
+
+	'''
+		Saves the config of every verified device of the wave
+	'''
+	def write_mem(self, ip):
+		result = self.results[ip]
+		switch = None
+		try:
+			switch = self.connect(ip)
+			switch.write_mem()
+			result['status'] = 'saved'
+		except Exception as e:
+			log.exception(f'%s: write mem on {ip} failed', 'write_mem')
+			result['status'] = 'failed'
+			result['error'] = f'write mem failed: {e}'
+		finally:
+			release(switch)
+
+	'''
+		Runs @param(task)(job) for @param(ips) concurrently within the concurrency limits
+	'''
+	def run_wave(self, task, ips, number, upstream):
+		scheduler = Scheduler.ScanScheduler.from_config(self.concurrency)
+		for ip in ips:
+			scheduler.add(ip, 'ROLLOUT', f'WAVE {number}', upstream.get(ip, ''), self.connect)
+		if scheduler.pending > 0:
+			scheduler.run(task, lambda job, result: None)
+
+	'''
+		Rolls the config set out to @param(targets). @param(upstream) optionally maps ip -> upstream
+		device so per_upstream can limit the devices configured behind one switch.
+		Returns the results by IP.
+	'''
+	def run(self, targets, upstream=None):
+		upstream = upstream or {}
+		waves = plan_waves(list(targets), self.canary, self.growth, self.max_batch)
+		log.info(f'%s: Rolling out to {len(targets)} devices in {len(waves)} waves', 'run')
+		for number, wave in enumerate(waves, 1):
+			rate = self.failure_rate()
+			if number > 1 and rate > self.max_failure_rate:
+				self.stopped = f'failure rate {rate:.0%} above {self.max_failure_rate:.0%} after wave {number - 1}'
+				break
+			log.info(f'%s: Wave {number}: {len(wave)} devices', 'run')
+
+			def apply(job):
+				self.results[job.ip] = self.apply(job.ip, number)
+
+			self.run_wave(apply, wave, number, upstream)
+			# write mem once the whole wave is in
+			verified = [ip for ip in wave if self.results[ip]['status'] == 'verified']
+			self.run_wave(lambda job: self.write_mem(job.ip), verified, number, upstream)
+
+			failed = [ip for ip in wave if self.results[ip]['status'] == 'failed']
+			for ip in failed:
+				log.error(f'%s: {ip}: %s', 'run', self.results[ip]['error'])
+			if number == 1 and len(failed) > 0:
+				self.stopped = 'canary failed'
+				break
+		if self.stopped:
+			log.error('%s: Rollout stopped - %s', 'run', self.stopped)
+		for ip in targets:
+			self.results.setdefault(ip, {'wave': 0, 'status': 'not attempted', 'hostname': '', 'interfaces': [], 'error': '', 'seconds': 0.0})
+		return self.results
+
+	def summary(self):
+		counts = {}
+		for result in self.results.values():
+			counts[result['status']] = counts.get(result['status'], 0) + 1
+		return counts
+
+	def save(self, outfile):
+		with open(outfile, 'w') as reportfile:
+			json.dump({'stopped': self.stopped, 'summary': self.summary(), 'devices': self.results}, reportfile, indent=4)
@@ -0,0 +1,168 @@
+'''
+	Topology-aware scan scheduler.
+
+	Runs scans on a pool of worker threads without flooding any one part of the network:
+		max_workers  - global cap on concurrent logins
+		per_group    - concurrent logins within one sheet/group of scan.yml
+		per_upstream - concurrent logins behind one upstream device (the Upstream field of the
+		               previous run's switches.json) so a distribution switch and TACACS
+		               are not hit by a whole building at once
+	Groups are served round robin so one large subnet cannot starve the rest.
+
+	Configured in scan.yml with:
+	concurrency:
+	  max_workers: 8
+	  per_group: 4
+	  per_upstream: 2
+	  groups:
+	    CORE NODE 1: 1
+
+	The default of one worker scans sequentially as before.
+'''
+import logging, threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+class Job:
+	__slots__ = ('ip', 'sheet', 'group', 'upstream', 'connect')
+
+	def __init__(self, ip, sheet, group, upstream='', connect=None):
+		self.ip = ip
+		self.sheet = sheet
+		self.group = group
+		self.upstream = upstream
+		self.connect = connect
+
+'''
+	Returns the upstream device name from a switches.json Upstream field
+	ex. 'EXAMPLE-DS Gi1/0/48' -> 'EXAMPLE-DS', 'Unavailable' -> ''
+'''
+def upstream_device(upstream):
+	if not upstream or upstream in ('Unavailable', 'N/A'):
+		return ''
+	return upstream.split()[0]
+
+'''
+	Wraps a SwitchMap.map_host collector so collect() calls from different workers run one at a time
+'''
+class SerialCollector:
+	def __init__(self, collector, lock):
+		self.collector = collector
+		self.lock = lock
+		self.needs_tables = getattr(collector, 'needs_tables', False)
+
+	def collect(self, switch):
+		with self.lock:
+			self.collector.collect(switch)
+
+def serialize(collectors):
+	lock = threading.Lock()
+	return tuple(SerialCollector(collector, lock) for collector in collectors)
+
+class ScanScheduler:
+	def __init__(self, max_workers=1, per_group=0, per_upstream=0, groups={}):
+		self.max_workers = max(1, max_workers)
+		# 0 = no limit
+		self.per_group = per_group
+		self.per_upstream = per_upstream
+		# group or 'sheet/group' -> limit overriding per_group
+		self.group_limits = dict(groups)
+		self.queues = {}
+		self.order = deque()
+		self.active_groups = {}
+		self.active_upstream = {}
+		self.pending = 0
+		self.condition = threading.Condition()
+
+	@staticmethod
+	def from_config(config):
+		return ScanScheduler(
+			config.get('max_workers', 1),
+			config.get('per_group', 0),
+			config.get('per_upstream', 0),
+			config.get('groups', {}) or {}
+		)
+
+	def add(self, ip, sheet, group, upstream='', connect=None):
+		key = (sheet, group)
+		if not key in self.queues:
+			self.queues[key] = deque()
+			self.order.append(key)
+		self.queues[key].append(Job(ip, sheet, group, upstream_device(upstream), connect))
+		self.pending += 1
+
+	def group_limit(self, key):
+		sheet, group = key
+		return self.group_limits.get(f'{sheet}/{group}', self.group_limits.get(group, self.per_group))
+
+	'''
+		Takes the next job that fits within the limits, rotating through the groups.
+		Must be called with the condition held - returns None if every queued job is blocked.
+	'''
+	def next_job(self):
+		for i in range(len(self.order)):
+			key = self.order[0]
+			self.order.rotate(-1)
+			limit = self.group_limit(key)
+			if limit and self.active_groups.get(key, 0) >= limit:
+				continue
+			queue = self.queues[key]
+			for position, job in enumerate(queue):
+				if self.per_upstream and job.upstream and self.active_upstream.get(job.upstream, 0) >= self.per_upstream:
+					continue
+				del queue[position]
+				if len(queue) == 0:
+					self.order.remove(key)
+					self.queues.pop(key)
+				self.pending -= 1
+				self.active_groups[key] = self.active_groups.get(key, 0) + 1
+				if job.upstream:
+					self.active_upstream[job.upstream] = self.active_upstream.get(job.upstream, 0) + 1
+				return job
+		return None
+
+	def finish(self, job):
+		with self.condition:
+			self.active_groups[(job.sheet, job.group)] -= 1
+			if job.upstream:
+				self.active_upstream[job.upstream] -= 1
+			self.condition.notify_all()
+
+	def worker(self, task, done):
+		while True:
+			with self.condition:
+				job = self.next_job()
+				while job is None:
+					if self.pending == 0:
+						return
+					self.condition.wait()
+					job = self.next_job()
+			try:
+				try:
+					result = task(job)
+				except Exception:
+					log.exception(f'%s: Scan of {job.ip} failed', 'worker')
+					# the host still gets a result so it is not dropped from the list and the negative cache
+					result = {'IP Address': job.ip, 'Make': 'NOLOGIN'}
+				done(job, result)
+			except Exception:
+				log.exception(f'%s: Recording the result of {job.ip} failed', 'worker')
+			finally:
+				self.finish(job)
+
+	'''
+		Runs @param(task)(job) for every queued job and passes each result to @param(done)(job, result).
+		A job whose task raises is passed a NOLOGIN result. Both are called from worker threads - @param(done) must only do thread-safe work.
+		Returns once every job has finished.
+	'''
+	def run(self, task, done):
+		workers = min(self.max_workers, self.pending)
+		log.info(f'%s: Scanning {self.pending} hosts in {len(self.queues)} groups with {workers} workers', 'run')
+		if workers <= 1:
+			return self.worker(task, done)
+		threads = [threading.Thread(target=self.worker, args=(task, done), daemon=True) for i in range(workers)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
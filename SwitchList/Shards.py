@@ -0,0 +1,183 @@
+'''
+	Sharded scanning across several workstations or processes.
+
+	plan splits the targets of a scan.yml into N shards and writes each as its own scan.yml in
+	a shard directory. Any scanner can run a shard: switchlist_generator_crt.py on another
+	SecureCRT workstation, or switchlist_cli.py scan for a headless process. merge then combines
+	the switches.json of every shard into one switches.json (and workbook) with savelist().
+
+		python -m SwitchList.Shards plan scan.yml --shards 4 --times scantimes.json --outdir shards
+		python switchlist_cli.py scan shards/shard-1/scan.yml      (one per shard, anywhere)
+		python -m SwitchList.Shards merge shards/shard-* --out switches.json --excel switches.xlsx
+
+	Hosts are spread by how long they took to scan last time (scantimes.json, written after
+	every scan): the longest host goes to the least loaded shard until all are placed. Hosts
+	without a recorded time count as the median. The split only depends on scan.yml, the shard
+	count and scantimes.json, so the same inputs always give the same shards.
+
+	Reserved addresses go to the first shard. discovery is dropped from shard files - every
+	address of the scan list is assigned to exactly one shard instead.
+'''
+import os, json, logging, argparse
+from . import SwitchMap, Changes
+
+log = logging.getLogger(__name__)
+
+SHARD_DIR = 'shard-{}'
+# seconds per host used when there is no scan history at all
+DEFAULT_SECONDS = 5.0
+
+'''
+	Returns the per-host scan seconds saved by save_times() - empty if @param(infile) does not exist
+'''
+def load_times(infile):
+	if not infile or not os.path.exists(infile):
+		return {}
+	with open(infile, 'r') as timesfile:
+		return json.load(timesfile)
+
+'''
+	Adds the per-host @param(seconds) of a scan (ProgressReporter.seconds) to @param(outfile)
+'''
+def save_times(outfile, seconds):
+	times = load_times(outfile)
+	times.update({ip: round(value, 2) for ip, value in seconds.items()})
+	with open(outfile, 'w') as timesfile:
+		json.dump(times, timesfile, indent=4, sort_keys=True)
+
+'''
+	Returns every address of @param(scan_list) (SwitchMap.parse_list) as (sheet, group, ip) in scan order
+'''
+def list_targets(scan_list):
+	return [(sheet, group, ip) for sheet in scan_list for group in scan_list[sheet] for ip in scan_list[sheet][group]]
+
+'''
+	Splits @param(targets) into @param(shards) lists balanced by @param(times)[ip].
+	Returns the lists (each in scan order) and the expected seconds of each.
+'''
+def split(targets, shards, times=None, reserved=None):
+	times = times or {}
+	reserved = reserved or {}
+	known = sorted(times[ip] for sheet, group, ip in targets if ip in times)
+	default = known[len(known) // 2] if known else DEFAULT_SECONDS
+	cost = {}
+	for position, (sheet, group, ip) in enumerate(targets):
+		cost[position] = 0.0 if ip in reserved else times.get(ip, default)
+	buckets = [[] for i in range(shards)]
+	loads = [0.0] * shards
+	# longest first, ties broken by scan order so the split is reproducible
+	for position in sorted(cost, key=lambda position: (-cost[position], position)):
+		if targets[position][2] in reserved:
+			shard = 0
+		else:
+			shard = min(range(shards), key=lambda i: (loads[i], i))
+		buckets[shard].append(position)
+		loads[shard] += cost[position]
+	return [[targets[position] for position in sorted(bucket)] for bucket in buckets], loads
+
+'''
+	Returns the scan.yml config of each shard of @param(config)
+'''
+def plan(config, shards, times=None):
+	scan_list, reserved = SwitchMap.parse_list(config['scan'])
+	reserved.update(config.get('reserved') or {})
+	buckets, loads = split(list_targets(scan_list), shards, times, reserved)
+	configs = []
+	for number, bucket in enumerate(buckets):
+		shard = {key: value for key, value in config.items() if not key in ('scan', 'reserved', 'discovery')}
+		shard['scan'] = {}
+		for sheet, group, ip in bucket:
+			shard['scan'].setdefault(sheet, {}).setdefault(group, []).append(ip)
+		shard['reserved'] = reserved if number == 0 else {}
+		configs.append(shard)
+		log.info(f'%s: Shard {number + 1}: {len(bucket)} hosts, ~{loads[number]:.0f}s', 'plan')
+	return configs, loads
+
+'''
+	Returns the shard results in @param(shard_dirs) as one savelist() grouplist. Only hosts in
+	each shard's own scan.yml are taken, so a reused shard directory cannot bring back stale hosts.
+'''
+def collect(shard_dirs):
+	import yaml
+	grouplist = {}
+	times = {}
+	for directory in shard_dirs:
+		with open(os.path.join(directory, 'scan.yml'), 'r') as configfile:
+			scan_list, reserved = SwitchMap.parse_list(yaml.safe_load(configfile)['scan'])
+		jsonfile = os.path.join(directory, 'switches.json')
+		if not os.path.exists(jsonfile):
+			log.error(f'%s: {directory} has no switches.json - its hosts are left as they were', 'collect')
+			continue
+		with open(jsonfile, 'r') as jsonlist:
+			results = json.load(jsonlist)
+		for sheet, group, ip in list_targets(scan_list):
+			host = results.get(sheet, {}).get(group, {}).get(ip)
+			if host is None:
+				# skipped by the negative cache or not scanned
+				continue
+			if ip in grouplist.get(sheet, {}).get(group, {}):
+				log.warning(f'%s: {ip} was scanned by more than one shard', 'collect')
+			grouplist.setdefault(sheet, {}).setdefault(group, {})[ip] = host
+		times.update(load_times(os.path.join(directory, 'scantimes.json')))
+	return grouplist, times
+
+'''
+	Merges the shard results in @param(shard_dirs) into @param(outfile) (switches.json) and writes
+	the change report (changes.json, snapshot.json) beside it. Returns the merged list as savelist() does
+'''
+def merge(shard_dirs, outfile, timesfile=''):
+	current_switches = {}
+	if os.path.exists(outfile):
+		with open(outfile, 'r') as jsonlist:
+			current_switches = json.load(jsonlist)
+	grouplist, times = collect(shard_dirs)
+	if timesfile:
+		save_times(timesfile, times)
+	directory = os.path.dirname(os.path.abspath(outfile))
+	changes = Changes.ChangeReport.load(os.path.join(directory, 'snapshot.json'), current_switches)
+	changes.compare(grouplist)
+	changes.save(os.path.join(directory, 'snapshot.json'))
+	changes.write(os.path.join(directory, 'changes.json'))
+	hosts = sum(len(group) for sheet in grouplist.values() for group in sheet.values())
+	log.info(f'%s: Merging {hosts} hosts from {len(shard_dirs)} shards into {outfile}', 'merge')
+	return SwitchMap.savelist(grouplist, current_switches, outfile)
+
+def main():
+	parser = argparse.ArgumentParser(description='Split a scan across several scanners and merge the results')
+	commands = parser.add_subparsers(dest='command', required=True)
+	plan_parser = commands.add_parser('plan', help='Write one scan.yml per shard')
+	plan_parser.add_argument('scanfile', help='scan.yml to split')
+	plan_parser.add_argument('--shards', type=int, required=True)
+	plan_parser.add_argument('--times', default='scantimes.json', help='Per-host scan seconds of earlier runs')
+	plan_parser.add_argument('--outdir', default='shards', help=f'Directory for the {SHARD_DIR.format("N")} directories')
+	merge_parser = commands.add_parser('merge', help='Combine shard results into one switches.json')
+	merge_parser.add_argument('shard_dirs', nargs='+')
+	merge_parser.add_argument('--out', default='switches.json')
+	merge_parser.add_argument('--times', default='scantimes.json', help='Where to keep the shards\' scan times for the next plan')
+	merge_parser.add_argument('--excel', help='Also write the Excel list to this workbook')
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.INFO)
+
+	if args.command == 'plan':
+		import yaml
+		with open(args.scanfile, 'r') as configfile:
+			config = yaml.safe_load(configfile)
+		configs, loads = plan(config, args.shards, load_times(args.times))
+		for number, shard in enumerate(configs, 1):
+			directory = os.path.join(args.outdir, SHARD_DIR.format(number))
+			os.makedirs(directory, exist_ok=True)
+			with open(os.path.join(directory, 'scan.yml'), 'w') as shardfile:
+				yaml.safe_dump(shard, shardfile, sort_keys=False)
+			print(f'{directory}: {len(list_targets(shard["scan"]))} hosts, ~{loads[number - 1]:.0f}s')
+		return
+
+	mergelist = merge(args.shard_dirs, args.out, args.times)
+	if args.excel:
+		from . import Excel
+		outfile = os.path.abspath(args.excel)
+		# update_file() writes its temporary workbook to the working directory
+		os.chdir(os.path.dirname(outfile))
+		Excel.update_file(outfile, mergelist)
+
+if __name__ == "__main__":
+	main()
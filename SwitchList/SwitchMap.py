@@ -7,7 +7,7 @@
 #	1 APR 2021
 
 
-import os, json, traceback, logging
+import os, json, time, traceback, logging
 from ipaddress import ip_address, ip_network
 from datetime import datetime
 
@@ -16,14 +16,51 @@ log = logging.Logger(__name__)
 # Compare serial lists of two stacks: 
 # returns Added, Removed lists
 def stack_compare(old, current):
-	added = current.copy()
-	removed = old.copy()
-	for serial in old:
-		if serial in current:
-			removed.remove(serial)
-			added.remove(serial)
+	old_set = set(old)
+	current_set = set(current)
+	added = [serial for serial in current if not serial in old_set]
+	removed = [serial for serial in old if not serial in current_set]
 	return added, removed
 
+'''
+	Compact summary of a scanned device as returned by map_host().
+
+	Holds only the fields written to switches.json and reads like the dict from switch.json()
+	(record['Make'], dict.update(record), etc.) so savelist() can merge it as before.
+'''
+class DeviceRecord:
+	FIELDS = {
+		'Hostname': 'hostname',
+		'IP Address': 'ip',
+		'Subnet Mask': 'subnet',
+		'Make': 'make',
+		'Model': 'model',
+		'Firmware': 'firmware',
+		'Serial': 'serial',
+		'Upstream': 'upstream',
+		'FIPS Mode': 'fips'
+	}
+	__slots__ = tuple(FIELDS.values())
+
+	def __init__(self, data):
+		for key, slot in self.FIELDS.items():
+			setattr(self, slot, data.get(key, ''))
+
+	def __getitem__(self, key):
+		return getattr(self, self.FIELDS[key])
+
+	def __contains__(self, key):
+		return key in self.FIELDS
+
+	def get(self, key, default=None):
+		return getattr(self, self.FIELDS[key]) if key in self.FIELDS else default
+
+	def keys(self):
+		return self.FIELDS.keys()
+
+	def json(self):
+		return {key: getattr(self, slot) for key, slot in self.FIELDS.items()}
+
 '''
 	Takes @param(grouplist) - a dictionary of subnets keyed by group name 
 	and merges them into the existing dictionary and write to @param(outfile)
@@ -79,11 +116,17 @@ def savelist(grouplist, mergelist, outfile):
 	return mergelist
 
 '''
-	Pulls all information from and returns JSON representation of device @param(switch)
+	Pulls all information from @param(switch) and returns it as a DeviceRecord.
+	Raw output held by the switch Object is released once the record has been built.
+
+	Each object in @param(collectors) has collect(switch) called once the device has been
+	parsed so fleet-wide indexes (ex. AclEngine.FleetAcls) can be built during the scan.
+	Full MAC/ARP tables are only pulled if a collector sets needs_tables.
 '''
-def map_host(switch):
+def map_host(switch, collectors=()):
 	if not switch:
 		raise Exception('Offline')
+	switch.read_tables = any(getattr(collector, 'needs_tables', False) for collector in collectors)
 	try:
 		if switch.make == 'Cisco':
 			switch.readinfo()
@@ -94,12 +137,48 @@ def map_host(switch):
 			switch.parse_fips()
 		else:
 			switch.readinfo()
+		for collector in collectors:
+			collector.collect(switch)
 	except:
 		log.error(f'%s: {traceback.print_exc()}','map_host')
 	finally:
-		if switch and switch.connected:
+		# pooled sessions stay open for later operations (see Sessions.SessionPool)
+		if getattr(switch, 'pool', None) is not None:
+			switch.pool.release(switch)
+		elif switch and switch.connected():
 			switch.disconnect()
-	return switch.json()
+	record = DeviceRecord(switch.json())
+	switch.release()
+	return record
+
+'''
+	Returns the CDP (Cisco) or LLDP (Brocade) neighbors of a mapped @param(switch) keyed by local port
+'''
+def get_neighbors(switch):
+	if switch.make == 'Cisco':
+		return switch.cdp if hasattr(switch, 'cdp') else switch.parse_cdp()
+	return switch.lldp if len(switch.lldp) > 0 else switch.parse_lldp()
+
+'''
+	Connects to @param(ip) using @param(connect) - a function taking the IP and returning a
+	switch Object (or None if offline) - and maps it with map_host()
+
+	Returns the DeviceRecord of the device or an Offline/NOLOGIN placeholder dict.
+	The result is reported to @param(progress) (Progress.ProgressReporter) if given.
+'''
+def scan_host(connect, ip, collectors=(), progress=None):
+	if progress:
+		progress.start(ip)
+	start = time.monotonic()
+	try:
+		result = map_host(connect(ip), collectors)
+	except Exception as e:
+		if str(e) != 'Offline':
+			log.error(f'%s: {traceback.print_exc()}', 'scan_host')
+		result = {'IP Address': ip, 'Make': 'NOLOGIN' if str(e) != 'Offline' else 'Offline'}
+	if progress:
+		progress.finish(ip, result, time.monotonic() - start)
+	return result
 
 '''
 	Returns a list of IP addresses in a range denoted with a '-'
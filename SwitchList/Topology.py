@@ -0,0 +1,221 @@
+'''
+	Fleet-level topology graph built from the neighbor data collected during a scan.
+
+	Devices are nodes (keyed by hostname) and CDP/LLDP/OSPF adjacencies are edges. The
+	upstream host found by parse_cdp()/parse_lldp() on each device is kept as a parent
+	pointer so path-to-core and downstream blast radius queries only walk the nodes involved.
+
+	Pass a TopologyGraph to SwitchMap.map_host() as a collector to build it as hosts finish.
+'''
+import json, logging
+from collections import deque
+from . import SwitchMap
+
+log = logging.getLogger(__name__)
+
+class TopologyGraph:
+	def __init__(self, cores=()):
+		self.nodes = {}
+		# node -> {neighbor: [{'protocol':.., 'local_port':.., 'distant_port':..}]}
+		self.adjacency = {}
+		self.upstream = {}
+		self.downstream = {}
+		# IP address -> node
+		self.aliases = {}
+		self.cores = set(cores)
+
+	'''
+		Returns the node for a hostname or IP address, creating a placeholder if it does not exist
+	'''
+	def resolve(self, name):
+		if name in self.aliases:
+			return self.aliases[name]
+		if not name in self.nodes:
+			self.nodes[name] = {'scanned': False}
+			self.adjacency[name] = {}
+		return name
+
+	'''
+		Adds or updates a node and records its IP addresses as aliases.
+		Placeholder nodes previously created from a bare IP (OSPF neighbors) are merged in.
+	'''
+	def add_node(self, node, ips=(), **attrs):
+		self.resolve(node)
+		for ip in ips:
+			if ip != node and ip in self.nodes and not ip in self.aliases:
+				self.merge(ip, node)
+			self.aliases[ip] = node
+		self.nodes[node].update(attrs)
+		return node
+
+	'''
+		Moves all edges and upstream/downstream links of @param(old) onto @param(new)
+	'''
+	def merge(self, old, new):
+		log.debug(f'%s: Merging node {old} into {new}', 'merge')
+		for neighbor, links in self.adjacency.pop(old).items():
+			self.adjacency[neighbor].pop(old, None)
+			for link in links:
+				self.add_edge(new, neighbor, **link)
+		attrs = self.nodes.pop(old)
+		for key, value in attrs.items():
+			self.nodes[new].setdefault(key, value)
+		if old in self.upstream:
+			self.set_upstream(new, self.upstream[old])
+			self.downstream[self.upstream.pop(old)].discard(old)
+		for child in self.downstream.pop(old, set()):
+			self.upstream[child] = new
+			self.downstream.setdefault(new, set()).add(child)
+		for ip, node in self.aliases.items():
+			if node == old:
+				self.aliases[ip] = new
+		if old in self.cores:
+			self.cores.discard(old)
+			self.cores.add(new)
+
+	def add_edge(self, node, neighbor, protocol='', local_port='', distant_port=''):
+		if node == neighbor:
+			return
+		link = {'protocol': protocol, 'local_port': local_port, 'distant_port': distant_port}
+		links = self.adjacency[node].setdefault(neighbor, [])
+		if not link in links:
+			links.append(link)
+		reverse = {'protocol': protocol, 'local_port': distant_port, 'distant_port': local_port}
+		links = self.adjacency[neighbor].setdefault(node, [])
+		if not reverse in links:
+			links.append(reverse)
+
+	def set_upstream(self, node, parent):
+		if node == parent:
+			return
+		previous = self.upstream.get(node)
+		if previous is not None:
+			self.downstream[previous].discard(node)
+		self.upstream[node] = parent
+		self.downstream.setdefault(parent, set()).add(node)
+
+	'''
+		Adds a mapped device and its neighbors to the graph (SwitchMap.map_host collector)
+	'''
+	def collect(self, switch):
+		hostname = switch.hostname if switch.hostname else switch.ip
+		ips = {switch.ip}
+		ips.update(getattr(switch, 'ips', set()))
+		node = self.add_node(hostname, ips,
+			scanned=True,
+			ip=switch.ip,
+			make=switch.make,
+			model=getattr(switch, 'model', [])
+		)
+		protocol = 'CDP' if switch.make == 'Cisco' else 'LLDP'
+		neighbors = SwitchMap.get_neighbors(switch)
+		for port, neighbor in neighbors.items():
+			if 'distant_host' in neighbor:
+				neighbor_ips = [neighbor['distant_ip']] if 'distant_ip' in neighbor else []
+				remote = self.add_node(neighbor['distant_host'], neighbor_ips)
+			elif 'distant_ip' in neighbor:
+				remote = self.resolve(neighbor['distant_ip'])
+			else:
+				continue
+			self.add_edge(node, remote, protocol, port, neighbor.get('distant_port', ''))
+		if switch.make == 'Cisco' and len(getattr(switch, 'ospf_string', '')) > 0:
+			for port, neighbor in switch.parse_ospf_neighbors().items():
+				self.add_edge(node, self.resolve(neighbor['neighbor_ip']), 'OSPF', port, '')
+		upstream_host = getattr(switch, 'upstream_host', 'N/A')
+		if upstream_host != 'N/A':
+			self.set_upstream(node, self.resolve(upstream_host))
+
+	'''
+		Returns the list of nodes from @param(node) up to the core.
+		Follows upstream pointers first and falls back to the shortest adjacency path to a
+		configured core if the upstream chain does not end at one.
+	'''
+	def path_to_core(self, node):
+		node = self.resolve(node)
+		path = [node]
+		seen = {node}
+		while path[-1] in self.upstream and not path[-1] in self.cores:
+			parent = self.upstream[path[-1]]
+			if parent in seen:
+				log.warning(f'%s: Upstream loop found at {parent}', 'path_to_core')
+				break
+			seen.add(parent)
+			path.append(parent)
+		if len(self.cores) == 0 or path[-1] in self.cores:
+			return path
+		return self.shortest_path(node, self.cores) or path
+
+	'''
+		Breadth-first search across adjacencies from @param(node) to any node in @param(targets)
+	'''
+	def shortest_path(self, node, targets):
+		previous = {node: None}
+		queue = deque([node])
+		while queue:
+			current = queue.popleft()
+			if current in targets:
+				path = []
+				while current is not None:
+					path.append(current)
+					current = previous[current]
+				return path[::-1]
+			for neighbor in self.adjacency[current]:
+				if not neighbor in previous:
+					previous[neighbor] = current
+					queue.append(neighbor)
+		return []
+
+	'''
+		Returns every node whose upstream path passes through @param(node)
+	'''
+	def blast_radius(self, node):
+		node = self.resolve(node)
+		affected = set()
+		queue = deque(self.downstream.get(node, ()))
+		while queue:
+			child = queue.popleft()
+			if child in affected or child == node:
+				continue
+			affected.add(child)
+			queue.extend(self.downstream.get(child, ()))
+		return affected
+
+	'''
+		Returns scanned devices that cannot be traced upstream:
+		with cores configured, any device whose path does not reach a core,
+		otherwise any device with no upstream and nothing downstream of it
+	'''
+	def orphans(self):
+		orphaned = []
+		for node, attrs in self.nodes.items():
+			if not attrs.get('scanned') or node in self.cores:
+				continue
+			if len(self.cores) > 0:
+				if not self.path_to_core(node)[-1] in self.cores:
+					orphaned.append(node)
+			elif not node in self.upstream and len(self.downstream.get(node, ())) == 0:
+				orphaned.append(node)
+		return orphaned
+
+	'''
+		JSON output for the SwitchJS WebApp
+	'''
+	def json(self):
+		nodes = {}
+		for node, attrs in self.nodes.items():
+			nodes[node] = dict(attrs)
+			nodes[node]['upstream'] = self.upstream.get(node, '')
+			nodes[node]['downstream'] = sorted(self.downstream.get(node, ()))
+			nodes[node]['core'] = node in self.cores
+		edges = []
+		for node in self.adjacency:
+			for neighbor, links in self.adjacency[node].items():
+				# each link is stored in both directions - only export one
+				if node < neighbor:
+					for link in links:
+						edges.append(dict(link, source=node, target=neighbor))
+		return {'nodes': nodes, 'edges': edges}
+
+	def save(self, outfile):
+		with open(outfile, 'w') as topofile:
+			json.dump(self.json(), topofile, indent=4)
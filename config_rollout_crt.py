@@ -0,0 +1,63 @@
+# $language = "python"
+# $interface = "1.0"
+import SecureCRT
+
+import logging, os, yaml, json, traceback
+from SwitchList import Rollout
+from switch_src import Switch as SSH
+
+'''
+    Rolls a config set out in waves - see SwitchList/Rollout.py for the rollout file format
+'''
+def main():
+    rolloutfile = crt.Dialog.FileOpenDialog("Rollout file","Open",filter="YAML files (*.yml)|*.yml|*.yaml||")
+    if not rolloutfile:
+        return
+    outdir = "\\".join(rolloutfile.split("\\")[:-1])
+    logfile = "%s\\rollout.log" % outdir
+    reportfile = "%s\\rollout.json" % outdir
+    jsonfile = "%s\\switches.json" % outdir
+    timeoutfile = "%s\\timeouts.json" % outdir
+
+    # Logging setup
+    logging.basicConfig(level=logging.INFO, filename=logfile, filemode='w')
+
+    try:
+        with open(rolloutfile, 'r') as configfile:
+            config = yaml.safe_load(configfile)
+        configset = Rollout.ConfigSet.from_config(config)
+    except Exception:
+        return logging.error(traceback.format_exc(), 'main')
+    targets = config.get('targets', [])
+    if len(targets) == 0:
+        return logging.error('No targets in %s' % rolloutfile, 'main')
+
+    # Upstream devices from the last scan so per_upstream can spread the load
+    upstream = {}
+    if os.path.exists(jsonfile):
+        with open(jsonfile, 'r') as jsonlist:
+            for sheet in json.load(jsonlist).values():
+                for group in sheet.values():
+                    for ip, host in group.items():
+                        upstream[ip] = host.get('Upstream', '')
+
+    username, password = SSH.info_prompt()
+    SSH.framing = config.get('framing', False)
+    SSH.timeouts.load(timeoutfile)
+    # Sessions stay open from configuration until write mem at the end of the wave
+    pool = SSH.SessionPool(lambda ip: SSH.connect(crt, username, password, ip), config.get('session_idle_timeout', 300))
+    rollout = Rollout.Rollout.from_config(configset, pool.connect, config.get('waves', {}) or {})
+    try:
+        rollout.run(targets, upstream)
+    finally:
+        pool.close_all()
+        rollout.save(reportfile)
+        SSH.timeouts.save(timeoutfile)
+    summary = ', '.join('%s %s' % (count, status) for status, count in rollout.summary().items())
+    if rollout.stopped:
+        crt.Dialog.MessageBox('Rollout stopped - %s\n%s\nSee %s' % (rollout.stopped, summary, reportfile))
+    else:
+        crt.Dialog.MessageBox('Rollout complete\n%s' % summary)
+    logging.info('Completed Successfully!')
+
+main()
@@ -0,0 +1,305 @@
+'''
+    Compiles the ACE dicts produced by Cisco.parse_acl() into an indexed match structure
+    so that large batches of flows can be checked against every ACL in the fleet without
+    walking each ACE as a string comparison.
+
+    Each ACL is compiled into:
+        - a bitmask per protocol (an ACE's bit position is its position in the ACL)
+        - a source prefix table and a destination prefix table, keyed by prefix length,
+          where each prefix maps to the bitmask of every ACE matching that prefix
+
+    A flow lookup ORs together the masks found along the source and destination prefixes,
+    ANDs them with the protocol mask, and the lowest set bit is the first ACE (in sequence
+    order) that matches. No match is an implicit deny.
+
+    An address or protocol that cannot be compiled (object-groups, etc.) matches every flow,
+    so its ACE still takes its place in sequence order. When such an ACE is the first hit the
+    result is indeterminate (permit is None) rather than falling through to a later ACE.
+
+    Flows carry no ports, so ACEs qualified by ports or anything else after the destination
+    ('eq 23', 'range ..', 'established', ICMP types, ...) are indeterminate in the same way.
+
+    Collected during a scan with 'acls: true' in the scan file and saved to acls.json, which
+    can be queried without touching the network:
+        python switch_src/AclEngine.py acls.json tcp 192.168.1.10 10.0.0.1
+'''
+import argparse, json, logging, os
+from ipaddress import ip_address
+log = logging.getLogger(__name__)
+
+PROTOCOL_NUMBERS = {
+    '1': 'icmp',
+    '2': 'igmp',
+    '6': 'tcp',
+    '17': 'udp',
+    '47': 'gre',
+    '50': 'esp',
+    '51': 'ahp',
+    '88': 'eigrp',
+    '89': 'ospf',
+    '112': 'vrrp',
+}
+MASKS = [(0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF for length in range(33)]
+
+'''
+    Converts an ACE address string into (network, wildcard) integers.
+
+    ex.
+        'any'                       -> (0, 0xFFFFFFFF)
+        'host 192.168.0.1'          -> (3232235521, 0)
+        '192.168.0.0 0.0.0.255'     -> (3232235520, 255)
+        '192.168.0.0/24'            -> (3232235520, 255)
+        '192.168.0.1'               -> (3232235521, 0) # standard ACL single host
+
+    returns None for anything that cannot be compiled (object-groups, etc.)
+'''
+def parse_address(address):
+    sections = address.split()
+    try:
+        if len(sections) == 0 or sections[0] == 'any':
+            return 0, 0xFFFFFFFF
+        if sections[0] == 'host':
+            return int(ip_address(sections[1])), 0
+        if '/' in sections[0]:
+            network, length = sections[0].split('/')
+            wildcard = ~MASKS[int(length)] & 0xFFFFFFFF
+            return int(ip_address(network)) & ~wildcard, wildcard
+        if len(sections) == 1:
+            return int(ip_address(sections[0])), 0
+        wildcard = int(ip_address(sections[1]))
+        return int(ip_address(sections[0])) & ~wildcard, wildcard
+    except (ValueError, IndexError):
+        return None
+
+def normalize_protocol(protocol):
+    protocol = protocol.lower()
+    return PROTOCOL_NUMBERS.get(protocol, protocol)
+
+'''
+    Prefix lookup table for one side (source or destination) of an ACL.
+
+    Contiguous wildcards are stored by prefix length so a lookup is one dict probe per
+    distinct prefix length in the ACL. Non-contiguous wildcards are rare and are kept
+    in a short list checked by masking.
+'''
+class PrefixTable:
+    def __init__(self):
+        self.lengths = {}
+        self.sparse = []
+
+    def add(self, network, wildcard, bit):
+        length = 32 - wildcard.bit_length()
+        if wildcard == (~MASKS[length] & 0xFFFFFFFF):
+            table = self.lengths.setdefault(length, {})
+            table[network] = table.get(network, 0) | bit
+        else:
+            self.sparse.append((network, ~wildcard & 0xFFFFFFFF, bit))
+
+    def lookup(self, ip):
+        found = 0
+        for length, table in self.lengths.items():
+            found |= table.get(ip & MASKS[length], 0)
+        for network, mask, bit in self.sparse:
+            if ip & mask == network:
+                found |= bit
+        return found
+
+'''
+    A single compiled ACL. Built from the 'config' list of one entry in Cisco.acls
+'''
+class CompiledAcl:
+    def __init__(self, name, aces):
+        self.name = name
+        self.aces = []
+        self.permits = 0
+        self.protocols = {}
+        self.source = PrefixTable()
+        self.destination = PrefixTable()
+        # ACEs with a part that could not be compiled
+        self.indeterminate = 0
+        for ace in aces:
+            # fragment entries never match the initial packet of a flow
+            if 'fragments' in ace['match-type']:
+                continue
+            bit = 1 << len(self.aces)
+            self.aces.append(ace)
+            if ace['permit']:
+                self.permits |= bit
+            source = parse_address(ace['source'])
+            destination = parse_address(ace['destination'])
+            protocol = normalize_protocol(ace['protocol'])
+            if ace.get('source-port') or ace['match-type']:
+                # matches only part of the flows to its addresses
+                self.indeterminate |= bit
+            if source is None or destination is None or protocol == 'object-group':
+                log.warning(f'%s: ACL {name} - unable to compile ACE {ace}, flows it may match are indeterminate', 'CompiledAcl')
+                self.indeterminate |= bit
+                source = source or (0, 0xFFFFFFFF)
+                destination = destination or (0, 0xFFFFFFFF)
+                if protocol == 'object-group':
+                    protocol = 'ip'
+            self.protocols[protocol] = self.protocols.get(protocol, 0) | bit
+            self.source.add(*source, bit)
+            self.destination.add(*destination, bit)
+
+    '''
+        Returns the bitmask of ACEs that apply to @param(protocol)
+    '''
+    def protocol_mask(self, protocol):
+        return self.protocols.get(protocol, 0) | self.protocols.get('ip', 0)
+
+    '''
+        Evaluates a single flow where @param(source) and @param(destination) are integers
+
+        returns
+            (permit, ace) - ace is the first matching ACE dict or None for the implicit deny.
+                            permit is None if that ACE could not be compiled
+    '''
+    def match(self, protocol, source, destination):
+        hits = self.protocol_mask(protocol)
+        if hits:
+            hits &= self.source.lookup(source)
+        if hits:
+            hits &= self.destination.lookup(destination)
+        if not hits:
+            return False, None
+        first = hits & -hits
+        if self.indeterminate & first:
+            return None, self.aces[first.bit_length() - 1]
+        return bool(self.permits & first), self.aces[first.bit_length() - 1]
+
+'''
+    Converts a list of flows into the (protocol, source, destination) integer form
+    used by CompiledAcl.match()
+
+    @param(flows) - iterable of (protocol, source_ip, destination_ip) string tuples
+        ex. [('tcp', '192.168.1.10', '10.0.0.1'), ...]
+'''
+def prepare_flows(flows):
+    prepared = []
+    for protocol, source, destination in flows:
+        prepared.append((normalize_protocol(protocol), int(ip_address(source)), int(ip_address(destination))))
+    return prepared
+
+'''
+    Compiles a dict of ACLs as returned by Cisco.parse_acl()
+
+    returns
+        compiled - dict of CompiledAcl keyed by ACL name
+'''
+def compile_acls(acls):
+    compiled = {}
+    for name, acl in acls.items():
+        compiled[name] = CompiledAcl(name, acl['config'])
+    return compiled
+
+'''
+    Holds every compiled ACL for every scanned device and answers batch flow queries.
+    Used as a SwitchMap.map_host collector or filled directly with add_device()
+
+    ex.
+        fleet = FleetAcls()
+        fleet.add_device(switch)
+        results = fleet.evaluate([('tcp', '192.168.1.10', '10.0.0.1')])
+        {
+            ('192.168.0.2', 'VTY_ACL'): [(True, {...ACE...})]
+        }
+'''
+class FleetAcls:
+    def __init__(self):
+        self.devices = {}
+        # device_ip -> {'hostname':.., 'acls': {name: [ACE dicts]}} - what save() writes
+        self.sources = {}
+
+    def add_device(self, switch):
+        if switch.make != 'Cisco':
+            return {}
+        if len(switch.acls) == 0:
+            switch.parse_acl()
+        self.sources[switch.ip] = {'hostname': switch.hostname, 'acls': {name: acl['config'] for name, acl in switch.acls.items()}}
+        compiled = compile_acls(switch.acls)
+        self.devices[switch.ip] = compiled
+        log.debug(f'%s: Compiled {len(compiled)} ACLs for {switch.ip}', 'add_device')
+        return compiled
+
+    def collect(self, switch):
+        self.add_device(switch)
+
+    '''
+        Evaluates every flow against every ACL (or only @param(devices) / @param(acl_names) if given)
+
+        returns
+            results - dict keyed by (device_ip, acl_name) of lists of (permit, ace) in flow order.
+                      permit is True, False or None when indeterminate (see CompiledAcl.match)
+    '''
+    def evaluate(self, flows, devices=None, acl_names=None):
+        prepared = prepare_flows(flows)
+        results = {}
+        for device_ip, compiled in self.devices.items():
+            if devices is not None and not device_ip in devices:
+                continue
+            for name, acl in compiled.items():
+                if acl_names is not None and not name in acl_names:
+                    continue
+                match = acl.match
+                results[(device_ip, name)] = [match(*flow) for flow in prepared]
+        return results
+
+    '''
+        Returns only the (device_ip, acl_name) pairs that permit the flow
+        (indeterminate results are left out - see evaluate())
+    '''
+    def permitted_by(self, protocol, source, destination):
+        results = self.evaluate([(protocol, source, destination)])
+        return [key for key, matches in results.items() if matches[0][0] is True]
+
+    def save(self, outfile):
+        with open(outfile, 'w') as aclfile:
+            json.dump(self.sources, aclfile)
+
+    '''
+        Loads and compiles the ACLs saved by save() - returns an empty fleet if @param(infile) does not exist.
+        Devices scanned again replace their saved ACLs.
+    '''
+    @staticmethod
+    def load(infile):
+        fleet = FleetAcls()
+        if not os.path.exists(infile):
+            log.warning(f'%s: Creating fleet ACL file: {os.path.abspath(infile)}', 'load')
+            return fleet
+        with open(infile, 'r') as aclfile:
+            fleet.sources = json.load(aclfile)
+        for device_ip, device in fleet.sources.items():
+            fleet.devices[device_ip] = compile_acls({name: {'config': aces} for name, aces in device['acls'].items()})
+        return fleet
+
+'''
+    Returns @param(ace) as a short line for output ex. '20 permit tcp any host 10.0.0.1 22'
+'''
+def describe(ace):
+    if ace is None:
+        return 'implicit deny'
+    fields = [ace['sequence_no'], 'permit' if ace['permit'] else 'deny', ace['protocol'], ace['source'],
+        ace.get('source-port', ''), ace['destination'], ace['match-type']]
+    return ' '.join(field for field in fields if field)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check a flow against every ACL saved by the switchlist generator')
+    parser.add_argument('aclfile', help='Fleet ACLs saved by the switchlist generator (acls.json)')
+    parser.add_argument('protocol', help='ex. tcp, udp, icmp or a protocol number')
+    parser.add_argument('source', help='Source IP address')
+    parser.add_argument('destination', help='Destination IP address')
+    parser.add_argument('--acl', action='append', help='Only these ACL names')
+    parser.add_argument('--permitted', action='store_true', help='Only list the ACLs that permit the flow')
+    args = parser.parse_args()
+
+    fleet = FleetAcls.load(args.aclfile)
+    results = fleet.evaluate([(args.protocol, args.source, args.destination)], acl_names=args.acl)
+    for (device_ip, name), [(permit, ace)] in sorted(results.items()):
+        if args.permitted and permit is not True:
+            continue
+        verdict = {True: 'permit', False: 'deny', None: 'indeterminate'}[permit]
+        print(f'{fleet.sources[device_ip]["hostname"]} ({device_ip}) {name}: {verdict} - {describe(ace)}')
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import re, logging, traceback, json, os
-import IPUtils
+import IPUtils, Tables, Metrics, Timeouts, Framing
+from LineGrammar import Grammar
 log = logging.getLogger(__name__)
 
 mabgroups = {
@@ -23,6 +24,83 @@ MABGROUPS = {
     '1495_AMMO': '1495_AMMO'
 }
 
+'''
+    Keyword grammars for the output sections parsed by the Brocade class (see LineGrammar).
+    Each handler is called as handler(device, state, line) with the stripped output line.
+'''
+VERSION_GRAMMAR = Grammar('version')
+LLDP_GRAMMAR = Grammar('lldp')
+CONFIG_GRAMMAR = Grammar('config')
+
+# show version - state holds the models/serials lists and the uptime/firmware strings
+# 'HW:Stackable ICX7150-24' has no space after the keyword so these match by characters
+@VERSION_GRAMMAR.rule_startswith('HW')
+def version_model(device, state, line):
+    state['models'].append(line.split()[-1])
+
+@VERSION_GRAMMAR.rule_startswith('SW')
+def version_firmware(device, state, line):
+    state['firmware'] = line.split()[-1]
+
+@VERSION_GRAMMAR.rule_startswith('Serial')
+def version_serial(device, state, line):
+    state['serials'].append(line.split(':')[1].strip())
+
+@VERSION_GRAMMAR.rule_contains('uptime')
+def version_uptime(device, state, line):
+    # example "device uptime is 1 day(s) 2 hour(s) 6 minute(s)"
+    # save everything after " is " and remove parentheses
+    state['uptime'] = line.split(' is ')[-1].replace('(s)','s')
+
+# show lldp neighbors detail - state holds the neighbor currently being read
+@LLDP_GRAMMAR.rule('Local port:')
+def lldp_local_port(device, state, line):
+    state['local_port'] = line.split()[-1]
+
+@LLDP_GRAMMAR.rule('+ Port ID')
+def lldp_distant_port(device, state, line):
+    # line example: + Port ID (interface name): "Gi1/0/12"
+    # remove quotation marks when saving port ID
+    state['distant_port'] = line.split()[-1].replace('"','')
+
+@LLDP_GRAMMAR.rule('+ System name')
+def lldp_distant_host(device, state, line):
+    # save hostname and remove quotes
+    distant_host = line.split()[-1].replace('"','')
+    # remove FQDN suffix
+    state['distant_host'] = distant_host.split('.')[0]
+
+@LLDP_GRAMMAR.rule('+ Management address')
+def lldp_distant_ip(device, state, line):
+    state['distant_ip'] = line.split()[-1]
+
+# Only save port if it is a trunk (i.e. assigned to dead VLAN 999)
+@LLDP_GRAMMAR.rule('+ Port VLAN ID:')
+def lldp_port_vlan(device, state, line):
+    if not line.endswith('999'):
+        return
+    local_port = state['local_port']
+    lldp = state['lldp']
+    lldp.setdefault(local_port, {})
+    lldp[local_port]['distant_host'] = state['distant_host']
+    lldp[local_port]['distant_port'] = state['distant_port']
+    lldp[local_port]['distant_ip'] = state['distant_ip']
+    if local_port == device.upstream_local:
+        state['upstream_port_distant'] = state['distant_port']
+        state['upstream_host'] = state['distant_host']
+
+# show run - global lines only
+@CONFIG_GRAMMAR.rule('ip address')
+def config_ip_address(device, state, line):
+    device.subnet = line.split()[-1]
+    device.ip = line.split()[-2]
+
+@CONFIG_GRAMMAR.rule('hostname')
+def config_hostname(device, state, line):
+    hostname = line.split()[-1]
+    device.hostname = hostname.split('.')[0]
+
+@Metrics.instrument
 class Brocade:
     def __init__(self, **kwargs):
         self.make = 'Brocade'
@@ -34,6 +112,11 @@ class Brocade:
         self.hostname = ''
         self.lldp_string = ''
         self.mgmt_interface = ''
+        self.upstream_local = ''
+        # capture the full MAC table in read_local
+        self.read_tables = True
+        # detect end of output with a sentinel comment instead of the prompt (see Framing)
+        self.framing = False
         self.int_status_string = ''
         self.uptime = '0 days 0 minutes 0 seconds'
         
@@ -78,17 +161,25 @@ class Brocade:
         # Using SecureCRT
         if self.conn_type == 'CRT':
             log.debug(f'%s: Sending string: {command}', 'send')
+            if self.framing:
+                output = Framing.crt_send(self, command)
+                if 'Invalid input' in output:
+                    log.warning(f'%s: {output}', 'send')
+                    raise ValueError(output)
+                return output
             if prompt == '':
                 prompt = self.prompt
             self.crtTab.Screen.Send('%s\r' % command)
             self.crtTab.Screen.WaitForString('\r\n') # ignore input line
-            output = self.crtTab.Screen.ReadString(prompt, 5)
+            output = Timeouts.crt_read(self, command, prompt)
             if 'Invalid input' in output:
                 log.warning(f'%s: {output}', 'send')
                 raise ValueError(output)
             return output
         # Using Netmiko
-        return self.conn.send_command(command)
+        if self.framing:
+            return Framing.netmiko_send(self, command)
+        return Timeouts.netmiko_send(self, command)
         
     '''
         Health check - confirm logged in
@@ -102,6 +193,20 @@ class Brocade:
             return self.crtTab.connected
         return self.conn.is_alive()
         
+    '''
+        Drops raw command output and parsed structures once the device summary (json()) has been
+        produced so finished devices do not hold onto full captures until garbage collection
+    '''
+    def release(self):
+        for attr in ('ver_string', 'mac_string', 'arp_string', 'mac_table', 'arp_table'):
+            vars(self).pop(attr, None)
+        self.config = ''
+        self.lldp = {}
+        self.lldp_string = ''
+        self.int_status_string = ''
+        if self.conn_type == 'OFFLINE':
+            self.conn = {}
+
     '''
         Disconnect current session
     '''
@@ -132,8 +237,11 @@ class Brocade:
         ver_string = self.send('show version')
         self.ver_string = ver_string.splitlines()
         self.parse_version()
-        mac_string = self.send('show mac-address')
-        self.mac_string = mac_string.splitlines()
+        if self.read_tables:
+            mac_string = self.send('show mac-address')
+            self.mac_string = mac_string.splitlines()
+        else:
+            self.mac_string = ''
         arp_string = self.send('show arp')
         self.arp_string = arp_string.splitlines()
 
@@ -155,26 +263,19 @@ class Brocade:
         Gets uptime, serial, model, and firmware of this device from the version string
     '''
     def parse_version(self):
-        models = []
-        serials = []
-        uptime = ''
-        firmware = ''
+        state = {
+            'models': [],
+            'serials': [],
+            'uptime': '',
+            'firmware': ''
+        }
         for line in self.ver_string:
-            if line.strip().startswith('HW'):
-                models.append(line.split()[-1])
-            if line.strip().startswith('SW'):
-                firmware = line.split()[-1]
-            if 'uptime' in line:
-                # example "device uptime is 1 day(s) 2 hour(s) 6 minute(s)"
-                # save everything after " is " and remove parentheses
-                uptime = line.strip().split(' is ')[-1].replace('(s)','s')
-            if line.strip().startswith('Serial'):
-                serials.append(line.split(':')[1].strip())
-        self.model = models
+            VERSION_GRAMMAR.dispatch(self, state, line.strip())
+        self.model = state['models']
         self.base_model = self.model[0].split('-')[0]
-        self.serial = serials
-        self.uptime = uptime
-        self.firmware = firmware
+        self.serial = state['serials']
+        self.uptime = state['uptime']
+        self.firmware = state['firmware']
     
     '''
         Gets the IP and subnet mask of this device
@@ -182,12 +283,9 @@ class Brocade:
     '''
     def parse_ip(self):
         for line in self.config:
-            if line.startswith('ip address'):
-                self.subnet = line.split()[-1]
-                self.ip = line.split()[-2]
-            if line.startswith('hostname'):
-                hostname = line.split()[-1]
-                self.hostname = hostname.split('.')[0]
+            # global config only - interface addresses are indented
+            if not line.startswith(' '):
+                CONFIG_GRAMMAR.dispatch(self, None, line)
     '''
         Searches the running config for the default gateway
         example line: "default-gateway  192.168.0.1 1"
@@ -218,6 +316,52 @@ class Brocade:
                     self.upstream_local = port
         self.mgmt_interface = mgmt_interface
 
+    ''' 
+        Maps all layer 2 entries keyed by MAC Address (same format as Cisco.parse_mac_table)
+
+        example line: "0000.0c07.ac01   1/1/48     Dynamic    1      10"
+
+        returns 
+            mac_table - a columnar Tables.Table of MAC addresses and their port/vlan/type
+    '''
+    def parse_mac_table(self):
+        mac_pattern = re.compile('[0-9a-f]{4}.[0-9a-f]{4}.[0-9a-f]{4}')
+        mac_table = Tables.mac_table()
+        for line in self.mac_string:
+            if mac_pattern.match(line):
+                cols = line.split()
+                mac_table[cols[0]] = {
+                    'VLAN': cols[-1],
+                    'TYPE': cols[2].upper(), # 'STATIC' or 'DYNAMIC'
+                    'PORT': cols[1]
+                }
+        self.mac_table = mac_table
+        return mac_table
+
+    ''' 
+        Maps all layer 3 entries keyed by IP Address (same format as Cisco.parse_arp_table)
+
+        example line: "1      10.1.1.1        0000.0c07.ac01 Dynamic  0   1/1/48   Valid   10"
+
+        returns 
+            arp_table - a columnar Tables.Table of ARP entries and their mac/port/etc.
+    '''
+    def parse_arp_table(self):
+        mac_pattern = re.compile('[0-9a-f]{4}.[0-9a-f]{4}.[0-9a-f]{4}')
+        arp_table = Tables.brocade_arp_table()
+        for line in self.arp_string:
+            if mac_pattern.search(line):
+                cols = line.split()
+                arp_table[cols[1]] = {
+                    'PORT': cols[-3],
+                    'TYPE': cols[3],
+                    'MAC': cols[2],
+                    'AGE': cols[4],
+                    'VLAN': cols[-1]
+                }
+        self.arp_table = arp_table
+        return arp_table
+
     '''
         Uses the self.lldp_string value to segment and identify all LLDP neighbors.
         Identifies upstream host and port matching port is found.
@@ -234,37 +378,16 @@ class Brocade:
         }
     '''
     def parse_lldp(self):
-        lldp = {}
-        upstream_host = 'N/A'
-        upstream_port_distant = 'N/A'
+        state = {
+            'lldp': {},
+            'upstream_host': 'N/A',
+            'upstream_port_distant': 'N/A'
+        }
         for line in self.lldp_string:
-            line = line.strip()
-            if line.startswith('Local port: '):
-                local_port = line.split()[-1]
-            if line.startswith('+ Port ID'):
-                # line example: + Port ID (interface name): "Gi1/0/12"
-                # remove quotation marks when saving port ID
-                distant_port = line.split()[-1].replace('"','')
-            if line.startswith('+ System name'):
-                # save hostname and remove quotes
-                distant_host = line.split()[-1].replace('"','')
-                # remove FQDN suffix
-                distant_host = distant_host.split('.')[0]
-            if line.startswith('+ Management address'):
-                distant_ip = line.split()[-1]
-            # Only save port if it is a trunk (i.e. assigned to dead VLAN 999)
-            if line.startswith('+ Port VLAN ID:') and line.endswith('999'):
-                lldp.setdefault(local_port, {})
-                lldp[local_port]['distant_host'] = distant_host
-                lldp[local_port]['distant_port'] = distant_port
-                lldp[local_port]['distant_ip'] = distant_ip
-                if local_port == self.upstream_local:
-                    upstream_port_distant = distant_port
-                    upstream_host = distant_host
-
-        self.upstream_host = upstream_host
-        self.upstream_port_distant = upstream_port_distant
-        self.lldp = lldp
+            LLDP_GRAMMAR.dispatch(self, state, line.strip())
+        self.upstream_host = state['upstream_host']
+        self.upstream_port_distant = state['upstream_port_distant']
+        self.lldp = state['lldp']
         return self.lldp
 
     '''
@@ -15,9 +15,244 @@
 '''
 import re, calendar, json, logging, os
 from datetime import date
-import IPUtils
+import IPUtils, Tables, Metrics, Timeouts, Framing
+from LineGrammar import Grammar
 log = logging.getLogger(__name__)
 
+MAC_PATTERN = re.compile('[0-9a-f]{4}.[0-9a-f]{4}.[0-9a-f]{4}')
+# first word of an ACE address - anything else after a port operator is a port
+ADDRESS_KEYWORDS = ('any', 'host', 'object-group', 'addrgroup')
+
+'''
+    Keyword grammars for the config sections parsed by the Cisco class (see LineGrammar).
+    Each handler is called as handler(device, state, line) with the stripped config line.
+'''
+INTERFACE_GRAMMAR = Grammar('interface')
+LINE_GRAMMAR = Grammar('line')
+ACL_GRAMMAR = Grammar('acl')
+
+# Interface sections - state holds the current interface dict and the storm-control/authentication line sets
+@INTERFACE_GRAMMAR.rule('storm-control')
+def interface_storm_control(device, state, line):
+    state['storm_control'].add(line)
+    if len(state['storm_control']) >= 3:
+        state['interface']['storm-control'] = device.validate_stormcontrol(state['storm_control'])
+
+@INTERFACE_GRAMMAR.rule('authentication')
+@INTERFACE_GRAMMAR.rule('mab')
+@INTERFACE_GRAMMAR.rule('dot1x')
+def interface_authentication(device, state, line):
+    state['authentication'].add(line)
+    # if total authentication commands are greater than or equal to a full authentication config
+    if len(state['authentication']) >= 8:
+        state['interface']['authentication'] = device.validate_auth(state['authentication'])
+
+@INTERFACE_GRAMMAR.rule('description')
+def interface_description(device, state, line):
+    state['interface']['description'] = line.replace('description ', '')
+
+@INTERFACE_GRAMMAR.rule('auto qos')
+def interface_auto_qos(device, state, line):
+    state['interface']['auto_qos'] = line.replace('auto qos ', '')
+
+@INTERFACE_GRAMMAR.rule('switchport mode')
+def interface_mode(device, state, line):
+    state['interface']['mode'] = line.split()[-1]
+
+@INTERFACE_GRAMMAR.rule('switchport access vlan')
+def interface_access_vlan(device, state, line):
+    state['interface']['access_vlan'] = line.split()[-1]
+
+@INTERFACE_GRAMMAR.rule('switchport voice vlan')
+def interface_voice_vlan(device, state, line):
+    state['interface']['voice_vlan'] = line.split()[-1]
+
+@INTERFACE_GRAMMAR.rule('switchport trunk native vlan')
+def interface_native_vlan(device, state, line):
+    native_vlan = line.split()[-1]
+    state['interface']['native_vlan'] = native_vlan
+    device.native_vlans.add(native_vlan)
+
+@INTERFACE_GRAMMAR.rule('ip arp inspection limit rate')
+def interface_arp_limit(device, state, line):
+    state['interface']['arp_limit'] = line.split()[-1]
+
+@INTERFACE_GRAMMAR.rule('switchport trunk allowed vlan')
+@INTERFACE_GRAMMAR.rule('encapsulation dot1Q')
+def interface_allowed_vlan(device, state, line):
+    state['interface']['allowed_vlan'].update(line.split()[-1].split(','))
+
+@INTERFACE_GRAMMAR.rule('switchport nonegotiate', exact=True)
+def interface_nonegotiate(device, state, line):
+    state['interface']['nonegotiate'] = True
+
+@INTERFACE_GRAMMAR.rule('switchport block unicast', exact=True)
+def interface_uufb(device, state, line):
+    state['interface']['uufb'] = True
+
+@INTERFACE_GRAMMAR.rule('ip arp inspection trust', exact=True)
+def interface_dai_trust(device, state, line):
+    state['interface']['dai_trust'] = True
+
+@INTERFACE_GRAMMAR.rule('ip dhcp snooping trust', exact=True)
+def interface_dhcp_snooping_trust(device, state, line):
+    state['interface']['dhcp_snooping_trust'] = True
+
+@INTERFACE_GRAMMAR.rule('ip verify source', exact=True)
+def interface_ipsg(device, state, line):
+    state['interface']['ipsg'] = True
+
+@INTERFACE_GRAMMAR.rule('ip directed-broadcast', exact=True)
+def interface_directed_broadcast(device, state, line):
+    state['interface']['directed-broadcast'] = True
+
+@INTERFACE_GRAMMAR.rule('no switchport', exact=True)
+@INTERFACE_GRAMMAR.rule('no ip address', exact=True)
+def interface_routed(device, state, line):
+    state['interface']['mode'] = 'routed'
+
+@INTERFACE_GRAMMAR.rule('spanning-tree')
+def interface_spanning_tree(device, state, line):
+    state['interface']['spanning-tree'].add(line.replace('spanning-tree ', ''))
+
+@INTERFACE_GRAMMAR.rule('ip access-group')
+def interface_access_group(device, state, line):
+    direction = line.split()[-1]
+    acl = line.split()[-2]
+    state['interface'][f'acl_{direction}'] = acl
+    device.active_acls.add(acl)
+
+@INTERFACE_GRAMMAR.rule('shutdown', exact=True)
+def interface_shutdown(device, state, line):
+    state['interface']['shutdown'] = True
+
+@INTERFACE_GRAMMAR.rule('ip address')
+def interface_ip_address(device, state, line):
+    interface = state['interface']
+    current_interface = state['name']
+    interface['mode'] = 'routed'
+    if device.device_type == 'Nexus':
+        ip_address = line.replace('ip address ','').split('/')[0]
+        subnet = IPUtils.cidr_to_mask(line.split('/')[-1])
+        interface['ip_address'] = ip_address
+        interface['subnet'] = subnet
+    else:
+        ip_address = line.split()[-2]
+        device.ips.add(ip_address)
+        subnet = line.split()[-1]
+        interface['ip_address'] = ip_address
+        interface['subnet'] = subnet
+        if subnet == 'dhcp':
+            interface['ip_address'] = 'dhcp'
+            interface['subnet'] = '0.0.0.0'
+    # If the IP address matches the IP used to login, save as the management IP
+    if ip_address == device.ip:
+        log.debug(f'%s: Found management IP interface: {current_interface}')
+        device.mgmt_interface = current_interface
+        device.subnet = subnet
+    else:
+        log.debug(f'%s: Interface {current_interface} IP {ip_address} {subnet} is not management')
+
+@INTERFACE_GRAMMAR.rule('channel-group')
+def interface_channel_group(device, state, line):
+    if 'mode' in line:
+        group, mode = line.replace('channel-group ','').split(' mode ')
+    else:
+        group = line.split()[-1]
+        mode = 'lacp' # Default mode on 5Ks
+    state['interface']['port-channel_group'] = group
+    state['interface']['port-channel_mode'] = mode
+
+@INTERFACE_GRAMMAR.rule('channel-protocol')
+def interface_channel_protocol(device, state, line):
+    state['interface']['port-channel_protocol'] = line.replace('channel-protocol ','')
+
+# Note: This scrip treats unencrypted ip ospf authentication-key as no routing auth because its as good as nothing
+@INTERFACE_GRAMMAR.rule('ip ospf')
+def interface_ospf(device, state, line):
+    state['interface']['dynamic_routing'] = 'OSPF'
+    if 'message-digest-key' in line:
+        state['interface']['routing_auth'] = 'STATIC'
+    if 'key-chain' in line:
+        key_chain = line.split()[-1]
+        if key_chain in device.keychains:
+            device.keychains[key_chain]['active'] = True
+        else:
+            log.warning(f'%s: Found un-mapped keychain on interface {state["name"]}', 'parse_interfaces')
+        state['interface']['routing_auth'] = key_chain
+
+@INTERFACE_GRAMMAR.rule('ip vrf forwarding')
+def interface_vrf(device, state, line):
+    state['interface']['vrf'] = line.split()[-1]
+
+# Line sections (vty/con/aux) - state is the dict for the current line range
+@LINE_GRAMMAR.rule('transport')
+def line_transport(device, state, line):
+    io_allow = line.split()[1]
+    state[io_allow] = set(line.split()[2:])
+
+@LINE_GRAMMAR.rule('session-timeout')
+def line_session_timeout(device, state, line):
+    try:
+        state['session-timeout'] = int(line.split()[-1])*60
+    except:
+        log.warning(f'%s: Unable to parse session timeout value: {line}', 'parse_lines')
+        state['session-timeout'] = line.split()[-1]
+
+@LINE_GRAMMAR.rule('exec-timeout')
+def line_exec_timeout(device, state, line):
+    try:
+        minutes = int(line.split()[-2])
+        seconds = int(line.split()[-1])
+        state['exec-timeout'] = (minutes*60) + seconds
+    except:
+        log.warning(f'%s: Unable to parse exec timeout value: {line}', 'parse_lines')
+        state['exec-timeout'] = 9999
+
+@LINE_GRAMMAR.rule('access-class')
+def line_access_class(device, state, line):
+    state['acl'] = line.split()[-2]
+
+@LINE_GRAMMAR.rule('no exec', exact=True)
+def line_no_exec(device, state, line):
+    state['exec'] = False
+
+# ACL headers - state holds the ACL dict being built and the name of the current ACL
+@ACL_GRAMMAR.rule('access-list')
+def acl_standard(device, state, line):
+    acls = state['acls']
+    if state['current'] == '':
+        state['current'] = line.split()[1]
+        log.debug(f'%s: Reading through ACL {state["current"]}', 'parse_acl')
+        acls[state['current']] = {
+            'extended': False,
+            'config': [],
+            'drop_icmpfrag': False,
+            'restrict-to-self': True,
+            'min-log-type': 'log',
+            'explicit-deny-default': False
+        }
+    ace = device.parse_ace_standard(line)
+    acls[state['current']]['config'].append(ace)
+    if ace['source'] == 'any' and ace['permit']:
+        log.debug(f'%s: ACE "{line}" of {state["current"]} allows unrestricted traffic to this device')
+        acls[state['current']]['restrict-to-self'] = False
+
+@ACL_GRAMMAR.rule('ip access-list')
+def acl_named(device, state, line):
+    state['current'] = line.split()[-1]
+    extended = line.split()[-2] == 'extended'
+    log.debug(f'%s: Reading through ACL {state["current"]}', 'parse_acl')
+    state['acls'][state['current']] = {
+        'extended': extended,
+        'config': [],
+        'drop_icmpfrag': False,
+        'restrict-to-self': True,
+        'min-log-type': 'log-input' if extended else 'log',
+        'explicit-deny-default': False
+    }
+
+@Metrics.instrument
 class Cisco:
     '''
         This class is initialized with kwargs to allow for easier re-initialization of pre-defined
@@ -43,6 +278,10 @@ class Cisco:
         self.uptime = '0 days 0 minutes 0 seconds'
         self.mac = []
         self.int_status_string = ''
+        # capture full MAC/ARP tables in read_local (see find_arp_mac/find_mac_port for targeted lookups)
+        self.read_tables = True
+        # detect end of output with a sentinel comment instead of the prompt (see Framing)
+        self.framing = False
         for key, value in kwargs.items():
             setattr(self, key, value)
         self.prompt = self.hostname + ('#' if self.privileged else '>')
@@ -62,21 +301,34 @@ class Cisco:
         # Using pre-defined test strings
         if self.conn_type == 'OFFLINE':
             # Commands are stored as string values with keys matching each command
-            return self.conn[command]
+            if command in self.conn:
+                return self.conn[command]
+            # session setup is not part of save_offline() captures
+            if command.startswith('terminal '):
+                return ''
+            raise ValueError(f'{command} not in offline capture')
         # Using SecureCRT
         if self.conn_type == 'CRT':
             log.debug(f'%s: Sending string: {command}', 'send')
+            if self.framing:
+                output = Framing.crt_send(self, command)
+                if 'Invalid input' in output:
+                    log.warning(f'%s: {output}', 'send')
+                    raise ValueError(output)
+                return output
             if prompt == '':
                 prompt = self.prompt
             self.crtTab.Screen.Send('%s\r' % command)
             self.crtTab.Screen.WaitForString('\r\n') # ignore input line
-            output = self.crtTab.Screen.ReadString(prompt, 5)
+            output = Timeouts.crt_read(self, command, prompt)
             if 'Invalid input' in output:
                 log.warn(f'%s: {output}', 'send')
                 raise ValueError(output)
             return output
         # Using Netmiko
-        return self.conn.send_command(command)
+        if self.framing:
+            return Framing.netmiko_send(self, command)
+        return Timeouts.netmiko_send(self, command)
 
     '''
         Takes param config_command which is formatted as a list of commands to be executed.
@@ -85,10 +337,15 @@ class Cisco:
         Detects execution failures and raises Exception containing error information if a 
         command fails to execute and returns to global mode.
 
+        Takes optional param bulk - SecureCRT only. Streams every command in a single write
+        instead of waiting for the prompt after each one, then splits the echoed output back
+        into per-command responses (see split_config_echo). The device keeps executing after a
+        failed command, so every failing line is reported rather than only the first.
+
         returns
             response - list of outputs for each command
     '''
-    def send_config(self, config_command):
+    def send_config(self, config_command, bulk=False):
         if isinstance(config_command, str):
             config_command = [config_command]
         response = []
@@ -99,13 +356,19 @@ class Cisco:
 
         # Using Netmiko
         if self.conn_type == 'SSH':
-            return self.conn.send_config_set(config_command).splitlines()
+            response = self.conn.send_config_set(config_command).splitlines()
+            errors = self.config_errors(response)
+            if len(errors) > 0:
+                raise ValueError('UNSUPPORTED COMMAND ' + '; '.join(error for number, error in errors))
+            return response
 
         # Using SecureCRT
         self.crtTab.Screen.Send('conf t\r')
         self.crtTab.Screen.WaitForString('\r\n')
         self.crtTab.Screen.WaitForString('\r\n')
         self.prompt = self.crtTab.Screen.ReadString('(').strip() + '('     
+        if bulk:
+            return self.send_config_bulk(config_command, prompt_old)
         for command in config_command:
             log.debug(f'%s: Running command on {self.hostname}: {command}', 'send_config')
             output = self.send(command)
@@ -118,22 +381,104 @@ class Cisco:
         self.send('end')
         return response
 
+    '''
+        Sends every line of @param(config_command) followed by a sentinel comment in one write and
+        reads up to the sentinel. Called by send_config() once in config mode.
+    '''
+    def send_config_bulk(self, config_command, prompt_old):
+        screen = self.crtTab.Screen
+        marker = Framing.new_marker()
+        log.debug(f'%s: Streaming {len(config_command)} commands to {self.hostname}', 'send_config_bulk')
+        screen.Send(''.join('%s\r' % command for command in config_command) + '%s\r' % Framing.sentinel(self, marker))
+        # the device works through the block line by line - allow 0.1s for each
+        output = Timeouts.crt_read(self, 'conf t (bulk)', marker, minimum=max(Timeouts.MIN_TIMEOUT, len(config_command) / 10))
+        # rest of the sentinel line
+        screen.WaitForString('\r\n', Timeouts.DEFAULT_TIMEOUT)
+        response = self.split_config_echo(Framing.drop_last_line(output), config_command)
+        errors = [(number, config_command[number - 1], error) for number, error in self.config_errors(response)]
+        for number, command, error in errors:
+            log.error(f'%s: Error sending command {command} (line {number}): %s', 'send_config', error)
+        self.prompt = prompt_old
+        self.send('end')
+        if len(errors) > 0:
+            raise ValueError('UNSUPPORTED COMMAND ' + '; '.join(f'line {number} "{command}": {error}' for number, command, error in errors))
+        return response
+
+    '''
+        Splits the echoed @param(output) of a streamed config block into the output of each
+        command of @param(config_command). Every command is echoed after a config mode prompt
+        ex. "HOSTNAME(config-if)#storm-control action shutdown" so the output is split on those
+        prompts - the text between two prompts belongs to the command echoed after the first.
+        Prompts with nothing echoed (blank lines) are skipped, and lines too long for the terminal
+        are echoed scrolled ex. "$ermit ip host 10.0.0.1 any" and matched by their end.
+
+        returns
+            response - list of outputs for each command
+    '''
+    def split_config_echo(self, output, config_command):
+        # the prompt of the first command was partly read by send_config()
+        output = self.prompt + output.replace('\r\n', '\n')
+        segments = re.split('^' + re.escape(self.prompt) + r'[^)\n]*\)#', output, flags=re.M)[1:]
+        response = [''] * len(config_command)
+        position = 0
+        for segment in segments:
+            echo, _, text = segment.partition('\n')
+            echo = echo.strip()
+            if echo == '':
+                continue
+            # match the echo to the next command with the same text
+            match = next((i for i in range(position, len(config_command)) if self.config_echoes(config_command[i], echo)), None)
+            if match is None:
+                # not one of ours - keep any output with the command before it
+                log.debug(f'%s: Unmatched echo "{echo}"', 'split_config_echo')
+                if position > 0:
+                    response[position - 1] += text
+                continue
+            response[match] += text
+            position = match + 1
+        return response
+
+    '''
+        returns
+            True if @param(echo) is the echo of @param(command) - whole or scrolled ("$" + its end)
+    '''
+    def config_echoes(self, command, echo):
+        command = command.strip()
+        if echo.startswith('$'):
+            return len(echo) > 1 and command.endswith(echo.lstrip('$'))
+        return command == echo
+
+    '''
+        Takes param response as returned by send_config()
+
+        returns
+            list of (line number, error message) for every command that printed an error
+    '''
+    def config_errors(self, response):
+        errors = []
+        for number, output in enumerate(response, 1):
+            for line in output.splitlines():
+                line = line.strip()
+                if 'Invalid input' in line or (line.startswith('%') and not line.lstrip('% ').startswith('Warning')):
+                    errors.append((number, line))
+                    break
+        return errors
+
     def write_mem(self):
         log.info(f'%s: Writing config to NVRAM', 'write_mem')
         if self.conn_type == 'OFFLINE':
             return 'write mem simulated'
         if self.conn_type == 'CRT':
-            if prompt == '':
-                prompt = self.prompt
             self.crtTab.Screen.Send('write mem\r')
             self.crtTab.Screen.WaitForString('\r\n') # ignore input line
-            output = self.crtTab.Screen.ReadString(prompt, 15)
+            output = Timeouts.crt_read(self, 'write mem', self.prompt, minimum=15)
             if 'Invalid input' in output:
                 log.warn(f'%s: {output}', 'send')
                 raise ValueError(output)
             return output
         # Using Netmiko
-        return self.conn.send_command('write mem', read_timeout=150)
+        # never sent twice - a slow write mem is read on to the prompt instead
+        return Timeouts.netmiko_send(self, 'write mem', minimum=150, tail=True)
     '''
         Convert full port name to shorthand version used for compatibility between commands
         Takes @param
@@ -175,16 +520,16 @@ class Cisco:
         ver_string = self.send('show version')
         self.ver_string = ver_string.splitlines()
         self.parse_version()
-        if 'Switch' in self.device_type:
+        if 'Switch' in self.device_type and self.read_tables:
             mac_string = self.send('show mac address-table')
             self.mac_string = mac_string.splitlines()
         else:
             self.mac_string = ''
-        if self.device_type == 'Nexus':
-            arp_string = self.send('show ip arp')
+        if self.read_tables:
+            arp_string = self.send(self.arp_command())
+            self.arp_string = arp_string.splitlines()
         else:
-            arp_string = self.send('show arp')
-        self.arp_string = arp_string.splitlines()
+            self.arp_string = ''
         try:
             fipsstring = self.send('show fips status')
             self.fipsstring = fipsstring.splitlines()
@@ -413,8 +758,12 @@ class Cisco:
     def parse_interfaces(self):
         interfaces = {}
         current_interface = ''
-        storm_control = set()
-        authentication = set()
+        state = {
+            'name': '',
+            'interface': None,
+            'storm_control': set(),
+            'authentication': set()
+        }
         for line in self.config:
             if line.startswith('interface'):
                 current_interface = line.split()[-1]
@@ -453,134 +802,12 @@ class Cisco:
                     # save VLAN ID as allowed VLAN for VLAN interfaces
                     interfaces[current_interface]['allowed_vlan'].add(current_interface.replace('Vlan',''))
                     interfaces[current_interface]['mode'] = 'routed'
+                state['name'] = current_interface
+                state['interface'] = interfaces[current_interface]
                 continue
             if current_interface != '':
                 if line.startswith(' '):
-                    line = line.strip()
-                    if line.startswith('storm-control'):
-                        storm_control.add(line)
-                        if len(storm_control) >= 3:
-                            interfaces[current_interface]['storm-control'] = self.validate_stormcontrol(storm_control)
-                            
-                    elif line.startswith('authentication') or line.startswith('mab') or line.startswith('dot1x'):
-                        authentication.add(line)
-                        # if total authentication commands are greater than or equal to a full authentication config
-                        if len(authentication) >= 8:
-                            interfaces[current_interface]['authentication'] = self.validate_auth(authentication)
-
-                    else:
-                        if line.startswith('description'):
-                            interfaces[current_interface]['description'] = line.replace('description ', '')
-
-                        if line.startswith('auto qos '):
-                            interfaces[current_interface]['auto_qos'] = line.replace('auto qos ', '')
-
-                        if line.startswith('switchport mode '):
-                            interfaces[current_interface]['mode'] = line.split()[-1]
-
-                        if line.startswith('switchport access vlan '):
-                            interfaces[current_interface]['access_vlan'] = line.split()[-1]
-
-                        if line.startswith('switchport voice vlan '):
-                            interfaces[current_interface]['voice_vlan'] = line.split()[-1]
-
-                        if line.startswith('switchport trunk native vlan '):
-                            native_vlan = line.split()[-1]
-                            interfaces[current_interface]['native_vlan'] = native_vlan
-                            if not native_vlan in self.native_vlans:
-                                self.native_vlans.add(native_vlan)
-
-                        if line.startswith('ip arp inspection limit rate '):
-                            interfaces[current_interface]['arp_limit'] = line.split()[-1]
-
-                        if line.startswith('switchport trunk allowed vlan ') or line.startswith('encapsulation dot1Q '):
-                            interfaces[current_interface]['allowed_vlan'].update(line.split()[-1].split(','))
-
-                        if line == 'switchport nonegotiate':
-                            interfaces[current_interface]['nonegotiate'] = True
-
-                        if line == 'switchport block unicast':
-                            interfaces[current_interface]['uufb'] = True
-
-                        if line == 'ip arp inspection trust':
-                            interfaces[current_interface]['dai_trust'] = True
-
-                        if line == 'ip dhcp snooping trust':
-                            interfaces[current_interface]['dhcp_snooping_trust'] = True
-
-                        if line == 'ip verify source':
-                            interfaces[current_interface]['ipsg'] = True
-
-                        if line == 'ip directed-broadcast':
-                            interfaces[current_interface]['directed-broadcast'] = True
-
-                        if line == 'no switchport' or line == 'no ip address':
-                            interfaces[current_interface]['mode'] = 'routed'
-
-                        if line.startswith('spanning-tree'):
-                            interfaces[current_interface]['spanning-tree'].add(line.replace('spanning-tree ', ''))
-
-                        if line.startswith('ip access-group'):
-                            direction = line.split()[-1]
-                            acl = line.split()[-2]
-                            interfaces[current_interface][f'acl_{direction}'] = acl
-                            self.active_acls.add(acl)
-
-                        if line == 'shutdown':
-                            interfaces[current_interface]['shutdown'] = True
-
-                        if line.startswith('ip address'):
-                            interfaces[current_interface]['mode'] = 'routed'
-                            if self.device_type == 'Nexus':
-                                ip_address = line.replace('ip address ','').split('/')[0]
-                                subnet = IPUtils.cidr_to_mask(line.split('/')[-1])
-                                interfaces[current_interface]['ip_address'] = ip_address
-                                interfaces[current_interface]['subnet'] = subnet
-                            else:
-                                ip_address = line.split()[-2]
-                                self.ips.add(ip_address)
-                                subnet = line.split()[-1]
-                                interfaces[current_interface]['ip_address'] = ip_address
-                                interfaces[current_interface]['subnet'] = subnet
-                                if subnet == 'dhcp':
-                                    interfaces[current_interface]['ip_address'] = 'dhcp'
-                                    interfaces[current_interface]['subnet'] = '0.0.0.0'
-                            # If the IP address matches the IP used to login, save as the management IP
-                            if ip_address == self.ip:
-                                log.debug(f'%s: Found management IP interface: {current_interface}')
-                                self.mgmt_interface = current_interface
-                                self.subnet = subnet
-                            else:
-                                log.debug(f'%s: Interface {current_interface} IP {ip_address} {subnet} is not management')
-
-                        if line.startswith('channel-group '):
-                            if 'mode' in line:
-                                group, mode = line.replace('channel-group ','').split(' mode ')
-                            else:
-                                group = line.split()[-1]
-                                mode = 'lacp' # Default mode on 5Ks
-                            interfaces[current_interface]['port-channel_group'] = group
-                            interfaces[current_interface]['port-channel_mode'] = mode
-
-                        if line.startswith('channel-protocol '):
-                            interfaces[current_interface]['port-channel_protocol'] = line.replace('channel-protocol ','')
-
-                        # Note: This scrip treats unencrypted ip ospf authentication-key as no routing auth because its as good as nothing
-                        if line.startswith('ip ospf'):
-                            interfaces[current_interface]['dynamic_routing'] = 'OSPF'
-                            if 'message-digest-key' in line:
-                                interfaces[current_interface]['routing_auth'] = 'STATIC'
-                            if 'key-chain' in line:
-                                key_chain = line.split()[-1]
-                                if key_chain in self.keychains:
-                                    self.keychains[key_chain]['active'] = True
-                                else:
-                                    log.warning(f'%s: Found un-mapped keychain on interface {current_interface}', 'parse_interfaces')
-                                interfaces[current_interface]['routing_auth'] = key_chain
-
-                        if line.startswith('ip vrf forwarding '):
-                            interfaces[current_interface]['vrf'] = line.split()[-1]
-
+                    INTERFACE_GRAMMAR.dispatch(self, state, line.strip())
                 else:
                     log.debug(f'%s: Completed config for interface {current_interface}', 'parse_interfaces')
                     current_interface = ''
@@ -617,41 +844,11 @@ class Cisco:
     '''
     def parse_acl(self):
         acls = {}
-        current_acl = ''
+        state = {'acls': acls, 'current': ''}
         for line in self.config:
-            # standard access lists
-            if line.startswith('access-list'):
-                if current_acl == '':
-                    current_acl = line.split()[1]
-                    log.debug(f'%s: Reading through ACL {current_acl}', 'parse_acl')
-                    acls[current_acl] = {
-                        'extended': False,
-                        'config': [],
-                        'drop_icmpfrag': False,
-                        'restrict-to-self': True,
-                        'min-log-type': 'log',
-                        'explicit-deny-default': False
-                    }
-                ace = self.parse_ace_standard(line)
-                acls[current_acl]['config'].append(ace)
-                if ace['source'] == 'any' and ace['permit']:
-                    log.debug(f'%s: ACE "{line}" of {current_acl} allows unrestricted traffic to this device')
-                    acls[current_acl]['restrict-to-self'] = False
-            # named access lists
-            elif line.startswith('ip access-list'):
-                current_acl = line.split()[-1]
-                extended = line.split()[-2] == 'extended'
-                log.debug(f'%s: Reading through ACL {current_acl}', 'parse_acl')
-                acls[current_acl] = {
-                    'extended': extended,
-                    'config': [],
-                    'drop_icmpfrag': False,
-                    'restrict-to-self': True,
-                    'min-log-type': 'log-input' if extended else 'log',
-                    'explicit-deny-default': False
-                }
-            elif line.startswith(' ') and current_acl != '':
-                if 'remark' in line:
+            if line.startswith(' '):
+                current_acl = state['current']
+                if current_acl == '' or 'remark' in line:
                     continue
                 if acls[current_acl]['extended']:
                     ace = self.parse_ace(line)
@@ -670,9 +867,8 @@ class Cisco:
                 elif ace['source'] == 'any' and ace['protocol'] == 'ip':
                     log.debug(f'%s: ACE "{line}" of {current_acl} allows unrestricted traffic to this device', 'parse_acl')
                     acls[current_acl]['restrict-to-self'] = False
-                        
-            else:
-                current_acl = ''
+            elif not ACL_GRAMMAR.dispatch(self, state, line):
+                state['current'] = ''
         for acl in acls:
             if len(acls[acl]['config']) == 0:
                 continue
@@ -696,6 +892,7 @@ class Cisco:
             'permit': False,
             'protocol': 'icmp',
             'source': 'any',
+            'source-port': '', # ex. 'eq 80 443' or 'range 1024 65535'
             'destination': 'any',
             'match-type': 'fragments',
             'log-type': 'log-input',
@@ -710,6 +907,7 @@ class Cisco:
             'permit': False,
             'protocol': '',
             'source': '',
+            'source-port': '',
             'destination':'',
             'match-type':'',
             'log-type':'',
@@ -737,6 +935,14 @@ class Cisco:
             ace_dict['source'] = ' '.join([sections[i],sections[i+1]])
             i+= 2
 
+        # source ports ex. 'eq 80 443', 'range 1024 65535' come before the destination
+        if sections[i] in ('eq', 'neq', 'lt', 'gt', 'range'):
+            start = i
+            i+= 3 if sections[i] == 'range' else 2
+            while i < len(sections) and not (sections[i] in ADDRESS_KEYWORDS or '.' in sections[i]):
+                i+= 1
+            ace_dict['source-port'] = ' '.join(sections[start:i])
+
         if sections[i] == 'any':
             ace_dict['destination'] = 'any'
             i+= 1
@@ -773,6 +979,7 @@ class Cisco:
             'permit': False,
             'protocol': 'ip',
             'source': '',
+            'source-port': '',
             'destination':'any',
             'match-type':'',
             'log-type':'',
@@ -860,28 +1067,7 @@ class Cisco:
                     'exec': True
                 }
             elif line.startswith(' ') and current_line != '':
-                line = line.strip()
-                if line.startswith('transport'):
-                    io_allow = line.split()[1]
-                    lines[current_line][current_range][io_allow] = set(line.split()[2:])
-                elif line.startswith('session-timeout'):
-                    try:
-                        lines[current_line][current_range]['session-timeout'] = int(line.split()[-1])*60
-                    except:
-                        log.warning(f'%s: Unable to parse session timeout value: {line}', 'parse_lines')
-                        lines[current_line][current_range]['session-timeout'] = line.split()[-1]
-                elif line.startswith('exec-timeout'):
-                    try:
-                        minutes = int(line.split()[-2])
-                        seconds = int(line.split()[-1])
-                        lines[current_line][current_range]['exec-timeout'] = (minutes*60) + seconds
-                    except:
-                        log.warning(f'%s: Unable to parse exec timeout value: {line}', 'parse_lines')
-                        lines[current_line][current_range]['exec-timeout'] = 9999
-                elif line.startswith('access-class'):
-                    lines[current_line][current_range]['acl'] = line.split()[-2]
-                elif line == 'no exec':
-                    lines[current_line][current_range]['exec'] = False
+                LINE_GRAMMAR.dispatch(self, lines[current_line][current_range], line.strip())
             else:
                 current_line = ''
                 current_range = ''
@@ -894,7 +1080,8 @@ class Cisco:
         Maps all layer 2 entries keyed by MAC Address
 
         returns 
-            mac_table - a dictionary of MAC addresses and their port/vlan/type
+            mac_table - a columnar Tables.Table of MAC addresses and their port/vlan/type
+                read as a dictionary keyed by MAC address
 
         ex.
         {
@@ -907,7 +1094,7 @@ class Cisco:
     '''
     def parse_mac_table(self):
         mac_pattern = re.compile('[0-9a-f]{4}.[0-9a-f]{4}.[0-9a-f]{4}')
-        mac_table = {}
+        mac_table = Tables.mac_table()
         for line in self.mac_string:
             if mac_pattern.search(line):
                 if self.device_type == 'Nexus':
@@ -930,7 +1117,8 @@ class Cisco:
         Maps all layer 3 entries keyed by IP Address
 
         returns 
-            arp_table - a dictionary of ARP entries and their mac/port/etc.
+            arp_table - a columnar Tables.Table of ARP entries and their mac/port/etc.
+                read as a dictionary keyed by IP address
 
         ex.
         {
@@ -946,7 +1134,7 @@ class Cisco:
     def parse_arp_table(self):
         # Using the MAC address to match avoids pulling INCOMPLETE entries
         mac_pattern = re.compile('[0-9a-f]{4}.[0-9a-f]{4}.[0-9a-f]{4}')
-        arp_table = {}
+        arp_table = Tables.arp_table()
         for line in self.arp_string:
             if mac_pattern.search(line):
                 proto,ip,age,mac,type,port = line.split()
@@ -962,6 +1150,54 @@ class Cisco:
         self.arp_table = arp_table
         return arp_table
 
+    def arp_command(self):
+        return 'show ip arp' if self.device_type == 'Nexus' else 'show arp'
+
+    '''
+        Returns the lines to search for a single table entry without parsing the whole table:
+            - the captured full output if read_local() already pulled it
+            - otherwise the output of @param(filtered), a command that returns only that entry
+              (offline captures only hold @param(command), the full table)
+    '''
+    def table_lines(self, captured, command, filtered):
+        lines = getattr(self, captured, '')
+        if len(lines) > 0:
+            return lines
+        if self.conn_type == 'OFFLINE':
+            return self.send(command).splitlines()
+        return self.send(filtered).splitlines()
+
+    '''
+        Finds the MAC address for @param(ip) - stops at the first matching ARP entry
+
+        returns the MAC address string or '' if not found
+    '''
+    def find_arp_mac(self, ip):
+        if hasattr(self, 'arp_table'):
+            entry = self.arp_table.get(ip)
+            return entry['MAC'] if entry else ''
+        for line in self.table_lines('arp_string', self.arp_command(), f'show ip arp {ip}'):
+            cols = line.split()
+            if ip in cols:
+                for col in cols:
+                    if MAC_PATTERN.fullmatch(col):
+                        return col
+        return ''
+
+    '''
+        Finds the port @param(mac) was learned on - stops at the first matching MAC table entry
+
+        returns the port string or '' if not found
+    '''
+    def find_mac_port(self, mac):
+        if hasattr(self, 'mac_table'):
+            entry = self.mac_table.get(mac)
+            return entry['PORT'] if entry else ''
+        for line in self.table_lines('mac_string', 'show mac address-table', f'show mac address-table address {mac}'):
+            if mac in line:
+                return line.split()[-1]
+        return ''
+
     '''
         Maps all VLAN IDs to their respective names
 
@@ -1209,10 +1445,11 @@ class Cisco:
                 log.debug(f'%s: Found default route to {upstream}', 'parse_upstream')
                 if 'Vlan' in upstream:
                     upstream_ip = line.split()[1] 
-                    self.parse_mac_table()
-                    self.parse_arp_table()
-                    upstream_mac = self.arp_table[upstream_ip]['MAC']
-                    upstream = self.mac_table[upstream_mac]['PORT']
+                    upstream_mac = self.find_arp_mac(upstream_ip)
+                    upstream = self.find_mac_port(upstream_mac) if upstream_mac != '' else ''
+                    if upstream == '':
+                        log.warning(f'%s: Unable to resolve next hop {upstream_ip} to a local port', 'parse_upstream')
+                        continue
                 outbound.append(self.port_longform(upstream))
         self.upstream_local = ','.join(outbound)
         log.debug(f'%s: Found local upstream port: {self.upstream_local}')
@@ -1350,6 +1587,22 @@ class Cisco:
         with open(filepath, "w", encoding='UTF-8') as outfile:
             json.dump(outputs, outfile, indent=2)
         
+    '''
+        Drops raw command output and parsed structures once the device summary (json()) has been
+        produced so finished devices do not hold onto full captures until garbage collection
+    '''
+    def release(self):
+        for attr in ('config', 'ver_string', 'mac_string', 'arp_string', 'fipsstring', 'fipskeystring',
+                'span_string', 'ospf_string', 'route_string', 'cdp_string', 'mac_table', 'arp_table',
+                'cdp', 'lines', 'vlans', 'ospf_neighbors'):
+            vars(self).pop(attr, None)
+        self.interfaces = {}
+        self.acls = {}
+        self.keychains = {}
+        self.int_status_string = ''
+        if self.conn_type == 'OFFLINE':
+            self.conn = {}
+
     '''
         Health check - confirm logged in
         Returns status of crtTab
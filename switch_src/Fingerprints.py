@@ -0,0 +1,79 @@
+'''
+    Per-IP device fingerprints.
+
+    switch_init() works out the vendor and privilege level by matching the login prompt, and a
+    Brocade then needs another round trip to read its hostname. A device seen on an earlier scan
+    already told us all of that, so its fingerprint is kept:
+        {'make': 'Cisco', 'device_type': 'Switch', 'os_type': 'IOS-XE',
+         'prompt': 'EXAMPLE-AN#', 'hostname': 'EXAMPLE-AN', 'privileged': True}
+    At login only the stored prompt is matched (see Switch.fingerprint_init). If it does not
+    show up the device falls back to full detection and the fingerprint is replaced after the scan.
+
+    Pass the cache to SwitchMap.map_host() as a collector to record fingerprints as hosts finish.
+'''
+import json, logging, os
+log = logging.getLogger(__name__)
+
+class FingerprintCache:
+    def __init__(self):
+        self.hosts = {}
+
+    def get(self, ip):
+        return self.hosts.get(ip)
+
+    def forget(self, ip):
+        self.hosts.pop(ip, None)
+
+    '''
+        Records the fingerprint of a mapped device (SwitchMap.map_host collector)
+    '''
+    def collect(self, switch):
+        prompt = getattr(switch, 'prompt', '')
+        if switch.make == 'Brocade' and not prompt.startswith('SSH@'):
+            prompt = 'SSH@' + prompt
+        if not prompt or not switch.hostname:
+            return
+        self.hosts[switch.ip] = {
+            'make': switch.make,
+            'device_type': getattr(switch, 'device_type', ''),
+            'os_type': getattr(switch, 'os_type', ''),
+            'prompt': prompt,
+            'hostname': switch.hostname,
+            'privileged': getattr(switch, 'privileged', True)
+        }
+
+    '''
+        Adds Cisco/Brocade hosts from @param(current_switches) (switches.json) that have no
+        fingerprint yet. Only the hostname is known, so a privileged prompt is assumed.
+    '''
+    def seed(self, current_switches):
+        for sheet in current_switches.values():
+            for group in sheet.values():
+                for ip, host in group.items():
+                    make = host.get('Make', '')
+                    hostname = host.get('Hostname', '')
+                    if ip in self.hosts or not make in ('Cisco', 'Brocade') or not hostname:
+                        continue
+                    self.hosts[ip] = {
+                        'make': make,
+                        'device_type': '',
+                        'os_type': '',
+                        'prompt': ('SSH@%s#' if make == 'Brocade' else '%s#') % hostname,
+                        'hostname': hostname,
+                        'privileged': True
+                    }
+
+    def save(self, outfile):
+        with open(outfile, 'w') as cachefile:
+            json.dump(self.hosts, cachefile, indent=4)
+
+    '''
+        Loads a saved cache - returns an empty cache if @param(infile) does not exist
+    '''
+    @staticmethod
+    def load(infile):
+        cache = FingerprintCache()
+        if os.path.exists(infile):
+            with open(infile, 'r') as cachefile:
+                cache.hosts = json.load(cachefile)
+        return cache
@@ -0,0 +1,110 @@
+'''
+    Sentinel framing of command output.
+
+    Waiting for the prompt breaks when output contains 'hostname#' (ex. a banner or description
+    in 'show run') and when an older device's prompt is not matched at all. With framing on,
+    every command is followed by a harmless comment line carrying a unique marker:
+        show version
+        ! SWL1F2E3D4C-17
+    The CLI only echoes the comment once the command has finished, so output is complete the
+    moment the marker is read - without matching the prompt or waiting for a timeout.
+
+    Enabled per device with framing=True (see Switch.framing). A device class can set its own
+    SENTINEL format if '!' is not a comment on that platform.
+'''
+import itertools, logging, os, re, time
+import Timeouts
+log = logging.getLogger(__name__)
+
+SENTINEL = '! {}'
+RUN_ID = os.urandom(4).hex().upper()
+counter = itertools.count(1)
+# seconds between reads of a Netmiko channel
+POLL = 0.01
+PROMPT_END = re.compile(r'[>#]\s*$')
+
+'''
+    Returns a marker that cannot appear in command output
+'''
+def new_marker():
+    return f'SWL{RUN_ID}-{next(counter)}'
+
+def sentinel(device, marker):
+    return getattr(device, 'SENTINEL', SENTINEL).format(marker)
+
+'''
+    Removes the last line of @param(output) - the prompt and the echoed start of the sentinel
+'''
+def drop_last_line(output):
+    return output[:output.rfind('\n') + 1]
+
+'''
+    SecureCRT - sends @param(command) and its sentinel and returns the output between them
+'''
+def crt_send(device, command):
+    marker = new_marker()
+    screen = device.crtTab.Screen
+    screen.Send('%s\r%s\r' % (command, sentinel(device, marker)))
+    screen.WaitForString('\r\n') # ignore input line
+    output = Timeouts.crt_read(device, command, marker)
+    # the rest of the sentinel line - the prompt after it is skipped with the next input line
+    screen.WaitForString('\r\n', Timeouts.DEFAULT_TIMEOUT)
+    return drop_last_line(output)
+
+'''
+    Reads @param(conn) onto @param(output) until @param(done)(output) or @param(seconds) pass.
+    Nothing read is dropped when the time runs out - the caller decides whether to read on.
+'''
+def read_channel_until(conn, output, done, seconds):
+    expires = time.monotonic() + seconds
+    while not done(output):
+        if time.monotonic() >= expires:
+            break
+        output += conn.read_channel()
+        time.sleep(POLL)
+    return output
+
+'''
+    Netmiko - same framing using the raw channel. The command and its sentinel are sent once:
+    a read that passes its deadline keeps what it has read and reads on with a doubled deadline
+    up to RETRIES times, so output arriving late is still the output of this command. Only a
+    device that never finishes raises TimeoutError.
+'''
+def netmiko_send(device, command, minimum=Timeouts.MIN_TIMEOUT):
+    conn = device.conn
+    deadline = Timeouts.timeouts.deadline(device.ip, command, minimum)
+    marker = new_marker()
+    conn.clear_buffer()
+    conn.write_channel('%s\n%s\n' % (command, sentinel(device, marker)))
+    start = time.monotonic()
+    output = read_channel_until(conn, '', lambda output: marker in output, deadline)
+    for attempt in range(Timeouts.RETRIES):
+        if marker in output:
+            break
+        log.warning(f'%s: {device.ip} "{command}" sentinel not seen after {time.monotonic() - start:.1f}s - reading on', 'netmiko_send')
+        deadline = min(deadline * 2, Timeouts.MAX_TIMEOUT)
+        output = read_channel_until(conn, output, lambda output: marker in output, deadline)
+    if not marker in output:
+        raise TimeoutError(f'{device.ip}: "{command}" sentinel not seen after {time.monotonic() - start:.1f}s')
+    output, rest = output.split(marker, 1)
+    Timeouts.timeouts.observe(device.ip, command, time.monotonic() - start, len(output))
+    # the rest of the sentinel line up to the prompt, so the next command starts clean
+    read_channel_until(conn, rest, lambda rest: PROMPT_END.search(rest), Timeouts.DEFAULT_TIMEOUT)
+    # first line is the echoed command
+    output = drop_last_line(output.replace('\r\n', '\n'))
+    return output.split('\n', 1)[1] if '\n' in output else ''
+
+'''
+    Returns the prompt line of a freshly logged in SecureCRT @param(crtTab) by sending a bare
+    sentinel and reading everything echoed before it. ex. 'HOSTNAME#' or 'SSH@HOSTNAME#'
+'''
+def crt_detect_prompt(crtTab, timeout=Timeouts.DEFAULT_TIMEOUT):
+    marker = new_marker()
+    crtTab.Screen.Send('%s\r' % SENTINEL.format(marker))
+    output = crtTab.Screen.ReadString([marker], timeout)
+    if crtTab.Screen.MatchIndex == 0:
+        return ''
+    crtTab.Screen.WaitForString('\r\n', timeout)
+    # prompt line ends with the echoed start of the sentinel
+    line = output.splitlines()[-1] if output.strip() else ''
+    return line.rsplit(SENTINEL.format('').strip(), 1)[0].strip()
@@ -0,0 +1,126 @@
+'''
+    Declarative keyword grammar for config/show output sections.
+
+    Rules are registered as keyword phrases (ex. 'switchport access vlan') mapped to a handler.
+    Phrases are compiled into a token trie so every line is matched to exactly one handler by
+    walking at most as many tokens as the longest phrase, rather than testing the line against
+    every startswith/equality condition in turn.
+
+    Handlers are called as handler(device, state, line) where state is whatever the parser
+    needs to carry between lines (current interface dict, etc.)
+
+    ex.
+        INTERFACE = Grammar('interface')
+
+        @INTERFACE.rule('switchport access vlan')
+        def access_vlan(device, state, line):
+            state['interface']['access_vlan'] = line.split()[-1]
+
+        @INTERFACE.rule('shutdown', exact=True)
+        def shutdown(device, state, line):
+            state['interface']['shutdown'] = True
+'''
+import logging
+log = logging.getLogger(__name__)
+
+# Trie node keys - neither can collide with a token produced by str.split()
+PREFIX = None
+EXACT = ''
+
+class Grammar:
+    def __init__(self, name):
+        self.name = name
+        self.root = {}
+        self.startswith = []
+        self.contains = []
+
+    '''
+        Registers @param(handler) for lines beginning with the tokens in @param(phrase).
+        When @param(exact) is set the line must consist of the phrase only.
+        The longest matching phrase wins and an exact match wins over a prefix match.
+    '''
+    def add(self, phrase, handler, exact=False):
+        node = self.root
+        for token in phrase.split():
+            node = node.setdefault(token, {})
+        if (EXACT if exact else PREFIX) in node:
+            log.warning(f'%s: Grammar {self.name} - replacing rule for "{phrase}"', 'add')
+        node[EXACT if exact else PREFIX] = handler
+
+    '''
+        Registers @param(handler) for lines beginning with the characters @param(text), for
+        keywords that may run into the next word (ex. 'HW' in 'HW:Stackable').
+        Only checked when no phrase rule matches the line.
+    '''
+    def add_startswith(self, text, handler):
+        self.startswith.append((text, handler))
+
+    '''
+        Registers @param(handler) for lines containing @param(keyword) anywhere.
+        Only checked when no phrase rule matches the line.
+    '''
+    def add_contains(self, keyword, handler):
+        self.contains.append((keyword, handler))
+
+    '''
+        Decorator form of add()
+    '''
+    def rule(self, phrase, exact=False):
+        def register(handler):
+            self.add(phrase, handler, exact)
+            return handler
+        return register
+
+    '''
+        Decorator form of add_startswith()
+    '''
+    def rule_startswith(self, text):
+        def register(handler):
+            self.add_startswith(text, handler)
+            return handler
+        return register
+
+    '''
+        Decorator form of add_contains()
+    '''
+    def rule_contains(self, keyword):
+        def register(handler):
+            self.add_contains(keyword, handler)
+            return handler
+        return register
+
+    '''
+        returns
+            handler - the handler registered for @param(line) or None
+    '''
+    def match(self, line):
+        node = self.root
+        handler = None
+        for token in line.split():
+            node = node.get(token)
+            if node is None:
+                break
+            handler = node.get(PREFIX, handler)
+        else:
+            handler = node.get(EXACT, handler)
+        if handler is None:
+            for text, startswith_handler in self.startswith:
+                if line.startswith(text):
+                    return startswith_handler
+            for keyword, contains_handler in self.contains:
+                if keyword in line:
+                    return contains_handler
+        return handler
+
+    '''
+        Calls the matching handler for @param(line)
+
+        returns
+            True if a handler was found
+    '''
+    def dispatch(self, device, state, line):
+        handler = self.match(line)
+        if handler is None:
+            return False
+        handler(device, state, line)
+        return True
@@ -0,0 +1,181 @@
+'''
+    Per-command and per-parser timing instrumentation.
+
+    Decorating a device class with @instrument wraps send(), send_config(), disconnect() and
+    every parse_*/read_* method so each call records wall time, and for commands the bytes and
+    lines received, against the device it ran on. Times are inclusive - read_local() includes
+    the send() calls it makes. Each call is also added to the scan timeline (see Trace).
+
+    Commands are recorded by their stem - address and interface arguments are dropped so
+    'show ip arp 10.0.0.5' and 'show ip arp 10.0.0.6' add up under 'show ip arp'.
+
+    Results are aggregated per vendor and device_type and can be exported at the end of a run:
+        Metrics.recorder.save_json('metrics.json')
+        Metrics.recorder.save_prometheus('switchlist.prom')
+'''
+import json, logging, re, threading, time
+from functools import wraps
+import Trace
+log = logging.getLogger(__name__)
+
+COMMAND_METHODS = ('send', 'send_config')
+SESSION_METHODS = ('disconnect',)
+KINDS = ('command', 'parser', 'session')
+STAT_FIELDS = ('calls', 'errors', 'seconds', 'max_seconds', 'bytes', 'lines')
+# IP addresses/prefixes, MACs (0000.1111.2222 or 00:11:..) and ports (Gi1/0/1, 1/1/1) - anything numeric with . / or :
+ARGUMENT = re.compile(r'\S*\d[./:]\S*')
+
+def new_stats():
+    return dict.fromkeys(STAT_FIELDS, 0)
+
+def add_stats(stats, other):
+    for field in STAT_FIELDS:
+        if field == 'max_seconds':
+            stats[field] = max(stats[field], other[field])
+        else:
+            stats[field] += other[field]
+
+'''
+    Returns the metric label of @param(command) - the command without its address/interface arguments
+    ex. 'show mac address-table address 0011.2233.4455' -> 'show mac address-table address'
+'''
+def command_label(command):
+    return ' '.join(word for word in str(command).split() if not ARGUMENT.fullmatch(word))
+
+'''
+    Returns (bytes, lines) of a command's output - send_config() returns a list of outputs
+'''
+def output_size(output):
+    if isinstance(output, list):
+        output = '\n'.join(str(line) for line in output)
+    if not isinstance(output, str) or output == '':
+        return 0, 0
+    return len(output), output.count('\n') + 1
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.devices = {}
+
+    def reset(self):
+        with self.lock:
+            self.devices = {}
+
+    '''
+        Records a single call against the device it ran on.
+        @param(kind) is 'command', 'parser' or 'session' and @param(name) the command string or method name
+    '''
+    def record(self, device, kind, name, seconds, output=None, error=False):
+        size, lines = output_size(output) if kind == 'command' else (0, 0)
+        if kind == 'command':
+            name = command_label(name)
+        ip = getattr(device, 'ip', '')
+        with self.lock:
+            entry = self.devices.setdefault(ip, {'make': '', 'device_type': '', 'stats': {}})
+            # device_type is only known after parse_version() so keep the latest value
+            entry['make'] = getattr(device, 'make', '')
+            entry['device_type'] = getattr(device, 'device_type', '')
+            stats = entry['stats'].setdefault((kind, name), new_stats())
+            stats['calls'] += 1
+            stats['errors'] += 1 if error else 0
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['bytes'] += size
+            stats['lines'] += lines
+
+    '''
+        Returns
+            {
+                'devices': {ip: {'make':.., 'device_type':.., 'command': {name: stats}, 'parser': {...}, 'session': {...}}},
+                'vendors': {make: {device_type: {'command': {name: stats}, 'parser': {...}, 'session': {...}}}}
+            }
+    '''
+    def report(self):
+        devices = {}
+        vendors = {}
+        with self.lock:
+            for ip, entry in self.devices.items():
+                device = devices.setdefault(ip, {'make': entry['make'], 'device_type': entry['device_type']})
+                vendor = vendors.setdefault(entry['make'], {}).setdefault(entry['device_type'], {})
+                for kind in KINDS:
+                    device.setdefault(kind, {})
+                    vendor.setdefault(kind, {})
+                for (kind, name), stats in entry['stats'].items():
+                    device[kind][name] = dict(stats)
+                    add_stats(vendor[kind].setdefault(name, new_stats()), stats)
+        return {'devices': devices, 'vendors': vendors}
+
+    def save_json(self, outfile):
+        with open(outfile, 'w') as reportfile:
+            json.dump(self.report(), reportfile, indent=4)
+
+    '''
+        Writes the per vendor/device_type aggregates in Prometheus textfile collector format
+    '''
+    def save_prometheus(self, outfile):
+        vendors = self.report()['vendors']
+        metrics = {
+            'seconds_total': ('seconds', 'counter', 'Total wall time spent'),
+            'max_seconds': ('max_seconds', 'gauge', 'Longest single call'),
+            'calls_total': ('calls', 'counter', 'Number of calls'),
+            'errors_total': ('errors', 'counter', 'Number of calls that raised'),
+            'bytes_total': ('bytes', 'counter', 'Bytes of output received'),
+            'lines_total': ('lines', 'counter', 'Lines of output received'),
+        }
+        lines = []
+        for kind in KINDS:
+            for suffix, (field, metric_type, description) in metrics.items():
+                if kind != 'command' and field in ('bytes', 'lines'):
+                    continue
+                metric = f'switchlist_{kind}_{suffix}'
+                lines.append(f'# HELP {metric} {description} per {kind}')
+                lines.append(f'# TYPE {metric} {metric_type}')
+                for make, device_types in vendors.items():
+                    for device_type, kinds in device_types.items():
+                        for name, stats in kinds[kind].items():
+                            labels = f'vendor="{escape(make)}",device_type="{escape(device_type)}",{kind}="{escape(name)}"'
+                            lines.append(f'{metric}{{{labels}}} {stats[field]}')
+        with open(outfile, 'w') as promfile:
+            promfile.write('\n'.join(lines) + '\n')
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Default recorder used by all instrumented classes
+recorder = Recorder()
+
+def wrap(method, kind):
+    @wraps(method)
+    def timed(self, *args, **kwargs):
+        if kind == 'command':
+            name = args[0] if method.__name__ == 'send' and len(args) > 0 else kwargs.get('command', method.__name__)
+        else:
+            name = method.__name__
+        start = time.perf_counter()
+        try:
+            output = method(self, *args, **kwargs)
+        except Exception:
+            seconds = time.perf_counter() - start
+            recorder.record(self, kind, name, seconds, error=True)
+            Trace.tracer.add(name, kind, getattr(self, 'ip', ''), start, seconds, error=True)
+            raise
+        seconds = time.perf_counter() - start
+        recorder.record(self, kind, name, seconds, output)
+        Trace.tracer.add(name, kind, getattr(self, 'ip', ''), start, seconds)
+        return output
+    return timed
+
+'''
+    Class decorator - wraps send/send_config/disconnect and every parse_*/read_* method of @param(cls)
+'''
+def instrument(cls):
+    for name, method in list(vars(cls).items()):
+        if not callable(method):
+            continue
+        if name in COMMAND_METHODS:
+            setattr(cls, name, wrap(method, 'command'))
+        elif name in SESSION_METHODS:
+            setattr(cls, name, wrap(method, 'session'))
+        elif name.startswith('parse_') or name.startswith('read_'):
+            setattr(cls, name, wrap(method, 'parser'))
+    return cls
@@ -0,0 +1,325 @@
+'''
+    Local mock SSH device farm for load testing.
+
+    Serves simulated Cisco (IOS, IOS-XE, NX-OS) and Brocade devices on loopback, answering
+    commands from Offline-format capture JSON (see Offline.py and save_offline()). Each device
+    gets its own loopback address (127.x.x.x all route to lo on Linux) or its own port, so
+    hundreds of devices can run from one process:
+
+        python switch_src/MockFarm.py captures/ --count 300 --first-ip 127.1.0.1 --port 2222
+        python switch_src/MockFarm.py captures/ --count 50 --port 10000 --per-port --latency 0.2 --bandwidth 20000
+
+    The farm writes farm.json mapping every simulated address to the capture it serves.
+
+    Injected behavior (all optional):
+        latency       - seconds before each command's output (plus per-command overrides)
+        bandwidth     - bytes/second output is throttled to
+        auth_delay    - seconds added to every login (AAA)
+        auth_failure  - fraction of logins rejected
+        hang          - fraction of commands that never return the prompt
+        drop          - fraction of commands where the session drops part way through output
+
+    Requires paramiko (installed with netmiko).
+'''
+import argparse, ipaddress, json, logging, os, random, selectors, socket, threading, time
+log = logging.getLogger(__name__)
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+CHUNK = 1024
+INVALID = "% Invalid input detected at '^' marker.\r\n"
+
+'''
+    Injected latency, bandwidth and failures shared by a set of devices
+'''
+class Profile:
+    def __init__(self, latency=0.0, bandwidth=0, auth_delay=0.0, auth_failure=0.0, hang=0.0, drop=0.0, commands={}):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.auth_delay = auth_delay
+        self.auth_failure = auth_failure
+        self.hang = hang
+        self.drop = drop
+        # command -> latency overriding the default
+        self.commands = dict(commands)
+
+    def command_latency(self, command):
+        return self.commands.get(command, self.latency)
+
+'''
+    A simulated device answering from @param(captures) - a dict of command: output as saved by save_offline()
+'''
+class MockDevice:
+    def __init__(self, name, captures, profile=None, privileged=True, username='admin', password='admin'):
+        self.name = name
+        self.captures = captures
+        self.profile = profile or Profile()
+        self.privileged = privileged
+        self.username = username
+        self.password = password
+        # Offline captures without a device_type are Brocade (see Offline.init)
+        self.make = 'brocade' if 'brocade' in captures.get('device_type', 'brocade') else 'cisco'
+        self.hostname = self.find_hostname()
+        self.random = random.Random(name)
+
+    def find_hostname(self):
+        for line in self.captures.get('show run', '').splitlines():
+            if line.startswith('hostname '):
+                return line.split()[1].strip('"')
+        return 'MOCK-' + self.name.replace('.', '-').replace(':', '-')
+
+    def prompt(self, config_mode=False):
+        if self.make == 'brocade':
+            return 'SSH@%s%s#' % (self.hostname, '(config)' if config_mode else '')
+        if config_mode:
+            return '%s(config)#' % self.hostname
+        return self.hostname + ('#' if self.privileged else '>')
+
+    '''
+        Returns the output of @param(command) and the config mode after it ran
+    '''
+    def answer(self, command, config_mode):
+        if command == '' or command.startswith('!'):
+            return '', config_mode
+        if command in ('conf t', 'configure terminal'):
+            return '', True
+        if command == 'end':
+            return '', False
+        if config_mode:
+            return '', config_mode
+        if command in ('write mem', 'write memory'):
+            return 'Building configuration...\r\n[OK]\r\n', config_mode
+        if command.startswith('terminal ') or command == 'skip-page-display':
+            return '', config_mode
+        if command in self.captures:
+            output = self.captures[command]
+            if output == 'Unsupported':
+                return INVALID, config_mode
+            output = output.replace('\r\n', '\n').replace('\n', '\r\n')
+            if output and not output.endswith('\r\n'):
+                output += '\r\n'
+            return output, config_mode
+        return INVALID, config_mode
+
+if paramiko:
+    class SSHServer(paramiko.ServerInterface):
+        def __init__(self, device):
+            self.device = device
+            self.shell = threading.Event()
+
+        def get_allowed_auths(self, username):
+            return 'password'
+
+        def check_auth_password(self, username, password):
+            profile = self.device.profile
+            time.sleep(profile.auth_delay)
+            if self.device.random.random() < profile.auth_failure:
+                return paramiko.AUTH_FAILED
+            if username == self.device.username and password == self.device.password:
+                return paramiko.AUTH_SUCCESSFUL
+            return paramiko.AUTH_FAILED
+
+        def check_channel_request(self, kind, chanid):
+            if kind == 'session':
+                return paramiko.OPEN_SUCCEEDED
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+        def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+            return True
+
+        def check_channel_shell_request(self, channel):
+            self.shell.set()
+            return True
+
+class Farm:
+    def __init__(self, host_key=None):
+        if paramiko is None:
+            raise ImportError('MockFarm requires paramiko (pip install paramiko)')
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+        self.selector = selectors.DefaultSelector()
+        # (address, port) -> MockDevice
+        self.devices = {}
+        self.listeners = []
+        self.running = threading.Event()
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    def add(self, device, address='127.0.0.1', port=2222):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((address, port))
+        listener.listen(64)
+        listener.setblocking(False)
+        self.selector.register(listener, selectors.EVENT_READ, device)
+        self.listeners.append(listener)
+        self.devices[(address, port)] = device
+        return listener.getsockname()
+
+    '''
+        Accepts connections on every device until stop() - run in a thread or the main thread
+    '''
+    def serve(self):
+        self.running.set()
+        while self.running.is_set():
+            for key, events in self.selector.select(timeout=0.5):
+                try:
+                    conn, peer = key.fileobj.accept()
+                except OSError:
+                    continue
+                conn.setblocking(True)
+                threading.Thread(target=self.session, args=(conn, key.data), daemon=True).start()
+
+    def start(self):
+        thread = threading.Thread(target=self.serve, daemon=True)
+        thread.start()
+        self.running.wait()
+        return thread
+
+    def stop(self):
+        self.running.clear()
+        for listener in self.listeners:
+            self.selector.unregister(listener)
+            listener.close()
+        self.listeners = []
+
+    def session(self, conn, device):
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+        server = SSHServer(device)
+        try:
+            transport.start_server(server=server)
+            channel = transport.accept(30)
+            if channel is None or not server.shell.wait(10):
+                return
+            with self.lock:
+                self.sessions += 1
+            self.shell(channel, device)
+        except (EOFError, OSError, paramiko.SSHException) as e:
+            log.debug(f'%s: {device.name} session ended: {e}', 'session')
+        finally:
+            transport.close()
+
+    '''
+        Sends @param(data) throttled to the device bandwidth. Returns False if the session was dropped
+    '''
+    def send(self, channel, device, data, drop=False):
+        bandwidth = device.profile.bandwidth
+        cutoff = device.random.randint(0, len(data)) if drop else len(data)
+        for start in range(0, cutoff, CHUNK):
+            chunk = data[start:min(start + CHUNK, cutoff)]
+            channel.sendall(chunk.encode())
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+        return not drop
+
+    def shell(self, channel, device):
+        config_mode = False
+        profile = device.profile
+        channel.sendall(('\r\n%s' % device.prompt()).encode())
+        line = ''
+        previous = ''
+        while True:
+            data = channel.recv(1024)
+            if not data:
+                return
+            for char in data.decode(errors='replace'):
+                # SecureCRT ends lines with \r, Netmiko with \n - treat \r\n as one
+                if char == '\n' and previous == '\r':
+                    previous = char
+                    continue
+                previous = char
+                if not char in '\r\n':
+                    line += char
+                    channel.sendall(char.encode())
+                    continue
+                command = line.strip()
+                line = ''
+                channel.sendall(b'\r\n')
+                if command in ('exit', 'logout', 'quit') and not config_mode:
+                    channel.close()
+                    return
+                output, config_mode = device.answer(command, config_mode)
+                if command != '' and not command.startswith('!'):
+                    time.sleep(profile.command_latency(command))
+                    if device.random.random() < profile.hang:
+                        log.debug(f'%s: {device.name} hanging on "{command}"', 'shell')
+                        self.send(channel, device, output[:len(output) // 2])
+                        # never returns the prompt - the client has to time out
+                        while channel.recv(1024):
+                            pass
+                        return
+                    if device.random.random() < profile.drop:
+                        self.send(channel, device, output, drop=True)
+                        channel.close()
+                        return
+                self.send(channel, device, output)
+                channel.sendall(device.prompt(config_mode).encode())
+
+'''
+    Loads every Offline capture (<ip>.json) in @param(directory)
+'''
+def load_captures(directory):
+    captures = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename), 'r') as capturefile:
+                captures[filename[:-5]] = json.load(capturefile)
+    return captures
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve simulated Cisco/Brocade devices from Offline captures on loopback')
+    parser.add_argument('captures', help='Directory of Offline capture JSON files (<ip>.json)')
+    parser.add_argument('--count', type=int, default=0, help='Number of devices - captures are reused in turn (default: one per capture)')
+    parser.add_argument('--first-ip', default='127.0.0.1', help='Address of the first device')
+    parser.add_argument('--port', type=int, default=2222, help='SSH port (first port with --per-port)')
+    parser.add_argument('--per-port', action='store_true', help='Give each device its own port on --first-ip instead of its own address')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin')
+    parser.add_argument('--unprivileged', type=float, default=0.0, help='Fraction of Cisco devices logging in at a > prompt')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before each command output')
+    parser.add_argument('--command-latency', action='append', default=[], metavar='COMMAND=SECONDS', help='Latency for one command ex. "show run=2.5"')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Output throttle in bytes/second (0 = unlimited)')
+    parser.add_argument('--auth-delay', type=float, default=0.0, help='Seconds added to each login')
+    parser.add_argument('--auth-failure', type=float, default=0.0, help='Fraction of logins rejected')
+    parser.add_argument('--hang', type=float, default=0.0, help='Fraction of commands that never return the prompt')
+    parser.add_argument('--drop', type=float, default=0.0, help='Fraction of commands that drop the session mid output')
+    parser.add_argument('--map', default='farm.json', help='Where to write the address -> capture map')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    captures = load_captures(args.captures)
+    if len(captures) == 0:
+        parser.error(f'No capture files found in {args.captures}')
+    commands = {}
+    for entry in args.command_latency:
+        command, seconds = entry.rsplit('=', 1)
+        commands[command] = float(seconds)
+    profile = Profile(args.latency, args.bandwidth, args.auth_delay, args.auth_failure, args.hang, args.drop, commands)
+
+    farm = Farm()
+    names = list(captures)
+    count = args.count or len(names)
+    first_ip = ipaddress.ip_address(args.first_ip)
+    farm_map = {}
+    for i in range(count):
+        source = names[i % len(names)]
+        address = str(first_ip) if args.per_port else str(first_ip + i)
+        port = args.port + i if args.per_port else args.port
+        privileged = random.Random(i).random() >= args.unprivileged
+        device = MockDevice(f'{address}:{port}', captures[source], profile, privileged, args.username, args.password)
+        farm.add(device, address, port)
+        farm_map[f'{address}:{port}'] = {'capture': source, 'make': device.make, 'hostname': device.hostname}
+    with open(args.map, 'w') as mapfile:
+        json.dump(farm_map, mapfile, indent=4)
+    log.info(f'%s: Serving {count} devices from {len(names)} captures - map written to {args.map}', 'main')
+    try:
+        farm.serve()
+    except KeyboardInterrupt:
+        farm.stop()
+
+if __name__ == "__main__":
+    main()
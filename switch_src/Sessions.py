@@ -0,0 +1,117 @@
+'''
+    Authenticated session reuse.
+
+    Every login goes through AAA which takes several seconds against TACACS, so a scan followed
+    by save_offline() or a send_config() push should not log in twice. SessionPool keeps the
+    Cisco/Brocade Object of each device keyed by IP, health-checks it with connected() before
+    handing it out again and disconnects sessions left idle longer than @param(idle_timeout).
+    A session is idle from the time it is handed back with release() - one that is still in
+    use is never closed by close_idle().
+
+    ex.
+        pool = SessionPool(lambda ip: Switch.connect(crt, username, password, ip))
+        switch = pool.connect(ip)      # logs in
+        ...
+        pool.release(switch)
+        switch = pool.connect(ip)      # same session
+        pool.close_all()
+
+    Pooled devices carry their pool in switch.pool so SwitchMap.map_host() releases the session
+    instead of disconnecting it.
+'''
+import logging, threading, time
+log = logging.getLogger(__name__)
+
+class SessionPool:
+    def __init__(self, connect, idle_timeout=300):
+        self.login = connect
+        self.idle_timeout = idle_timeout
+        # ip -> [switch Object, released at (None while in use)]
+        self.sessions = {}
+        self.lock = threading.RLock()
+        self.logins = 0
+        self.reused = 0
+
+    '''
+        Returns True if @param(switch) still has a usable session
+    '''
+    def healthy(self, switch):
+        try:
+            return bool(switch.connected())
+        except Exception as e:
+            log.debug(f'%s: Health check failed for {switch.ip}: {e}', 'healthy')
+            return False
+
+    '''
+        Returns the pooled session for @param(ip), logging in if there is none or it has dropped.
+        Returns None if the device is offline (same as Switch.connect)
+    '''
+    def connect(self, ip):
+        with self.lock:
+            self.close_idle()
+            entry = self.sessions.get(ip)
+            if entry is not None:
+                if self.healthy(entry[0]):
+                    log.debug(f'%s: Reusing session to {ip}', 'connect')
+                    entry[1] = None
+                    self.reused += 1
+                    return entry[0]
+                log.info(f'%s: Session to {ip} dropped - logging in again', 'connect')
+                self.sessions.pop(ip)
+        switch = self.login(ip)
+        if not switch:
+            return switch
+        switch.pool = self
+        with self.lock:
+            self.logins += 1
+            self.sessions[ip] = [switch, None]
+        return switch
+
+    '''
+        Hands @param(switch) back to the pool - its idle time starts now
+    '''
+    def release(self, switch):
+        with self.lock:
+            for entry in self.sessions.values():
+                if entry[0] is switch:
+                    entry[1] = time.monotonic()
+                    return
+
+    '''
+        Disconnects and forgets the session to @param(ip)
+    '''
+    def close(self, ip):
+        with self.lock:
+            entry = self.sessions.pop(ip, None)
+        if entry is None:
+            return
+        switch = entry[0]
+        try:
+            if self.healthy(switch):
+                switch.disconnect()
+        except Exception as e:
+            log.warning(f'%s: Could not disconnect from {ip}: {e}', 'close')
+
+    '''
+        Disconnects every session released longer than idle_timeout ago
+    '''
+    def close_idle(self):
+        now = time.monotonic()
+        with self.lock:
+            idle = [ip for ip, (switch, released) in self.sessions.items() if released is not None and now - released > self.idle_timeout]
+        for ip in idle:
+            log.debug(f'%s: Closing idle session to {ip}', 'close_idle')
+            self.close(ip)
+
+    def close_all(self):
+        with self.lock:
+            ips = list(self.sessions)
+        for ip in ips:
+            self.close(ip)
+        log.info(f'%s: {self.logins} logins, {self.reused} sessions reused', 'close_all')
+
+    def __contains__(self, ip):
+        return ip in self.sessions
+
+    def __len__(self):
+        return len(self.sessions)
@@ -13,18 +13,38 @@ import SecureCRT
 import os, sys, logging, subprocess
 local_path = os.path.dirname(os.path.realpath(__file__)) # gets full local directory path
 sys.path.insert(1, local_path) # this sets the import path to the local directory
-from Cisco import Cisco
-from Brocade import Brocade
+from Metrics import recorder # timing data for every device connected through this module
+from Trace import tracer # timeline of every host connected through this module
+from Sessions import SessionPool
+from Timeouts import timeouts # per-device read timeout model
+import Framing
+from Fingerprints import FingerprintCache
+from AclEngine import FleetAcls # fleet-wide ACL flow queries
 
 prompts = ['#','>']
+# Frame command output with a sentinel instead of matching the prompt (see Framing)
+framing = False
 
 def info_prompt():
 	username = crt.Dialog.Prompt('Enter your username:', 'SSH User')
 	password = crt.Dialog.Prompt('Enter your password:', 'SSH Password','', isPassword=True)
 	return username, password
 
+#	Vendor modules are only imported once a device of that make logs in
+def cisco(**kwargs):
+	from Cisco import Cisco
+	return Cisco(**kwargs)
+
+def brocade(**kwargs):
+	from Brocade import Brocade
+	return Brocade(**kwargs)
+
 #	This will ping the device before attempting to connect to save time waiting for SSH timeouts
 def host_online(ip):
+	with tracer.span('ping', 'network', ip):
+		return ping(ip)
+
+def ping(ip):
 	try:
 		output = subprocess.check_output("ping -n 1 -w 1 %s" % ip, shell=True, universal_newlines=True)
 		if 'unreachable' in output:
@@ -41,37 +61,75 @@ def host_online(ip):
 def ssh_connect(crt, username, password, host):
 	# These are command line switches for SecureCRT. If you need more options, search for SecureCRT cli options
 	cmd = '/SSH2 /L %s /PASSWORD %s %s /AcceptHostKeys' % (username, password, host)
-	return crt.Session.ConnectInTab(cmd, True, False)
+	# SecureCRT performs the TCP connect and authentication as a single call
+	with tracer.span('connect+auth', 'session', host):
+		return crt.Session.ConnectInTab(cmd, True, False)
 
 #	Returns a switch Object based on the prompt recieved on successful SSH login
 def switch_init(crtTab, host):
 	crtTab.Screen.Synchronous = True
-	hostname = crtTab.Screen.ReadString(prompts, 5).split()[-1]
+	if framing:
+		return framed_init(crtTab, host)
+	with tracer.span('prompt detection', 'session', host):
+		hostname = crtTab.Screen.ReadString(prompts, 5).split()[-1]
 	logging.debug('Grabbed hostname %s' % hostname)
 	if 'SSH@' in hostname:
 		logging.debug('Found Brocade switch', 'Switch.switch_init')
-		return Brocade(crtTab=crtTab, conn_type='CRT', ip=host)
+		return brocade(crtTab=crtTab, conn_type='CRT', ip=host)
 	prompt_char = prompts[crtTab.Screen.MatchIndex - 1]
 	logging.debug('Prompt char %s' % prompt_char)
 	if prompt_char == '#':
 		logging.debug('Found Cisco switch', 'Switch.switch_init')
-		return Cisco(crtTab=crtTab, conn_type='CRT', ip=host, hostname=hostname)
+		return cisco(crtTab=crtTab, conn_type='CRT', ip=host, hostname=hostname)
 
 	if prompt_char == '>':
 		logging.debug('Found Cisco switch', 'Switch.switch_init')
 		logging.warn('Cisco switch %s in non-privileged mode.' % host, 'Switch.switch_init')
-		return Cisco(crtTab=crtTab, conn_type='CRT', ip=host, hostname=hostname, privileged=False)
+		return cisco(crtTab=crtTab, conn_type='CRT', ip=host, hostname=hostname, privileged=False)
 
 	logging.error('Unable to initialize switch for IP: %s' % host, 'Switch.switch_init')
 	return None
+
+#	switch_init() using a sentinel to read the prompt - does not depend on matching '#' or '>'
+def framed_init(crtTab, host):
+	with tracer.span('prompt detection', 'session', host):
+		prompt = Framing.crt_detect_prompt(crtTab)
+	logging.debug('Grabbed prompt %s' % prompt)
+	if prompt == '':
+		logging.error('Unable to initialize switch for IP: %s' % host, 'Switch.framed_init')
+		return None
+	if 'SSH@' in prompt:
+		return brocade(crtTab=crtTab, conn_type='CRT', ip=host, hostname=prompt[:-1], prompt=prompt, framing=True)
+	if prompt.endswith('>'):
+		logging.warning('Cisco switch %s in non-privileged mode.' % host)
+	return cisco(crtTab=crtTab, conn_type='CRT', ip=host, hostname=prompt[:-1], privileged=prompt.endswith('#'), framing=True)
 		
+#	Skips vendor detection for a device with a known @param(fingerprint) (see Fingerprints)
+#	Only the stored prompt is waited for - anything else falls back to switch_init()
+def fingerprint_init(crtTab, host, fingerprint):
+	crtTab.Screen.Synchronous = True
+	with tracer.span('prompt check', 'session', host):
+		crtTab.Screen.ReadString([fingerprint['prompt']], 2)
+		matched = crtTab.Screen.MatchIndex == 1
+	if not matched:
+		logging.info('Fingerprint of %s no longer matches - detecting device' % host)
+		# redraw the prompt for switch_init
+		crtTab.Screen.Send('\r')
+		return switch_init(crtTab, host)
+	if fingerprint['make'] == 'Brocade':
+		return brocade(crtTab=crtTab, conn_type='CRT', ip=host, hostname=fingerprint['hostname'], prompt=fingerprint['prompt'], framing=framing)
+	return cisco(crtTab=crtTab, conn_type='CRT', ip=host, hostname=fingerprint['hostname'], privileged=fingerprint['privileged'],
+		device_type=fingerprint['device_type'], framing=framing)
+
 #	Callable function for use by external modules
-def connect(crtSession, username, password, host, ignore_ping=False):
+def connect(crtSession, username, password, host, ignore_ping=False, fingerprint=None):
 	logging.info('Connecting to device %s' % host, 'Switch.connect')
 	if ignore_ping:
 		logging.debug('Ignoring device online check.', 'Switch.connect')
 	if ignore_ping or host_online(host):
 		tab = ssh_connect(crtSession, username, password, host)
+		if fingerprint:
+			return fingerprint_init(tab, host, fingerprint)
 		return switch_init(tab, host)
 	logging.warn('Host %s offline' % host, 'Switch.connect')
 	return None
\ No newline at end of file
@@ -0,0 +1,207 @@
+'''
+    Columnar storage for large MAC address and ARP tables.
+
+    A distribution switch can hold 50-100k MAC entries. Stored as a dict of dicts of strings
+    that is several hundred bytes per entry; here every column is a typed array instead:
+        MAC     - 48-bit integer
+        IP      - 32-bit integer
+        VLAN    - small integer
+        PORT/TYPE/etc. - interned category codes
+
+    A hash index maps the encoded key to its row, and rows are read back as plain dicts so
+    existing code such as Cisco.parse_upstream() can keep using table[key]['PORT'].
+
+    Run this module directly for a memory comparison against the dict-of-dicts layout.
+'''
+import logging, socket
+from array import array
+log = logging.getLogger(__name__)
+
+HEX_DIGITS = '0123456789abcdef'
+
+'''
+    MAC address column - stored as a 48-bit integer, read back as Cisco dotted format
+'''
+class Mac:
+    typecode = 'Q'
+
+    def encode(self, value):
+        return int(''.join(c for c in value.lower() if c in HEX_DIGITS), 16)
+
+    def decode(self, code):
+        digits = '%012x' % code
+        return '.'.join([digits[0:4], digits[4:8], digits[8:12]])
+
+'''
+    IPv4 address column - stored as a 32-bit integer
+'''
+class Ipv4:
+    typecode = 'I'
+
+    def encode(self, value):
+        return int.from_bytes(socket.inet_aton(value), 'big')
+
+    def decode(self, code):
+        return socket.inet_ntoa(code.to_bytes(4, 'big'))
+
+'''
+    Interned strings - each distinct value is stored once and rows hold its code
+'''
+class Category:
+    typecode = 'H'
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+'''
+    Numeric strings (VLAN IDs, ARP age) stored as integers.
+    Anything that would not round-trip (ex. '-', 'All', '010') falls back to a category code.
+'''
+class SmallInt(Category):
+    LIMIT = 0x8000
+
+    def encode(self, value):
+        if value.isdigit() and int(value) < self.LIMIT and str(int(value)) == value:
+            return int(value)
+        return self.LIMIT + super().encode(value)
+
+    def decode(self, code):
+        if code < self.LIMIT:
+            return str(code)
+        return super().decode(code - self.LIMIT)
+
+class Table:
+    def __init__(self, key, **columns):
+        self.key = key
+        self.keys_column = array(key.typecode)
+        self.codecs = columns
+        self.columns = {name: array(codec.typecode) for name, codec in columns.items()}
+        self.index = {}
+
+    '''
+        Adds a row - an existing key is overwritten the same way as a dict assignment
+    '''
+    def add(self, key, row):
+        code = self.key.encode(key)
+        position = self.index.get(code)
+        if position is None:
+            self.index[code] = len(self.keys_column)
+            self.keys_column.append(code)
+            for name, codec in self.codecs.items():
+                self.columns[name].append(codec.encode(row[name]))
+        else:
+            for name, codec in self.codecs.items():
+                self.columns[name][position] = codec.encode(row[name])
+
+    def __setitem__(self, key, row):
+        self.add(key, row)
+
+    def row(self, position):
+        return {name: codec.decode(self.columns[name][position]) for name, codec in self.codecs.items()}
+
+    def position(self, key):
+        try:
+            return self.index.get(self.key.encode(key))
+        except (ValueError, OSError):
+            return None
+
+    def __getitem__(self, key):
+        position = self.position(key)
+        if position is None:
+            raise KeyError(key)
+        return self.row(position)
+
+    def get(self, key, default=None):
+        position = self.position(key)
+        if position is None:
+            return default
+        return self.row(position)
+
+    def __contains__(self, key):
+        return self.position(key) is not None
+
+    def __len__(self):
+        return len(self.keys_column)
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        decode = self.key.decode
+        return (decode(code) for code in self.keys_column)
+
+    def values(self):
+        return (self.row(position) for position in range(len(self.keys_column)))
+
+    def items(self):
+        decode = self.key.decode
+        return ((decode(code), self.row(position)) for position, code in enumerate(self.keys_column))
+
+    def to_dict(self):
+        return dict(self.items())
+
+'''
+    Layout of the table returned by Cisco.parse_mac_table()/Brocade.parse_mac_table()
+'''
+def mac_table():
+    return Table(Mac(), VLAN=SmallInt(), TYPE=Category(), PORT=Category())
+
+'''
+    Layout of the table returned by Cisco.parse_arp_table()
+'''
+def arp_table():
+    return Table(Ipv4(), PORT=Category(), TYPE=Category(), MAC=Mac(), AGE=SmallInt(), PROTOCOL=Category())
+
+'''
+    Layout of the table returned by Brocade.parse_arp_table()
+'''
+def brocade_arp_table():
+    return Table(Ipv4(), PORT=Category(), TYPE=Category(), MAC=Mac(), AGE=SmallInt(), VLAN=SmallInt())
+
+'''
+    Compares memory used by a 100k entry MAC table in the dict-of-dicts and columnar layouts
+'''
+def benchmark(entries=100000):
+    import tracemalloc, random
+    lines = []
+    for i in range(entries):
+        digits = '%012x' % random.getrandbits(48)
+        mac = '.'.join([digits[0:4], digits[4:8], digits[8:12]])
+        lines.append(' %d    %s    DYNAMIC     Gi%d/0/%d' % (random.randint(1, 999), mac, random.randint(1, 8), random.randint(1, 48)))
+
+    tracemalloc.start()
+    legacy = {}
+    for line in lines:
+        vlan, mac, type, port = line.split()
+        legacy[mac] = {'VLAN': vlan, 'TYPE': type, 'PORT': port}
+    legacy_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del legacy
+
+    tracemalloc.start()
+    table = mac_table()
+    for line in lines:
+        vlan, mac, type, port = line.split()
+        table.add(mac, {'VLAN': vlan, 'TYPE': type, 'PORT': port})
+    table_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f'{entries} MAC entries')
+    print(f'dict of dicts: {legacy_size / 2**20:.1f} MiB')
+    print(f'columnar:      {table_size / 2**20:.1f} MiB ({legacy_size / table_size:.1f}x smaller)')
+    return legacy_size, table_size
+
+if __name__ == "__main__":
+    benchmark()
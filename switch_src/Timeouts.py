@@ -0,0 +1,193 @@
+'''
+    Adaptive per-device read timeouts.
+
+    A fixed ReadString timeout cuts off a large 'show run' or 'show mac address-table' over a slow
+    link and makes a hung fast device wait the full timeout. Instead, every command that
+    completes is fed back into a model of the device:
+        RTT          - time taken by commands with small outputs
+        bytes/second - throughput measured on large outputs
+        output size  - bytes previously returned by the same command (this device, else fleet average)
+    and each command's deadline is MARGIN x (RTT + expected bytes / bytes per second), kept
+    between MIN_TIMEOUT and MAX_TIMEOUT. The model can be saved and loaded between runs.
+
+    A read that hits its deadline before the prompt is treated as truncated: reading continues
+    with a doubled deadline up to RETRIES times. Netmiko drops a timed out read, so once the
+    prompt is back the command is sent once more with a deadline covering the time it took.
+    A command is never sent while output of an earlier attempt can still arrive - it would be
+    read as the output of the next one - and partial output is never parsed.
+'''
+import json, logging, os, re, sys, threading, time
+log = logging.getLogger(__name__)
+
+MARGIN = 3.0
+MIN_TIMEOUT = 2.0
+MAX_TIMEOUT = 300.0
+# used until a device has been measured - same as the previous fixed timeout
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_BYTES = 4096
+SMALL_OUTPUT = 512 # outputs up to this size measure RTT
+LARGE_OUTPUT = 8192 # outputs from this size measure throughput
+RETRIES = 2
+# weight of the newest sample in each moving average
+ALPHA = 0.3
+
+def average(current, sample):
+    return sample if current is None else current + ALPHA * (sample - current)
+
+class TimeoutModel:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # ip -> {'rtt': seconds, 'rate': bytes per second}
+        self.devices = {}
+        # ip -> {command: {'bytes': .., 'seconds': ..}}
+        self.commands = {}
+
+    '''
+        Records a completed read of @param(size) bytes that took @param(seconds)
+    '''
+    def observe(self, ip, command, seconds, size):
+        with self.lock:
+            device = self.devices.setdefault(ip, {'rtt': None, 'rate': None})
+            if size <= SMALL_OUTPUT:
+                device['rtt'] = average(device['rtt'], seconds)
+            elif size >= LARGE_OUTPUT:
+                transfer = max(seconds - (device['rtt'] or 0), 0.01)
+                device['rate'] = average(device['rate'], size / transfer)
+            stats = self.commands.setdefault(ip, {}).setdefault(command, {'bytes': None, 'seconds': None})
+            stats['bytes'] = average(stats['bytes'], size)
+            stats['seconds'] = average(stats['seconds'], seconds)
+
+    '''
+        Records a read of @param(command) that took @param(seconds) but whose output was lost.
+        Only the time is kept, so the next deadline for the command covers it.
+    '''
+    def observe_time(self, ip, command, seconds):
+        expected = self.expected_bytes(ip, command)
+        with self.lock:
+            stats = self.commands.setdefault(ip, {}).setdefault(command, {'bytes': expected, 'seconds': None})
+            stats['seconds'] = average(stats['seconds'], seconds)
+
+    '''
+        Bytes expected from @param(command) - from this device if it has run it, else the fleet average
+    '''
+    def expected_bytes(self, ip, command):
+        stats = self.commands.get(ip, {}).get(command)
+        if stats is not None:
+            return stats['bytes']
+        sizes = [commands[command]['bytes'] for commands in self.commands.values() if command in commands]
+        if len(sizes) > 0:
+            return sum(sizes) / len(sizes)
+        return DEFAULT_BYTES
+
+    '''
+        Returns the read timeout in seconds for @param(command) on @param(ip).
+        @param(minimum) raises the floor for commands that are slow regardless of output (write mem)
+    '''
+    def deadline(self, ip, command, minimum=MIN_TIMEOUT):
+        device = self.devices.get(ip)
+        stats = self.commands.get(ip, {}).get(command)
+        if device is None or device['rtt'] is None:
+            # a command that ran past the default before (observe_time) gets the time it took
+            taken = MARGIN * stats['seconds'] if stats is not None and stats['seconds'] else 0
+            return min(max(DEFAULT_TIMEOUT, minimum, taken), MAX_TIMEOUT)
+        seconds = device['rtt']
+        if device['rate'] is not None:
+            seconds += self.expected_bytes(ip, command) / device['rate']
+        if stats is not None:
+            seconds = max(seconds, stats['seconds'])
+        else:
+            # only shorten the timeout of commands this device has already answered
+            minimum = max(minimum, DEFAULT_TIMEOUT)
+        return min(max(MARGIN * seconds, minimum), MAX_TIMEOUT)
+
+    def save(self, outfile):
+        with self.lock:
+            data = {'devices': self.devices, 'commands': self.commands}
+            with open(outfile, 'w') as modelfile:
+                json.dump(data, modelfile, indent=4)
+
+    '''
+        Loads measurements from a previous run - does nothing if @param(infile) does not exist
+    '''
+    def load(self, infile):
+        if not os.path.exists(infile):
+            return
+        with open(infile, 'r') as modelfile:
+            data = json.load(modelfile)
+        with self.lock:
+            self.devices.update(data.get('devices', {}))
+            self.commands.update(data.get('commands', {}))
+
+# Default model shared by every device in a run
+timeouts = TimeoutModel()
+
+'''
+    Returns netmiko's ReadTimeout. netmiko takes a fifth of a second to import, so it is left
+    to whoever opens a Netmiko connection - until then nothing can raise ReadTimeout.
+'''
+def read_timeout():
+    exceptions = sys.modules.get('netmiko.exceptions')
+    return exceptions.ReadTimeout if exceptions else TimeoutError
+
+'''
+    SecureCRT read of a sent @param(command) up to @param(prompt) with an adaptive deadline.
+    ReadString leaves Screen.MatchIndex at 0 when the deadline passes before the prompt.
+'''
+def crt_read(device, command, prompt, minimum=MIN_TIMEOUT):
+    screen = device.crtTab.Screen
+    deadline = timeouts.deadline(device.ip, command, minimum)
+    start = time.monotonic()
+    output = ''
+    for attempt in range(RETRIES + 1):
+        output += screen.ReadString([prompt], deadline)
+        if screen.MatchIndex > 0:
+            timeouts.observe(device.ip, command, time.monotonic() - start, len(output))
+            return output
+        log.warning(f'%s: {device.ip} "{command}" truncated after {len(output)} bytes at {deadline:.1f}s', 'crt_read')
+        deadline = min(deadline * 2, MAX_TIMEOUT)
+    raise TimeoutError(f'{device.ip}: no prompt after "{command}" - output truncated at {len(output)} bytes')
+
+'''
+    Reads on to the prompt after @param(command) timed out at @param(deadline), doubling the
+    deadline up to RETRIES times. Returns the output read after the timeout without the prompt.
+'''
+def netmiko_drain(device, command, deadline, start):
+    conn = device.conn
+    # base_prompt alone also matches lines such as 'hostname HOST' - only a prompt ends a line with >/#
+    prompt = re.escape(conn.base_prompt) + r'[>#]\s*$'
+    for attempt in range(RETRIES):
+        deadline = min(deadline * 2, MAX_TIMEOUT)
+        try:
+            output = conn.read_until_pattern(pattern=prompt, re_flags=re.M, read_timeout=deadline)
+        except read_timeout():
+            log.warning(f'%s: {device.ip} "{command}" still running at {deadline:.1f}s', 'netmiko_drain')
+            continue
+        timeouts.observe_time(device.ip, command, time.monotonic() - start)
+        return re.sub(prompt, '', output, flags=re.M).strip()
+    raise TimeoutError(f'{device.ip}: no prompt after "{command}" in {time.monotonic() - start:.1f}s')
+
+'''
+    Netmiko send_command() with an adaptive read_timeout.
+
+    netmiko drops what it has read when ReadTimeout is raised, so a command that runs past its
+    deadline is read on to the prompt (netmiko_drain) and then sent once more with a deadline
+    covering the time it took. TimeoutError is raised if that times out as well.
+    With @param(tail) the output read after the deadline is returned instead of sending the
+    command again - for commands whose result is in their last lines (write mem).
+'''
+def netmiko_send(device, command, minimum=MIN_TIMEOUT, tail=False):
+    conn = device.conn
+    for attempt in range(2):
+        deadline = timeouts.deadline(device.ip, command, minimum)
+        start = time.monotonic()
+        try:
+            output = conn.send_command(command, read_timeout=deadline)
+        except read_timeout():
+            log.warning(f'%s: {device.ip} "{command}" timed out at {deadline:.1f}s - reading on to the prompt', 'netmiko_send')
+        else:
+            timeouts.observe(device.ip, command, time.monotonic() - start, len(output))
+            return output
+        output = netmiko_drain(device, command, deadline, start)
+        if tail:
+            return output
+    raise TimeoutError(f'{device.ip}: "{command}" timed out again at {deadline:.1f}s - output truncated')
@@ -0,0 +1,83 @@
+'''
+    Scan timeline tracing.
+
+    Records spans (ping, SSH connect/auth, prompt detection, each command, each parse step,
+    disconnect) per host and writes them as Chrome trace-event JSON, which can be opened in
+    chrome://tracing or https://ui.perfetto.dev. Each host gets its own lane so a whole run
+    can be read as a timeline.
+
+    A span is two perf_counter() calls and a list append, so this is left on by default.
+'''
+import json, logging, threading, time
+from contextlib import contextmanager
+log = logging.getLogger(__name__)
+
+class Tracer:
+    def __init__(self):
+        self.enabled = True
+        self.epoch = time.perf_counter()
+        self.events = []
+        self.lanes = {}
+        self.lock = threading.Lock()
+
+    def reset(self):
+        self.epoch = time.perf_counter()
+        self.events = []
+        self.lanes = {}
+
+    '''
+        Returns the lane (trace thread id) for @param(host)
+    '''
+    def lane(self, host):
+        lane = self.lanes.get(host)
+        if lane is None:
+            with self.lock:
+                lane = self.lanes.setdefault(host, len(self.lanes) + 1)
+        return lane
+
+    '''
+        Records a finished span - @param(start) is a time.perf_counter() value
+    '''
+    def add(self, name, category, host, start, seconds, **args):
+        if self.enabled:
+            self.events.append((name, category, host, start, seconds, args))
+
+    '''
+        Context manager form of add()
+
+        ex.
+            with tracer.span('ping', 'network', ip):
+                ...
+    '''
+    @contextmanager
+    def span(self, name, category, host, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, host, start, time.perf_counter() - start, **args)
+
+    def json(self):
+        events = []
+        for name, category, host, start, seconds, args in list(self.events):
+            events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round((start - self.epoch) * 1e6, 1),
+                'dur': round(seconds * 1e6, 1),
+                'pid': 1,
+                'tid': self.lane(host),
+                'args': args
+            })
+        # label each lane with its host
+        for host, lane in list(self.lanes.items()):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lane, 'args': {'name': host}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, outfile):
+        with open(outfile, 'w') as tracefile:
+            json.dump(self.json(), tracefile)
+
+# Default tracer used by the Switch module and instrumented device classes
+tracer = Tracer()
@@ -0,0 +1,135 @@
+'''
+    Headless entry point - runs without SecureCRT.
+
+        python switchlist_cli.py check 192.168.0.10                 log in over Netmiko and print the device record
+        python switchlist_cli.py check 192.168.0.10 --offline captures
+                                                                    same from an Offline capture (<ip>.json)
+        python switchlist_cli.py scan scan.yml --offline captures  scan a scan.yml (or a shard of one, see
+                                                                    SwitchList/Shards.py) into switches.json beside it
+        python switchlist_cli.py excel switches.json switches.xlsx  write the Excel list from switches.json
+
+    Each command imports only what it uses: check never loads pandas and excel never loads
+    netmiko or the vendor modules, so a single-host check starts in a fraction of a second.
+'''
+import argparse, getpass, json, logging, os, sys
+
+SWITCH_SRC = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'switch_src')
+
+'''
+    Logs in to @param(host) over Netmiko and returns a Cisco/Brocade Object based on the prompt
+'''
+def netmiko_connect(username, password, host, port=22):
+    from netmiko import ConnectHandler, redispatch
+    # log in without vendor session setup, then switch driver once the prompt is known
+    conn = ConnectHandler(device_type='terminal_server', host=host, port=port, username=username, password=password)
+    prompt = conn.find_prompt()
+    sys.path.insert(1, SWITCH_SRC)
+    if prompt.startswith('SSH@'):
+        redispatch(conn, device_type='ruckus_fastiron')
+        from Brocade import Brocade
+        return Brocade(conn=conn, conn_type='SSH', ip=host, hostname=prompt[:-1].replace('SSH@', ''), prompt=prompt)
+    redispatch(conn, device_type='cisco_ios')
+    from Cisco import Cisco
+    return Cisco(conn=conn, conn_type='SSH', ip=host, hostname=prompt[:-1], privileged=prompt.endswith('#'))
+
+'''
+    Returns connect(ip) for the Offline captures or Netmiko login chosen on the command line
+'''
+def make_connect(args):
+    if args.offline:
+        sys.path.insert(1, SWITCH_SRC)
+        from switch_src.Offline import Offline
+        return Offline(args.offline).init
+    username = args.username or input('Username: ')
+    password = args.password or getpass.getpass('Password: ')
+    return lambda ip: netmiko_connect(username, password, ip, args.port)
+
+def check(args):
+    from SwitchList import SwitchMap
+    connect = make_connect(args)
+    record = SwitchMap.scan_host(connect, args.host)
+    print(json.dumps(record.json() if isinstance(record, SwitchMap.DeviceRecord) else record, indent=4))
+    return 0 if not record['Make'] in ('Offline', 'NOLOGIN') else 1
+
+def scan(args):
+    import yaml
+    from SwitchList import SwitchMap, Scheduler, Progress, Shards
+    outdir = os.path.dirname(os.path.abspath(args.scanfile))
+    jsonfile = os.path.join(outdir, 'switches.json')
+    with open(args.scanfile, 'r') as configfile:
+        config = yaml.safe_load(configfile)
+    scan_list, reserved = SwitchMap.parse_list(config['scan'])
+    reserved.update(config.get('reserved') or {})
+    current_switches = {}
+    if os.path.exists(jsonfile):
+        with open(jsonfile, 'r') as jsonlist:
+            current_switches = json.load(jsonlist)
+
+    connect = make_connect(args)
+    switchmap = {}
+    scheduler = Scheduler.ScanScheduler.from_config(config.get('concurrency', {}) or {})
+    for sheet in scan_list:
+        for group in scan_list[sheet]:
+            switchmap.setdefault(sheet, {}).setdefault(group, {})
+            previous = current_switches.get(sheet, {}).get(group, {})
+            for ip in scan_list[sheet][group]:
+                if ip in reserved:
+                    switchmap[sheet][group][ip] = reserved[ip]
+                    continue
+                scheduler.add(ip, sheet, group, previous.get(ip, {}).get('Upstream', ''), connect)
+
+    progress = Progress.ProgressReporter(scheduler.pending, os.path.join(outdir, 'status.json'))
+
+    def done(job, result):
+        switchmap[job.sheet][job.group][job.ip] = result
+
+    if scheduler.pending > 0:
+        scheduler.run(lambda job: SwitchMap.scan_host(job.connect, job.ip, (), progress), done)
+        progress.close()
+        Shards.save_times(os.path.join(outdir, 'scantimes.json'), progress.seconds)
+    SwitchMap.savelist(switchmap, current_switches, jsonfile)
+    return 0
+
+def excel(args):
+    from SwitchList import Excel
+    with open(args.infile, 'r') as jsonlist:
+        switches = json.load(jsonlist)
+    outfile = os.path.abspath(args.outfile)
+    # update_file() writes its temporary workbook to the working directory
+    os.chdir(os.path.dirname(outfile))
+    Excel.update_file(outfile, switches)
+    print(f'Wrote {outfile}')
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless switchlist commands')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='-v info, -vv debug')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = commands.add_parser('check', help='Map a single host and print its record')
+    check_parser.add_argument('host')
+    check_parser.add_argument('--port', type=int, default=22)
+    check_parser.add_argument('--username', help='Prompted for if not given')
+    check_parser.add_argument('--password', help='Prompted for if not given')
+    check_parser.add_argument('--offline', metavar='DIR', help='Read the host from Offline captures in DIR instead of logging in')
+    check_parser.set_defaults(run=check)
+
+    scan_parser = commands.add_parser('scan', help='Scan every host of a scan.yml into switches.json beside it')
+    scan_parser.add_argument('scanfile')
+    scan_parser.add_argument('--port', type=int, default=22)
+    scan_parser.add_argument('--username', help='Prompted for if not given')
+    scan_parser.add_argument('--password', help='Prompted for if not given')
+    scan_parser.add_argument('--offline', metavar='DIR', help='Read hosts from Offline captures in DIR instead of logging in')
+    scan_parser.set_defaults(run=scan)
+
+    excel_parser = commands.add_parser('excel', help='Write the Excel switch list from switches.json')
+    excel_parser.add_argument('infile', help='switches.json')
+    excel_parser.add_argument('outfile', help='Workbook to create or update')
+    excel_parser.set_defaults(run=excel)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)])
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@
 import SecureCRT
 
 import logging, os, yaml, json, csv, traceback
-from SwitchList import SwitchMap
+from SwitchList import SwitchMap, Discovery, Topology, Endpoints, Progress, Scheduler, Backoff, Shards, Changes, ConfigArchive
 from switch_src import Switch as SSH
 
 
@@ -25,6 +25,21 @@ def main():
     logfile = "%s\\switchlist.log" % outdir
     jsonfile = "%s\\switches.json" % outdir
     csvfile = "%s\\switches.csv" % outdir
+    topologyfile = "%s\\topology.json" % outdir
+    endpointfile = "%s\\endpoints.json" % outdir
+    aclfile = "%s\\acls.json" % outdir
+    metricsfile = "%s\\metrics.json" % outdir
+    promfile = "%s\\switchlist.prom" % outdir
+    tracefile = "%s\\trace.json" % outdir
+    statusfile = "%s\\status.json" % outdir
+    capturedir = "%s\\captures" % outdir
+    archivedir = "%s\\archive" % outdir
+    timeoutfile = "%s\\timeouts.json" % outdir
+    negativefile = "%s\\negative.json" % outdir
+    fingerprintfile = "%s\\fingerprints.json" % outdir
+    scantimefile = "%s\\scantimes.json" % outdir
+    snapshotfile = "%s\\snapshot.json" % outdir
+    changefile = "%s\\changes.json" % outdir
 
     # Logging setup
     logmap = [logging.ERROR,logging.WARNING,logging.INFO,logging.DEBUG]
@@ -68,6 +83,49 @@ def main():
             return logging.error(traceback.print_exc(), 'main')
         
     switchmap = {}
+    SSH.framing = config.get('framing', False)
+    # RTT/throughput measured on previous runs sets the first read timeouts of each device
+    SSH.timeouts.load(timeoutfile)
+    topology = Topology.TopologyGraph(config.get('cores', []))
+    scheduler = Scheduler.ScanScheduler.from_config(config.get('concurrency', {}) or {})
+    # Hosts that keep failing are only re-probed on an exponential backoff
+    negative = Backoff.NegativeCache.from_config(config.get('negative_cache', {}) or {})
+    negative.begin(negativefile, current_switches, config.get('force_recheck', False))
+    # Vendor/prompt of devices seen before so their login skips detection
+    fingerprints = SSH.FingerprintCache.load(fingerprintfile)
+    fingerprints.seed(current_switches)
+    # IP/serial index of the last run for the change report
+    changes = Changes.ChangeReport.load(snapshotfile, current_switches)
+    collectors = (topology, fingerprints)
+    # full MAC/ARP tables are only read from every device when the endpoint index is wanted
+    endpoints = Endpoints.EndpointIndex.load(endpointfile) if config.get('endpoints', False) else None
+    if endpoints:
+        collectors += (endpoints,)
+    # every Cisco ACL compiled for flow queries (see switch_src/AclEngine.py)
+    fleet_acls = SSH.FleetAcls.load(aclfile) if config.get('acls', False) else None
+    if fleet_acls:
+        collectors += (fleet_acls,)
+    # every running config kept as deltas against the previous night
+    archive = ConfigArchive.ConfigArchive(archivedir) if config.get('archive', False) else None
+    if archive:
+        collectors += (archive,)
+    if scheduler.max_workers > 1:
+        collectors = Scheduler.serialize(collectors)
+    targets = sum(1 for group in scan_list for group_name in scan_list[group] for ip in scan_list[group][group_name] if not ip in reserved)
+    progress = Progress.ProgressReporter(targets, statusfile)
+    login = lambda ip: SSH.connect(crt, username, password, ip, fingerprint=fingerprints.get(ip))
+    # Logged in sessions are only kept open when the capture step below reuses them
+    pool = SSH.SessionPool(login, config.get('session_idle_timeout', 300)) if config.get('capture', False) else None
+    connect = pool.connect if pool is not None else login
+    # Neighbor crawl from seed devices - only unreached groups are swept, by the scheduler below
+    if len(scan_list) > 0 and 'discovery' in config:
+        discovery = config['discovery']
+        switchmap, scan_list = Discovery.discover(connect, discovery['seeds'], scan_list, reserved, discovery.get('sweep_unreached', True), collectors, progress)
+        for group in switchmap:
+            for group_name in switchmap[group]:
+                for ip, result in switchmap[group][group_name].items():
+                    if not ip in reserved:
+                        negative.record(ip, result)
     for group in scan_list:
         switchmap.setdefault(group,{})
         for group_name in scan_list[group]:
@@ -75,24 +133,64 @@ def main():
             ips = scan_list[group][group_name]
             if group in current_switches and group_name in current_switches:
                 switchmap[group][group_name].update(current_switches[group][group_name])
+            previous = current_switches.get(group, {}).get(group_name, {})
             for ip in ips:
-                logging.info('Checking host: %s' % ip, 'map')
-                print('Checking host: %s' % ip)
                 if ip in reserved:
                     logging.info('%s is a reserved address.' % ip, 'map')
                     switchmap[group][group_name][ip] = reserved[ip]
                     continue
-                try:
-                    if ip in current_switches and 'Firmware' in current_switches[group][group_name][ip].keys():
-                        switchmap[group][group_name][ip] = SwitchMap.map_host(SSH.connect(username, password, ip, current_switches[ip]['Firmware']))
-                    else:
-                        switchmap[group][group_name][ip] = SwitchMap.map_host(SSH.connect(username, password, ip))
-                except Exception as e:
-                    if str(e) != 'Offline':
-                        logging.error(traceback.print_exc(), 'main')
-                    switchmap[group][group_name][ip] = {'IP Address': ip, 'Make': 'NOLOGIN' if str(e) != 'Offline' else 'Offline'}
+                if not negative.should_probe(ip):
+                    continue
+                scheduler.add(ip, group, group_name, previous.get(ip, {}).get('Upstream', ''), connect)
+
+    def scan(job):
+        logging.info('Checking host: %s' % job.ip, 'map')
+        with SSH.tracer.span('host', 'scan', job.ip):
+            return SwitchMap.scan_host(job.connect, job.ip, collectors, progress)
+
+    def done(job, result):
+        switchmap[job.sheet][job.group][job.ip] = result
+        negative.record(job.ip, result)
+
+    if scheduler.pending > 0:
+        progress.total = progress.counts['done'] + scheduler.pending
+        scheduler.run(scan, done)
+    if progress.counts['done'] > 0:
+        negative.save(negativefile)
+        progress.close()
+        # per-host scan time balances the next shard plan (see Shards)
+        Shards.save_times(scantimefile, progress.seconds)
+    # Raw output of every live device for offline re-parsing (Offline.py)
+    if pool is not None:
+        os.makedirs(capturedir, exist_ok=True)
+        for ip in list(pool.sessions):
+            try:
+                switch = pool.connect(ip)
+                switch.save_offline(capturedir)
+                pool.release(switch)
+            except Exception:
+                logging.error(traceback.format_exc(), 'main')
+        pool.close_all()
 
+    if len(topology.nodes) > 0:
+        topology.save(topologyfile)
+    if len(fingerprints.hosts) > 0:
+        fingerprints.save(fingerprintfile)
+    if endpoints:
+        endpoints.save(endpointfile)
+    if fleet_acls:
+        fleet_acls.save(aclfile)
+    if archive:
+        archive.save()
+    if len(SSH.recorder.devices) > 0:
+        SSH.recorder.save_json(metricsfile)
+        SSH.recorder.save_prometheus(promfile)
+        SSH.tracer.save(tracefile)
+        SSH.timeouts.save(timeoutfile)
     if len(switchmap) > 0:
+        changes.compare(switchmap)
+        changes.save(snapshotfile)
+        changes.write(changefile)
         mergelist = SwitchMap.savelist(switchmap, current_switches, jsonfile)
     else:
         mergelist = current_switches
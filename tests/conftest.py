@@ -0,0 +1,6 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+# switch_src modules import each other by bare name (see Switch.py)
+sys.path.insert(1, os.path.join(ROOT, 'switch_src'))
+sys.path.insert(1, ROOT)
@@ -0,0 +1,94 @@
+import os, random
+from ipaddress import ip_address
+from Cisco import Cisco
+import AclEngine
+
+FIXTURES = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'fixtures')
+
+def compile_lines(lines):
+    switch = Cisco()
+    return AclEngine.CompiledAcl('TEST', [switch.parse_ace(line) for line in lines])
+
+def linear_match(aces, protocol, source, destination):
+    for ace in aces:
+        if 'fragments' in ace['match-type']:
+            continue
+        if not AclEngine.normalize_protocol(ace['protocol']) in (protocol, 'ip'):
+            continue
+        source_net = AclEngine.parse_address(ace['source'])
+        destination_net = AclEngine.parse_address(ace['destination'])
+        if source & ~source_net[1] & 0xFFFFFFFF != source_net[0]:
+            continue
+        if destination & ~destination_net[1] & 0xFFFFFFFF != destination_net[0]:
+            continue
+        return ace['permit'], ace
+    return False, None
+
+def test_first_match_against_linear_scan():
+    rng = random.Random(7)
+    protocols = ['ip', 'tcp', 'udp', 'icmp']
+    addresses = ['any', 'host 10.0.0.5', '10.0.0.0 0.0.0.255', '10.0.0.0 0.0.255.255', '10.1.0.0 0.0.0.255', '10.0.0.0 0.255.0.255']
+    lines = []
+    for sequence in range(10, 410, 10):
+        action = rng.choice(['permit', 'deny'])
+        lines.append(f'{sequence} {action} {rng.choice(protocols)} {rng.choice(addresses)} {rng.choice(addresses)}')
+    acl = compile_lines(lines)
+    for i in range(2000):
+        protocol = rng.choice(protocols[1:])
+        source = int(ip_address(f'10.{rng.choice([0, 1, 2])}.{rng.choice([0, 1])}.{rng.randint(0, 9)}'))
+        destination = int(ip_address(f'10.{rng.choice([0, 1, 2])}.{rng.choice([0, 1])}.{rng.randint(0, 9)}'))
+        assert acl.match(protocol, source, destination) == linear_match(acl.aces, protocol, source, destination)
+
+def test_object_group_is_indeterminate():
+    acl = compile_lines(['10 deny tcp any object-group WEB', '20 permit ip any any'])
+    flow = AclEngine.prepare_flows([('tcp', '192.168.1.10', '10.0.0.1')])[0]
+    permit, ace = acl.match(*flow)
+    assert permit is None
+    assert ace['sequence_no'] == '10'
+    # the object-group ACE only covers tcp
+    flow = AclEngine.prepare_flows([('udp', '192.168.1.10', '10.0.0.1')])[0]
+    assert acl.match(*flow)[0] is True
+
+def test_source_port_is_not_the_destination():
+    switch = Cisco()
+    assert switch.parse_ace('10 deny tcp host 10.0.0.5 eq 80 any')['destination'] == 'any'
+    assert switch.parse_ace('10 deny tcp host 10.0.0.5 eq www 443 host 10.0.0.1 log')['destination'] == 'host 10.0.0.1'
+    assert switch.parse_ace('10 deny udp any range 1024 65535 10.0.0.0 0.0.0.255')['destination'] == '10.0.0.0 0.0.0.255'
+    assert switch.parse_ace('10 deny tcp host 10.0.0.5 eq www 443 host 10.0.0.1 log')['source-port'] == 'eq www 443'
+
+def test_port_qualified_ace_is_indeterminate():
+    acl = compile_lines([
+        '10 deny tcp host 10.0.0.5 eq 80 any',
+        '20 permit tcp any host 10.0.0.1 eq 22',
+        '30 permit tcp any any established',
+        '40 deny ip host 10.0.0.6 any',
+        '50 permit ip any any'
+    ])
+    for source, sequence in (('10.0.0.5', '10'), ('10.0.0.7', '20')):
+        permit, ace = acl.match(*AclEngine.prepare_flows([('tcp', source, '10.0.0.1')])[0])
+        assert (permit, ace['sequence_no']) == (None, sequence)
+    assert acl.match(*AclEngine.prepare_flows([('tcp', '10.0.0.6', '10.0.0.2')])[0])[0] is None
+    # only tcp is qualified - other protocols fall through to definite entries
+    permit, ace = acl.match(*AclEngine.prepare_flows([('udp', '10.0.0.6', '10.0.0.2')])[0])
+    assert (permit, ace['sequence_no']) == (False, '40')
+
+def test_permitted_by_leaves_out_indeterminate():
+    fleet = AclEngine.FleetAcls()
+    fleet.devices['10.0.0.1'] = {
+        'GROUPS': compile_lines(['10 permit tcp object-group SRC any']),
+        'PLAIN': compile_lines(['10 permit tcp any any'])
+    }
+    assert fleet.permitted_by('tcp', '192.168.1.10', '10.0.0.1') == [('10.0.0.1', 'PLAIN')]
+
+def test_collected_acls_are_saved_and_loaded(tmp_path):
+    switch = Cisco(ip='10.0.0.1', hostname='ACCESS-1', device_type='Switch')
+    with open(os.path.join(FIXTURES, 'cisco_running_config.txt'), 'r') as configfile:
+        switch.config = configfile.read().splitlines()
+    fleet = AclEngine.FleetAcls()
+    fleet.collect(switch)
+    aclfile = str(tmp_path / 'acls.json')
+    fleet.save(aclfile)
+    loaded = AclEngine.FleetAcls.load(aclfile)
+    flows = [('tcp', '10.0.0.5', '10.0.0.1'), ('udp', '192.168.1.10', '8.8.8.8'), ('icmp', '10.1.1.1', '10.0.0.1')]
+    assert loaded.evaluate(flows) == fleet.evaluate(flows)
+    assert sorted(name for device_ip, name in loaded.evaluate(flows)) == sorted(switch.acls)
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+from SwitchList import Backoff
+
+def switches(**hosts):
+    return {'SHEET': {'GROUP': hosts}}
+
+def test_backoff_doubles_up_to_max_skip():
+    cache = Backoff.NegativeCache(grace=2, max_skip=8)
+    assert [cache.backoff(failures) for failures in range(1, 9)] == [0, 0, 1, 2, 4, 8, 8, 8]
+
+def test_failing_host_is_skipped_then_probed_again(tmp_path):
+    cachefile = str(tmp_path / 'negative.json')
+    probes = []
+    for run in range(12):
+        cache = Backoff.NegativeCache(grace=2, max_skip=4, full_sweep_days=0)
+        cache.begin(cachefile)
+        if cache.should_probe('10.0.0.1'):
+            probes.append(cache.run)
+            cache.record('10.0.0.1', {'IP Address': '10.0.0.1', 'Make': 'Offline'})
+        cache.save(cachefile)
+    # grace, grace, then skipped 1, 2, 4 runs
+    assert probes == [1, 2, 3, 5, 8]
+    cache = Backoff.NegativeCache(full_sweep_days=0)
+    cache.begin(cachefile, force=True)
+    assert cache.should_probe('10.0.0.1')
+    cache.record('10.0.0.1', {'IP Address': '10.0.0.1', 'Make': 'Cisco'})
+    assert not '10.0.0.1' in cache.hosts
+
+def test_seed_without_last_seen_starts_at_grace(tmp_path):
+    cache = Backoff.NegativeCache(grace=2, max_skip=32, full_sweep_days=0)
+    cache.begin(str(tmp_path / 'negative.json'), switches(**{
+        '10.0.0.1': {'Make': 'Offline', 'Last Seen Online': ''},
+        '10.0.0.2': {'Make': 'Offline', 'Last Seen Online': (datetime.now() - timedelta(days=64)).strftime("%d%b%Y")},
+        '10.0.0.3': {'Make': 'Cisco', 'Last Seen Online': ''}
+    }))
+    assert cache.hosts['10.0.0.1']['failures'] == 2
+    assert cache.should_probe('10.0.0.1')
+    assert cache.hosts['10.0.0.2']['failures'] == 2 + 6
+    assert not cache.should_probe('10.0.0.2')
+    assert not '10.0.0.3' in cache.hosts
@@ -0,0 +1,59 @@
+from SwitchList import Changes
+
+def host(hostname, serial, firmware='16.12', fips='YES'):
+    return {'Hostname': hostname, 'Make': 'Cisco', 'Serial': serial, 'Firmware': firmware, 'FIPS Mode': fips}
+
+def offline(ip):
+    return {'IP Address': ip, 'Make': 'Offline'}
+
+PREVIOUS = {'SHEET': {'GROUP': {
+    '10.0.0.1': host('A', ['S1', 'S2']),
+    '10.0.0.2': host('B', ['S3']),
+    '10.0.0.3': host('C', ['S4']),
+    '10.0.0.4': host('D', ['S5']),
+    '10.0.0.5': host('E', ['S6']),
+    '10.0.0.6': {'Hostname': 'F', 'Make': 'Offline', 'Serial': ['S7']}
+}}}
+
+RUN = {'SHEET': {'GROUP': {
+    '10.0.0.1': host('A', ['S1', 'S9'], firmware='17.3'),
+    '10.0.0.2': offline('10.0.0.2'),
+    '10.0.0.7': host('B', ['S3']),
+    '10.0.0.3': host('C2', ['S10']),
+    '10.0.0.4': offline('10.0.0.4'),
+    '10.0.0.5': host('E', ['S6'], fips='NO'),
+    '10.0.0.6': offline('10.0.0.6')
+}}}
+
+def kinds(changes):
+    return sorted((change['type'], change['ip']) for change in changes)
+
+def test_changes_between_runs(tmp_path):
+    snapshotfile = str(tmp_path / 'snapshot.json')
+    report = Changes.ChangeReport.load(snapshotfile, PREVIOUS)
+    report.compare(RUN)
+    assert kinds(report.changes) == [
+        ('fips', '10.0.0.5'),
+        ('firmware', '10.0.0.1'),
+        ('moved', '10.0.0.7'),
+        ('new', '10.0.0.3'),
+        ('removed', '10.0.0.3'),
+        ('removed', '10.0.0.4'),
+        ('stack', '10.0.0.1')
+    ]
+    stack = next(change for change in report.changes if change['type'] == 'stack')
+    assert (stack['added'], stack['removed']) == (['S9'], ['S2'])
+    report.save(snapshotfile)
+    # the same results again are no change, and the snapshot is used instead of switches.json
+    again = Changes.ChangeReport.load(snapshotfile, {})
+    again.compare(RUN)
+    assert again.changes == []
+
+def test_offline_device_keeps_its_identity(tmp_path):
+    report = Changes.ChangeReport.load(str(tmp_path / 'snapshot.json'), PREVIOUS)
+    report.compare({'SHEET': {'GROUP': {'10.0.0.2': offline('10.0.0.2')}}})
+    assert kinds(report.changes) == [('removed', '10.0.0.2')]
+    # back at the same address - not new
+    report.changes = []
+    report.compare({'SHEET': {'GROUP': {'10.0.0.2': host('B', ['S3'])}}})
+    assert report.changes == []
@@ -0,0 +1,56 @@
+import difflib, random
+from SwitchList import ConfigArchive
+
+def nightly_configs(nights):
+    rng = random.Random(7)
+    config = [f'interface GigabitEthernet1/0/{port}' for port in range(1, 41)]
+    configs = []
+    for night in range(nights):
+        config = list(config)
+        # most nights change nothing, the rest edit, add or drop a few lines
+        for _ in range(rng.choice([0, 0, 1, 3])):
+            position = rng.randrange(len(config))
+            edit = rng.choice(['change', 'add', 'drop'])
+            if edit == 'change':
+                config[position] = f' description night {night}'
+            elif edit == 'add':
+                config.insert(position, f' switchport access vlan {rng.randrange(100)}')
+            elif len(config) > 1:
+                del config[position]
+        configs.append(config)
+    return configs
+
+def test_rebuild_from_disk(tmp_path, monkeypatch):
+    # several bases and delta chains
+    monkeypatch.setattr(ConfigArchive, 'KEYFRAME', 4)
+    configs = nightly_configs(11)
+    archive = ConfigArchive.ConfigArchive(str(tmp_path))
+    for night, config in enumerate(configs[:6]):
+        archive.add('10.0.0.1', 'SW1', config, date=f'{night + 1:02}Oct2026 01:00')
+    archive.save()
+    # appending to an archive read back from disk
+    archive = ConfigArchive.ConfigArchive(str(tmp_path))
+    for night, config in enumerate(configs[6:], 6):
+        archive.add('10.0.0.1', 'SW1', config, date=f'{night + 1:02}Oct2026 01:00')
+    archive.save()
+    archive = ConfigArchive.ConfigArchive(str(tmp_path))
+    snapshots = archive.device('10.0.0.1')['snapshots']
+    assert [index for index, snapshot in enumerate(snapshots) if 'base' in snapshot] == [0, 4, 8]
+    for index, config in enumerate(configs):
+        assert archive.config('10.0.0.1', index) == config
+    assert archive.config('10.0.0.1', '03Oct2026') == configs[2]
+
+def test_diff_matches_difflib(tmp_path):
+    configs = nightly_configs(8)
+    archive = ConfigArchive.ConfigArchive(str(tmp_path))
+    for night, config in enumerate(configs):
+        archive.add('10.0.0.1', 'SW1', config, date=f'{night + 1:02}Oct2026 01:00')
+    for old in range(len(configs)):
+        expected = list(difflib.unified_diff(configs[old], configs[-1],
+            f'10.0.0.1 {old + 1:02}Oct2026 01:00', '10.0.0.1 08Oct2026 01:00', lineterm=''))
+        output = archive.diff('10.0.0.1', old)
+        if configs[old] == configs[-1]:
+            # difflib prints nothing at all for equal inputs, the archive still names both snapshots
+            assert output[2:] == []
+        else:
+            assert output == expected
@@ -0,0 +1,56 @@
+from Cisco import Cisco
+
+COMMANDS = [
+    'interface GigabitEthernet1/0/1',
+    'storm-control action shutdown',
+    'bogus command',
+    'interface GigabitEthernet1/0/2',
+    'permit ip host 10.10.10.10 host 10.20.20.20 log-input',
+    'exit'
+]
+
+def split(output):
+    switch = Cisco(hostname='SW1')
+    # send_config() reads up to the '(' of the first config prompt
+    switch.prompt = 'SW1('
+    response = switch.split_config_echo(output, COMMANDS)
+    return response, switch.config_errors(response)
+
+def test_plain_echo():
+    response, errors = split(
+        'config)#interface GigabitEthernet1/0/1\r\n'
+        'SW1(config-if)#storm-control action shutdown\r\n'
+        'SW1(config-if)#bogus command\r\n'
+        "                  ^\r\n% Invalid input detected at '^' marker.\r\n"
+        'SW1(config-if)#interface GigabitEthernet1/0/2\r\n'
+        'SW1(config-if)#permit ip host 10.10.10.10 host 10.20.20.20 log-input\r\n'
+        'SW1(config-if)#exit\r\n'
+    )
+    assert errors == [(3, "% Invalid input detected at '^' marker.")]
+
+def test_empty_echo_does_not_shift_lines():
+    response, errors = split(
+        'config)#interface GigabitEthernet1/0/1\r\n'
+        'SW1(config-if)#\r\n'
+        'SW1(config-if)#storm-control action shutdown\r\n'
+        'SW1(config-if)#\r\n'
+        'SW1(config-if)#bogus command\r\n'
+        "                  ^\r\n% Invalid input detected at '^' marker.\r\n"
+        'SW1(config-if)#interface GigabitEthernet1/0/2\r\n'
+        'SW1(config-if)#permit ip host 10.10.10.10 host 10.20.20.20 log-input\r\n'
+        'SW1(config-if)#exit\r\n'
+    )
+    assert errors == [(3, "% Invalid input detected at '^' marker.")]
+
+def test_scrolled_echo_matches_by_end():
+    response, errors = split(
+        'config)#interface GigabitEthernet1/0/1\r\n'
+        'SW1(config-if)#storm-control action shutdown\r\n'
+        'SW1(config-if)#interface GigabitEthernet1/0/2\r\n'
+        'SW1(config-if)#$10.10.10.10 host 10.20.20.20 log-input\r\n'
+        '% Incomplete command.\r\n'
+        'SW1(config-if)#exit\r\n'
+    )
+    # 'bogus command' was never echoed - the scrolled line is still matched to its command
+    assert errors == [(5, '% Incomplete command.')]
+    assert response[2] == ''
@@ -0,0 +1,40 @@
+from Fingerprints import FingerprintCache
+
+class FakeSwitch:
+    def __init__(self, ip, make, hostname, prompt, privileged=True):
+        self.ip = ip
+        self.make = make
+        self.hostname = hostname
+        self.prompt = prompt
+        self.privileged = privileged
+        self.device_type = 'Switch' if make == 'Cisco' else ''
+        self.os_type = 'IOS-XE' if make == 'Cisco' else ''
+
+def test_collected_fingerprint_is_a_hit_after_reload(tmp_path):
+    cache = FingerprintCache()
+    cache.collect(FakeSwitch('10.0.0.1', 'Cisco', 'ACCESS-1', 'ACCESS-1>', privileged=False))
+    # Brocade objects keep the prompt without SSH@
+    cache.collect(FakeSwitch('10.0.0.2', 'Brocade', 'ICX-1', 'ICX-1#'))
+    cachefile = str(tmp_path / 'fingerprints.json')
+    cache.save(cachefile)
+    cache = FingerprintCache.load(cachefile)
+    assert cache.get('10.0.0.1') == {'make': 'Cisco', 'device_type': 'Switch', 'os_type': 'IOS-XE',
+        'prompt': 'ACCESS-1>', 'hostname': 'ACCESS-1', 'privileged': False}
+    assert cache.get('10.0.0.2')['prompt'] == 'SSH@ICX-1#'
+    assert cache.get('10.0.0.3') is None
+
+def test_seed_only_fills_misses(tmp_path):
+    cache = FingerprintCache.load(str(tmp_path / 'missing.json'))
+    assert cache.hosts == {}
+    cache.collect(FakeSwitch('10.0.0.1', 'Cisco', 'ACCESS-1', 'ACCESS-1>', privileged=False))
+    cache.seed({'SHEET': {'GROUP': {
+        '10.0.0.1': {'Make': 'Cisco', 'Hostname': 'ACCESS-1'},
+        '10.0.0.2': {'Make': 'Brocade', 'Hostname': 'ICX-1'},
+        '10.0.0.3': {'Make': 'Offline', 'Hostname': ''}
+    }}})
+    # the measured fingerprint is kept over the assumed privileged prompt
+    assert cache.get('10.0.0.1')['prompt'] == 'ACCESS-1>'
+    assert cache.get('10.0.0.2')['prompt'] == 'SSH@ICX-1#'
+    assert cache.get('10.0.0.3') is None
+    cache.forget('10.0.0.2')
+    assert cache.get('10.0.0.2') is None
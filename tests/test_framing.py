@@ -0,0 +1,89 @@
+import pytest
+import Framing, MockFarm, Timeouts
+from Cisco import Cisco
+
+VERSION = 'Cisco IOS Software, C2960X Software, Version 15.2(7)E8\nuptime is 5 weeks\n'
+
+class HungConnection:
+    '''
+        Netmiko-like channel of a device that echoes the command but never finishes it
+    '''
+    def __init__(self):
+        self.written = []
+        self.pending = ''
+
+    def clear_buffer(self):
+        self.pending = ''
+
+    def write_channel(self, data):
+        self.written.append(data)
+        self.pending += 'ACCESS-1#' + data.split('\n')[0] + '\r\n'
+
+    def read_channel(self):
+        data, self.pending = self.pending, ''
+        return data
+
+class HungDevice:
+    ip = '10.0.0.1'
+
+    def __init__(self):
+        self.conn = HungConnection()
+
+class CountingDevice(MockFarm.MockDevice):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+
+    def answer(self, command, config_mode):
+        self.commands.append(command)
+        return super().answer(command, config_mode)
+
+@pytest.fixture
+def farm():
+    pytest.importorskip('netmiko')
+    farm = MockFarm.Farm()
+    yield farm
+    farm.stop()
+
+@pytest.fixture(autouse=True)
+def model(monkeypatch):
+    monkeypatch.setattr(Timeouts, 'timeouts', Timeouts.TimeoutModel())
+    # first deadline of an unmeasured device is MIN_TIMEOUT
+    monkeypatch.setattr(Timeouts, 'DEFAULT_TIMEOUT', Timeouts.MIN_TIMEOUT)
+
+@pytest.fixture
+def short_deadlines(monkeypatch):
+    monkeypatch.setattr(Timeouts, 'DEFAULT_TIMEOUT', 0.05)
+
+def connect(farm, device):
+    import netmiko
+    address, port = farm.add(device, '127.0.0.1', 0)
+    farm.start()
+    conn = netmiko.ConnectHandler(device_type='cisco_ios', host=address, port=port, username='admin', password='admin')
+    prompt = conn.find_prompt()
+    return Cisco(conn=conn, conn_type='SSH', ip='10.0.0.1', hostname=prompt[:-1], framing=True)
+
+def test_slow_command_is_sent_once(farm, caplog):
+    captures = {'device_type': 'cisco_ios', 'show run': 'hostname ACCESS-1\n', 'show version': VERSION}
+    # past the first deadline (MIN_TIMEOUT) but within the doubled one
+    device = CountingDevice('mock', captures, MockFarm.Profile(commands={'show version': Timeouts.MIN_TIMEOUT + 0.5}))
+    switch = connect(farm, device)
+    try:
+        output = switch.send('show version')
+        assert output.replace('\r\n', '\n') == VERSION
+        assert device.commands.count('show version') == 1
+        assert 'reading on' in caplog.text
+        # the channel was read to the prompt - the next command gets only its own output
+        assert switch.send('show run').replace('\r\n', '\n') == 'hostname ACCESS-1\n'
+    finally:
+        switch.conn.disconnect()
+
+def test_unfinished_command_is_written_once_then_raises(short_deadlines):
+    device = HungDevice()
+    with pytest.raises(TimeoutError):
+        Framing.netmiko_send(device, 'show tech-support', minimum=0.05)
+    assert len(device.conn.written) == 1
+    assert device.conn.written[0].startswith('show tech-support\n! SWL')
+
+def test_markers_are_unique():
+    assert len({Framing.new_marker() for i in range(1000)}) == 1000
@@ -0,0 +1,26 @@
+import Metrics
+
+class FakeDevice:
+    ip = '10.0.0.1'
+    make = 'Cisco'
+    device_type = 'IOS-XE'
+
+def test_lookups_share_one_command_label():
+    recorder = Metrics.Recorder()
+    device = FakeDevice()
+    for ip in ('10.0.0.5', '10.0.0.6', '10.0.0.7'):
+        recorder.record(device, 'command', f'show ip arp {ip}', 0.1, 'Internet  %s  0  0011.2233.4455  ARPA  Vlan10' % ip)
+    recorder.record(device, 'command', 'show mac address-table address 0011.2233.4455', 0.1, '')
+    recorder.record(device, 'command', 'show mac address-table address 00:11:22:33:44:66', 0.1, '')
+    recorder.record(device, 'command', 'sh vlan br e 1/1/12', 0.1, '')
+    recorder.record(device, 'command', 'show interfaces GigabitEthernet1/0/1 status', 0.1, '')
+    recorder.record(device, 'command', 'show version', 0.1, '')
+    commands = recorder.report()['devices']['10.0.0.1']['command']
+    assert sorted(commands) == ['sh vlan br e', 'show interfaces status', 'show ip arp', 'show mac address-table address', 'show version']
+    assert commands['show ip arp']['calls'] == 3
+    assert commands['show mac address-table address']['calls'] == 2
+
+def test_parsers_keep_their_name():
+    recorder = Metrics.Recorder()
+    recorder.record(FakeDevice(), 'parser', 'parse_version', 0.1)
+    assert list(recorder.report()['devices']['10.0.0.1']['parser']) == ['parse_version']
@@ -0,0 +1,110 @@
+from SwitchList import Rollout
+
+RUNNING = '''hostname ACCESS-1
+interface GigabitEthernet1/0/1
+ switchport mode access
+interface GigabitEthernet1/0/2
+ switchport mode access
+ storm-control broadcast level bps 1g
+ storm-control unicast level bps 1g
+ storm-control action shutdown
+end'''
+
+# the first interface complete, the second with only one of the three lines
+PARTIAL = '''hostname ACCESS-1
+interface GigabitEthernet1/0/1
+ switchport mode access
+ storm-control broadcast level bps 1g
+ storm-control unicast level bps 1g
+ storm-control action shutdown
+interface GigabitEthernet1/0/2
+ switchport mode access
+ storm-control action shutdown
+end'''
+
+STORM_CONTROL = {
+    'interfaces': {'mode': 'access', 'commands': [
+        'storm-control broadcast level bps 1g',
+        'storm-control unicast level bps 1g',
+        'storm-control action shutdown'
+    ]},
+    'verify': ['storm-control']
+}
+
+class FakeSwitch:
+    '''
+        Cisco-like device that pages 'show run' until 'terminal length 0' and applies config
+        by inserting lines under the interface - except @param(ignored) lines, which the device
+        accepts without applying
+    '''
+    make = 'Cisco'
+    device_type = 'Switch'
+
+    def __init__(self, ip, running=RUNNING, ignored=()):
+        from Cisco import Cisco
+        self.ip = ip
+        self.hostname = 'ACCESS-1'
+        self.running = running.splitlines()
+        self.ignored = set(ignored)
+        self.paging = True
+        self.saved = 0
+        self.cisco = Cisco(device_type='Switch')
+
+    def send(self, command):
+        if command == 'terminal length 0':
+            self.paging = False
+            return ''
+        if self.paging:
+            raise TimeoutError(f'{self.ip}: no prompt after "{command}" - output truncated')
+        return '\n'.join(self.running)
+
+    def send_config(self, commands, bulk=False):
+        position = None
+        for command in commands:
+            if command.startswith('interface '):
+                position = self.running.index(command) + 1
+            elif command != 'exit' and not command in self.ignored:
+                self.running.insert(position, ' ' + command)
+                position += 1
+        return []
+
+    def parse_interfaces(self):
+        self.cisco.config = self.config
+        return self.cisco.parse_interfaces()
+
+    def write_mem(self):
+        self.saved += 1
+
+def test_plan_waves():
+    assert [len(wave) for wave in Rollout.plan_waves(list(range(20)))] == [1, 2, 4, 8, 5]
+    assert [len(wave) for wave in Rollout.plan_waves(list(range(10)), canary=2, max_batch=3)] == [2, 3, 3, 2]
+
+def test_rollout_turns_paging_off_and_saves():
+    configset = Rollout.ConfigSet.from_config(STORM_CONTROL)
+    switches = {}
+
+    def connect(ip):
+        return switches.setdefault(ip, FakeSwitch(ip))
+
+    rollout = Rollout.Rollout(configset, connect)
+    results = rollout.run(['10.0.0.1', '10.0.0.2'])
+    assert rollout.stopped == ''
+    assert results['10.0.0.1']['status'] == 'saved'
+    # only the interface without storm-control was touched
+    assert results['10.0.0.1']['interfaces'] == ['GigabitEthernet1/0/1']
+    assert switches['10.0.0.2'].saved == 1
+
+def test_interface_is_verified_on_its_own_lines():
+    rollout = Rollout.Rollout(Rollout.ConfigSet.from_config(STORM_CONTROL), None)
+    interfaces = rollout.read_config(FakeSwitch('10.0.0.1', PARTIAL))
+    assert interfaces['GigabitEthernet1/0/1']['storm-control'] is True
+    assert interfaces['GigabitEthernet1/0/2']['storm-control'] is False
+
+def test_line_missing_after_apply_fails_verification():
+    switch = FakeSwitch('10.0.0.1', PARTIAL, ignored=['storm-control unicast level bps 1g'])
+    rollout = Rollout.Rollout(Rollout.ConfigSet.from_config(STORM_CONTROL), lambda ip: switch)
+    results = rollout.run(['10.0.0.1'])
+    assert results['10.0.0.1']['status'] == 'failed'
+    assert results['10.0.0.1']['interfaces'] == ['GigabitEthernet1/0/2']
+    assert 'GigabitEthernet1/0/2 storm-control not compliant' in results['10.0.0.1']['error']
+    assert switch.saved == 0
@@ -0,0 +1,58 @@
+from SwitchList import Scheduler, Discovery
+
+def test_failed_task_still_reports_a_result():
+    scheduler = Scheduler.ScanScheduler(max_workers=2)
+    for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+        scheduler.add(ip, 'SHEET', 'GROUP')
+    results = {}
+
+    def task(job):
+        if job.ip == '10.0.0.2':
+            raise RuntimeError('session dropped')
+        return {'IP Address': job.ip, 'Make': 'Cisco'}
+
+    scheduler.run(task, lambda job, result: results.__setitem__(job.ip, result['Make']))
+    assert results == {'10.0.0.1': 'Cisco', '10.0.0.2': 'NOLOGIN', '10.0.0.3': 'Cisco'}
+
+def test_limits_are_respected():
+    import threading, time
+    scheduler = Scheduler.ScanScheduler(max_workers=6, per_group=2, per_upstream=1)
+    for number in range(12):
+        scheduler.add(f'10.0.{number % 3}.{number}', 'SHEET', f'GROUP {number % 3}', f'DS-{number % 2} Gi1/0/1')
+    lock = threading.Lock()
+    active = {'groups': {}, 'upstream': {}}
+    worst = {'groups': 0, 'upstream': 0}
+
+    def task(job):
+        with lock:
+            for kind, key in (('groups', job.group), ('upstream', job.upstream)):
+                active[kind][key] = active[kind].get(key, 0) + 1
+                worst[kind] = max(worst[kind], active[kind][key])
+        time.sleep(0.01)
+        with lock:
+            active['groups'][job.group] -= 1
+            active['upstream'][job.upstream] -= 1
+        return {}
+
+    scheduler.run(task, lambda job, result: None)
+    assert worst['groups'] <= 2 and worst['upstream'] == 1
+    assert scheduler.pending == 0
+
+def test_discovery_returns_unreached_groups_to_sweep(monkeypatch):
+    scan_list = {'SHEET': {'REACHED': ['10.0.0.1', '10.0.0.2'], 'UNREACHED': ['10.1.0.1', '10.1.0.2', '10.1.0.5']}}
+    reserved = {'10.1.0.5': {'IP Address': '10.1.0.5', 'Make': 'Dell'}}
+    probed = []
+
+    def connect(ip):
+        probed.append(ip)
+        return None
+
+    def scan_host(connect, ip, collectors=(), progress=None):
+        connect(ip)
+        return {'IP Address': ip, 'Make': 'Cisco' if ip == '10.0.0.1' else 'Offline'}
+
+    monkeypatch.setattr(Discovery.SwitchMap, 'scan_host', scan_host)
+    switchmap, sweep = Discovery.discover(connect, ['10.0.0.1'], scan_list, reserved)
+    assert probed == ['10.0.0.1']
+    assert sweep == {'SHEET': {'UNREACHED': ['10.1.0.1', '10.1.0.2']}}
+    assert switchmap['SHEET']['UNREACHED'] == {'10.1.0.5': reserved['10.1.0.5']}
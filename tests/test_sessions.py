@@ -0,0 +1,39 @@
+import time
+from Sessions import SessionPool
+
+class FakeSwitch:
+    def __init__(self, ip):
+        self.ip = ip
+        self.up = True
+
+    def connected(self):
+        return self.up
+
+    def disconnect(self):
+        self.up = False
+
+def test_idle_time_starts_at_release():
+    pool = SessionPool(FakeSwitch, idle_timeout=0.05)
+    first = pool.connect('10.0.0.1')
+    pool.connect('10.0.0.2')
+    time.sleep(0.1)
+    # sessions still in use are never idle
+    pool.close_idle()
+    assert '10.0.0.1' in pool and '10.0.0.2' in pool
+    pool.release(first)
+    pool.close_idle()
+    assert '10.0.0.1' in pool
+    time.sleep(0.1)
+    pool.close_idle()
+    assert not '10.0.0.1' in pool and not first.up
+    assert '10.0.0.2' in pool
+
+def test_reuse_marks_session_in_use():
+    pool = SessionPool(FakeSwitch, idle_timeout=0.05)
+    switch = pool.connect('10.0.0.1')
+    pool.release(switch)
+    assert pool.connect('10.0.0.1') is switch
+    time.sleep(0.1)
+    pool.close_idle()
+    assert '10.0.0.1' in pool
+    assert (pool.logins, pool.reused) == (1, 1)
@@ -0,0 +1,69 @@
+import os, json
+import yaml
+from SwitchList import Shards
+
+CONFIG = {
+    'scan': {
+        'CN1': {'CORE NODE 1': ['192.168.0.0/29']},
+        'REST': {'OTHER': ['192.168.255.1', '192.168.255.10-192.168.255.14']}
+    },
+    'discovery': {'seeds': ['192.168.0.1']},
+    'endpoints': True
+}
+
+def host(ip, hostname):
+    return {'IP Address': ip, 'Hostname': hostname, 'Make': 'Cisco', 'Serial': [hostname + '-SN'],
+        'Firmware': '16.12', 'FIPS Mode': 'YES'}
+
+def test_split_is_balanced():
+    targets = [('SHEET', 'GROUP', f'10.0.0.{i}') for i in range(1, 21)]
+    times = {ip: float(i % 7 + 1) for i, (sheet, group, ip) in enumerate(targets)}
+    # no history for the last host - counted as the median
+    times.pop('10.0.0.20')
+    buckets, loads = Shards.split(targets, 3, times, {'10.0.0.1': {}})
+    assert sorted(target for bucket in buckets for target in bucket) == sorted(targets)
+    assert all(bucket == sorted(bucket, key=targets.index) for bucket in buckets)
+    # longest first onto the least loaded shard leaves shards within one host of each other
+    assert max(loads) - min(loads) <= max(times.values())
+    assert ('SHEET', 'GROUP', '10.0.0.1') in buckets[0]
+    assert Shards.split(targets, 3, times, {'10.0.0.1': {}}) == (buckets, loads)
+
+def test_plan_assigns_every_address_once():
+    configs, loads = Shards.plan(CONFIG, 2)
+    assert [shard['endpoints'] for shard in configs] == [True, True]
+    assert all(not 'discovery' in shard for shard in configs)
+    planned = [ip for shard in configs for sheet, group, ip in Shards.list_targets(shard['scan'])]
+    assert len(planned) == len(set(planned)) == 8 + 6
+    # network/broadcast addresses only in the first shard
+    assert sorted(configs[0]['reserved']) == ['192.168.0.0', '192.168.0.7']
+    assert configs[1]['reserved'] == {}
+
+def test_merge_takes_each_shard_own_hosts(tmp_path):
+    configs, loads = Shards.plan(CONFIG, 2)
+    shard_dirs = []
+    for number, shard in enumerate(configs, 1):
+        directory = tmp_path / Shards.SHARD_DIR.format(number)
+        os.makedirs(directory)
+        with open(directory / 'scan.yml', 'w') as shardfile:
+            yaml.safe_dump(shard, shardfile, sort_keys=False)
+        results = {}
+        for sheet, group, ip in Shards.list_targets(shard['scan']):
+            results.setdefault(sheet, {}).setdefault(group, {})[ip] = host(ip, f'SW-{ip}')
+        # a stale result for an address this shard no longer owns
+        stale_ip = Shards.list_targets(configs[number % 2]['scan'])[0][2]
+        results.setdefault('CN1', {}).setdefault('CORE NODE 1', {})[stale_ip] = host(stale_ip, 'STALE')
+        with open(directory / 'switches.json', 'w') as jsonlist:
+            json.dump(results, jsonlist)
+        with open(directory / 'scantimes.json', 'w') as timesfile:
+            json.dump({ip: 2.0 for sheet, group, ip in Shards.list_targets(shard['scan'])}, timesfile)
+        shard_dirs.append(str(directory))
+    outfile = str(tmp_path / 'switches.json')
+    timesfile = str(tmp_path / 'scantimes.json')
+    merged = Shards.merge(shard_dirs, outfile, timesfile)
+    hostnames = {ip: entry['Hostname'] for sheet in merged.values() for group in sheet.values() for ip, entry in group.items()}
+    assert len(hostnames) == 14
+    assert not 'STALE' in hostnames.values()
+    assert len(Shards.load_times(timesfile)) == 14
+    assert os.path.exists(tmp_path / 'changes.json')
+    with open(outfile, 'r') as jsonlist:
+        assert json.load(jsonlist) == merged
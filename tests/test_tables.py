@@ -0,0 +1,37 @@
+import Tables
+
+MAC_ROWS = [
+    ('0011.2233.4455', {'VLAN': '10', 'TYPE': 'DYNAMIC', 'PORT': 'Gi1/0/1'}),
+    ('00:11:22:33:44:66', {'VLAN': 'All', 'TYPE': 'STATIC', 'PORT': 'CPU'}),
+    ('ffff.ffff.ffff', {'VLAN': '010', 'TYPE': 'DYNAMIC', 'PORT': 'Po1'}),
+    ('0000.0000.0001', {'VLAN': '4094', 'TYPE': 'DYNAMIC', 'PORT': 'Gi1/0/1'})
+]
+
+def test_mac_table_round_trip():
+    table = Tables.mac_table()
+    legacy = {}
+    for mac, row in MAC_ROWS:
+        table[mac] = row
+        legacy[Tables.Mac().decode(Tables.Mac().encode(mac))] = row
+    # overwriting a key keeps one row, as a dict assignment does
+    table['0011.2233.4455'] = {'VLAN': '20', 'TYPE': 'DYNAMIC', 'PORT': 'Gi1/0/2'}
+    legacy['0011.2233.4455'] = {'VLAN': '20', 'TYPE': 'DYNAMIC', 'PORT': 'Gi1/0/2'}
+    assert len(table) == len(legacy)
+    assert table.to_dict() == legacy
+    assert list(table) == list(legacy)
+    assert table['00:11:22:33:44:66'] == {'VLAN': 'All', 'TYPE': 'STATIC', 'PORT': 'CPU'}
+    assert '0011.2233.4455' in table
+    assert not '0011.2233.4457' in table
+
+def test_arp_table_round_trip():
+    table = Tables.arp_table()
+    rows = {
+        '10.0.0.1': {'PORT': 'Vlan10', 'TYPE': 'ARPA', 'MAC': '0011.2233.4455', 'AGE': '-', 'PROTOCOL': 'Internet'},
+        '192.168.255.254': {'PORT': 'Gi0/0', 'TYPE': 'ARPA', 'MAC': '00ff.0000.0001', 'AGE': '239', 'PROTOCOL': 'Internet'}
+    }
+    for ip, row in rows.items():
+        table.add(ip, row)
+    assert table.to_dict() == rows
+    # keys that cannot be encoded are missing, not errors
+    assert table.get('not-an-ip') is None
+    assert table.get('10.0.0.2', {}) == {}
@@ -0,0 +1,66 @@
+import pytest
+import Timeouts
+
+class FakeConnection:
+    '''
+        send_command() returns @param(responses) and read_until_pattern() @param(chunks) one
+        call at a time, raising read_timeout() for None
+    '''
+    base_prompt = 'ACCESS-1'
+
+    def __init__(self, responses, chunks):
+        self.responses = list(responses)
+        self.chunks = list(chunks)
+        self.sent = []
+
+    def send_command(self, command, read_timeout):
+        self.sent.append((command, read_timeout))
+        return self.answer(self.responses)
+
+    def read_until_pattern(self, pattern, re_flags, read_timeout):
+        return self.answer(self.chunks)
+
+    def answer(self, outputs):
+        output = outputs.pop(0)
+        if output is None:
+            raise Timeouts.read_timeout()('timed out')
+        return output
+
+class FakeDevice:
+    ip = '10.0.0.1'
+
+    def __init__(self, conn):
+        self.conn = conn
+
+@pytest.fixture(autouse=True)
+def model(monkeypatch):
+    monkeypatch.setattr(Timeouts, 'timeouts', Timeouts.TimeoutModel())
+
+def test_slow_write_mem_is_sent_once():
+    conn = FakeConnection([None], [None, 'Building configuration...\n[OK]\nACCESS-1#'])
+    assert Timeouts.netmiko_send(FakeDevice(conn), 'write mem', tail=True) == 'Building configuration...\n[OK]'
+    assert [command for command, deadline in conn.sent] == ['write mem']
+
+def test_slow_show_is_sent_again_after_drain(monkeypatch):
+    clock = iter([0.0, 12.0, 20.0, 21.0])
+    monkeypatch.setattr(Timeouts.time, 'monotonic', lambda: next(clock))
+    conn = FakeConnection([None, 'hostname ACCESS-1\nend'], ['end\nACCESS-1#'])
+    assert Timeouts.netmiko_send(FakeDevice(conn), 'show run') == 'hostname ACCESS-1\nend'
+    # sent again only after the prompt, with a deadline covering the 12s the first attempt took
+    (first, first_deadline), (second, second_deadline) = conn.sent
+    assert (first, second) == ('show run', 'show run')
+    assert first_deadline == Timeouts.DEFAULT_TIMEOUT
+    assert second_deadline == Timeouts.MARGIN * 12.0
+
+def test_timing_out_twice_raises():
+    conn = FakeConnection([None, None], ['end\nACCESS-1#', 'end\nACCESS-1#'])
+    with pytest.raises(TimeoutError):
+        Timeouts.netmiko_send(FakeDevice(conn), 'show run')
+    assert len(conn.sent) == 2
+    assert conn.chunks == []
+
+def test_lost_output_time_raises_deadline():
+    Timeouts.timeouts.observe_time('10.0.0.1', 'show version', 7.0)
+    assert Timeouts.timeouts.deadline('10.0.0.1', 'show version') == Timeouts.MARGIN * 7.0
+    Timeouts.timeouts.observe('10.0.0.1', 'show clock', 0.1, 40)
+    assert Timeouts.timeouts.deadline('10.0.0.1', 'show version') >= Timeouts.MARGIN * 7.0